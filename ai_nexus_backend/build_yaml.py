@@ -1,8 +1,23 @@
+import hashlib
+import os
 import pathlib
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Union
 
 import pandas as pd
 from yaml import safe_load, YAMLError
 
+from ai_nexus_backend.parquet_utils import _topic_list, read_repo_dataset
+
+try:
+    from PIL import Image
+except ImportError:  # optional, install with `pip install '.[images]'`
+    Image = None
+
+DEFAULT_IMAGE_PTH = "/./www/Moj_logo_uk.png"
+
 
 def _parse_yaml(content_str: str) -> dict:
     """Utility for safely converting content string to valid YAML"""
@@ -14,24 +29,189 @@ def _parse_yaml(content_str: str) -> dict:
         raise YAMLError("Error parsing YAML content:", e)
 
 
+def _format_date(updated_at) -> str:
+    """Format a timestamp as YYYY-MM-DD, leaving strings unchanged."""
+    if isinstance(updated_at, str):
+        return updated_at
+    return updated_at.strftime("%Y-%m-%d")
+
+
+def _atomic_write(out_pth: pathlib.Path, content: str) -> None:
+    """Write content to out_pth so that readers never see a torn file.
+
+    Content is written to a temporary file in the destination directory,
+    flushed & fsynced to disk, then renamed over the destination. The
+    rename is atomic on POSIX & Windows as both files share a volume.
+    The file keeps the mode of the file it replaces, or gets the mode
+    `open()` would create it with.
+    """
+    out_pth = pathlib.Path(out_pth)
+    try:
+        mode = out_pth.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        # the umask can only be read by setting it
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp_pth = tempfile.mkstemp(
+        dir=out_pth.parent, prefix=f".{out_pth.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates files readable by their owner only
+        os.chmod(tmp_pth, mode)
+        os.replace(tmp_pth, out_pth)
+    except BaseException:
+        # never leave partial temp files lying around for quarto to find
+        pathlib.Path(tmp_pth).unlink(missing_ok=True)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # persist the rename itself, not supported on Windows
+        dir_fd = os.open(out_pth.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return None
+
+
+def build_thumbnails(
+    img_pth: pathlib.Path,
+    out_dir: pathlib.Path,
+    size: int = 64,
+    formats: Iterable[str] = ("webp", "png"),
+) -> Dict[str, pathlib.Path]:
+    """Write small, content-hashed thumbnails of a listing image.
+
+    Thumbnail file names include a hash of the source image, size &
+    format, so they can be served with a far-future cache lifetime.
+    Thumbnails that already exist are not regenerated, in which case
+    Pillow is not required. Thumbnails of the same size & format hashed
+    from a previous version of the image are deleted.
+
+    Parameters
+    ----------
+    img_pth: pathlib.Path
+        Path to the source image.
+    out_dir: pathlib.Path
+        Directory to write thumbnails to. Created if it does not exist.
+    size: int
+        Maximum width & height of the thumbnail in pixels, aspect ratio
+        is preserved. Defaults to 64.
+    formats: Iterable[str]
+        Image formats to write, by default a WebP with a PNG fallback.
+
+    Returns
+    -------
+    Dict[str, pathlib.Path]
+        Paths to the thumbnails, keyed by format.
+
+    Raises
+    ------
+    ImportError
+        A thumbnail needs generating but Pillow is not installed.
+    """
+    img_pth = pathlib.Path(img_pth)
+    out_dir = pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    src = img_pth.read_bytes()
+    thumbnails = dict()
+    for fmt in formats:
+        fmt = fmt.lower()
+        digest = hashlib.sha256(src + f"{size}{fmt}".encode()).hexdigest()
+        thumb_pth = out_dir / f"{img_pth.stem}-{size}.{digest[:10]}.{fmt}"
+        if not thumb_pth.exists():
+            if Image is None:
+                raise ImportError(
+                    "Pillow is required to generate thumbnails. Install "
+                    "with `pip install '.[images]'`"
+                )
+            with Image.open(img_pth) as im:
+                im.thumbnail((size, size), Image.LANCZOS)
+                if fmt == "webp":
+                    im.save(thumb_pth, "WEBP", quality=80, method=6)
+                else:
+                    im.save(thumb_pth, fmt.upper(), optimize=True)
+        thumbnails[fmt] = thumb_pth
+        # thumbnails of a previous version of the image are no longer
+        # referenced once the listings point at the current one
+        stale = re.compile(
+            rf"{re.escape(img_pth.stem)}-{size}\.[0-9a-f]{{10}}\.{fmt}"
+        )
+        for old_pth in out_dir.glob(f"{img_pth.stem}-{size}.*.{fmt}"):
+            if old_pth != thumb_pth and stale.fullmatch(old_pth.name):
+                old_pth.unlink()
+    return thumbnails
+
+
+def set_image_placeholder(qmd_pth: pathlib.Path, image_pth: str) -> bool:
+    """Point the listing image-placeholder of a quarto page at an image.
+
+    Used to reference the current content-hashed thumbnail, so the page
+    never points at a thumbnail that is no longer generated. The page is
+    written atomically & only if the placeholder changes.
+
+    Parameters
+    ----------
+    qmd_pth: pathlib.Path
+        Path to the quarto page with a listing in its front matter.
+    image_pth: str
+        Site path to the placeholder image.
+
+    Returns
+    -------
+    bool
+        True if the page was updated.
+
+    Raises
+    ------
+    ValueError
+        The page has no image-placeholder field.
+    """
+    qmd_pth = pathlib.Path(qmd_pth)
+    content = qmd_pth.read_text()
+    pattern = re.compile(r"^(\s*image-placeholder:).*$", re.MULTILINE)
+    if not pattern.search(content):
+        raise ValueError(f"No image-placeholder field in {qmd_pth}")
+    updated = pattern.sub(lambda m: f"{m.group(1)} {image_pth}", content)
+    if updated == content:
+        return False
+    _atomic_write(qmd_pth, updated)
+    return True
+
+
 def build_listings_from_parquet(
     prq_pth: pathlib.Path,
     template_pth: pathlib.Path,
     yaml_out_pth: pathlib.Path,
+    image_pth: str = DEFAULT_IMAGE_PTH,
+    org_nm: Union[None, str] = None,
 ) -> None:
     """Create the yaml file required to build quarto listings.
 
     Requires a parquet file of repo metadata and a template.txt,
-    containing the required yaml fields.
+    containing the required yaml fields. The outfile is written
+    atomically, an interrupted build leaves any previous listing intact.
 
     Parameters
     ----------
     pqr_pth: pathlib.Path
-        Path to the parquet repo metadata.
+        Path to the parquet repo metadata. Either a single parquet file
+        or, when `org_nm` is given, the root of a dataset written by
+        `parquet_utils.write_repo_dataset()`.
     template_pth: pathlib.Path
         Path to the template.txt with required yaml fields & formatting.
     yaml_out_pth: pathlib.Path
         Path to the outfile.
+    image_pth: str
+        Site path of the image displayed for every entry. Defaults to
+        the full size logo, see `build_thumbnails()` for a lighter one.
+    org_nm: Union[None, str]
+        Organisation partition to read from a repo dataset. Defaults to
+        None, reading `prq_pth` as a single parquet file.
 
     Returns
     -------
@@ -41,24 +221,88 @@ def build_listings_from_parquet(
     with open(template_pth, "r") as f:
         template = f.read()
         f.close()
-    dat = pd.read_parquet(prq_pth)
-    with open(yaml_out_pth, "w") as f:
-        for i, r in dat.iterrows():
-            desc = r["description"]
-            if desc:
-                # in cases where there is a description, some people use
-                # quotes and backslashes that need to be escaped/removed
-                desc = desc.replace("\\", "").replace('"', '\\"')
-            yaml_entry = template.format(
-                REPO_NM=r["name"].replace('"', '\\"'),
-                REPO_DESC=desc,
-                YYYY_MM_DD=r["updated_at"],
-                REPO_URL=r["html_url"],
-                ORG_NM=r["org_nm"],
-                TOPIC_LIST=[
-                    i for _li in r["topics"].values() for i in _li.tolist()
-                ],
-            )
-            f.write(yaml_entry)
-        f.close()
+    if org_nm is None:
+        dat = pd.read_parquet(prq_pth)
+    else:
+        dat = read_repo_dataset(prq_pth, org_nm=org_nm)
+    yaml_entries = []
+    for i, r in dat.iterrows():
+        desc = r["description"]
+        if desc:
+            # in cases where there is a description, some people use
+            # quotes and backslashes that need to be escaped/removed
+            desc = desc.replace("\\", "").replace('"', '\\"')
+        yaml_entry = template.format(
+            REPO_NM=r["name"].replace('"', '\\"'),
+            REPO_DESC=desc,
+            YYYY_MM_DD=_format_date(r["updated_at"]),
+            REPO_URL=r["html_url"],
+            ORG_NM=r["org_nm"],
+            TOPIC_LIST=_topic_list(r["topics"]),
+            IMAGE_PTH=image_pth,
+        )
+        yaml_entries.append(yaml_entry)
+    _atomic_write(yaml_out_pth, "".join(yaml_entries))
     return None
+
+
+def build_listings_for_orgs(
+    org_nms: List[str],
+    prq_dir: pathlib.Path,
+    template_pth: pathlib.Path,
+    yaml_out_dir: pathlib.Path,
+    image_pth: str = DEFAULT_IMAGE_PTH,
+    max_workers: Union[None, int] = None,
+) -> List[pathlib.Path]:
+    """Build quarto listings for several organisations in parallel.
+
+    Each organisation's listing is built in its own process from its
+    partition of the repo dataset & written atomically to
+    `<yaml_out_dir>/<org_nm>.yaml`.
+
+    Parameters
+    ----------
+    org_nms: List[str]
+        Organisation names to build listings for.
+    prq_dir: pathlib.Path
+        Root of the repo dataset written by
+        `parquet_utils.write_repo_dataset()`.
+    template_pth: pathlib.Path
+        Path to the template.txt with required yaml fields & formatting.
+    yaml_out_dir: pathlib.Path
+        Directory to write the listings to.
+    image_pth: str
+        Site path of the image displayed for every entry.
+    max_workers: Union[None, int]
+        Size of the process pool. Defaults to None, which uses the
+        number of available cores.
+
+    Returns
+    -------
+    List[pathlib.Path]
+        Paths to the written listings, in the order of `org_nms`.
+
+    Raises
+    ------
+    Exception
+        Any exception raised while building an organisation's listing.
+    """
+    out_pths = [
+        pathlib.Path(yaml_out_dir) / f"{nm}.yaml" for nm in org_nms
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                build_listings_from_parquet,
+                prq_dir,
+                template_pth,
+                out_pth,
+                image_pth,
+                nm,
+            )
+            for nm, out_pth in zip(org_nms, out_pths)
+        ]
+        for future in futures:
+            # re-raise any worker exception in the parent process
+            future.result()
+    return out_pths
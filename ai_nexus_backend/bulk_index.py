@@ -0,0 +1,279 @@
+"""Incremental OpenSearch indexing of transformed catalogue documents.
+
+Each document is identified by its project & matched field and hashed,
+so that a run can be diffed against the hashes kept from the previous
+run. Only the create, update & delete operations needed to bring the
+search backend up to date are emitted, as `_bulk` API NDJSON batches.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import json
+import pathlib
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+import requests
+
+from ai_nexus_backend.build_yaml import _atomic_write
+from ai_nexus_backend.requests_utils import (
+    _configure_requests,
+    _handle_response,
+    _url_defence,
+)
+
+# bulk API action used for each kind of operation. New & changed documents
+# are indexed whole: partial updates would keep removed metadata keys &
+# creates would conflict with documents a partly failed run did create
+BULK_ACTIONS = {"create": "index", "update": "index", "delete": "delete"}
+
+
+def document_id(doc: dict, id_field: str = "project_name") -> str:
+    """Stable ID of a transformed document.
+
+    Parameters
+    ----------
+    doc : dict
+        Document as returned by `data_prep_utils.transform_data()`.
+    id_field : str, optional
+        Metadata key holding a unique project ID. Defaults to
+        "project_name".
+
+    Returns
+    -------
+    str
+        The project ID & matched field, joined by "::".
+    """
+    meta = doc["meta"]
+    return f"{meta[id_field]}::{meta['matched_field']}"
+
+
+def document_hash(doc: dict) -> str:
+    """SHA-256 of a document's content & metadata."""
+    canonical = json.dumps(doc, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_hashes(pth: pathlib.Path) -> Dict[str, str]:
+    """Read document hashes written by save_hashes().
+
+    Returns an empty dictionary if `pth` does not exist, so that a first
+    run creates every document.
+    """
+    pth = pathlib.Path(pth)
+    if not pth.exists():
+        return dict()
+    with open(pth) as f:
+        return json.load(f)
+
+
+def save_hashes(hashes: Dict[str, str], pth: pathlib.Path) -> None:
+    """Atomically write document hashes, keyed by document ID."""
+    _atomic_write(pth, json.dumps(hashes, sort_keys=True, indent=0))
+    return None
+
+
+def promote_hashes(
+    previous: Dict[str, str],
+    hashes: Dict[str, str],
+    results: pd.DataFrame,
+) -> Dict[str, str]:
+    """Hashes reflecting the operations that succeeded.
+
+    Parameters
+    ----------
+    previous : Dict[str, str]
+        Document hashes the operations were diffed against.
+    hashes : Dict[str, str]
+        Document hashes of the run, as returned by `diff_documents()`.
+    results : pd.DataFrame
+        Per-operation results, as returned by `load_bulk_batches()`.
+
+    Returns
+    -------
+    Dict[str, str]
+        `previous`, updated with the hashes of documents indexed & less
+        the documents deleted without error, so that the next run only
+        emits the operations that failed.
+    """
+    promoted = dict(previous)
+    ok = results[results["error"].isna()]
+    for doc_id, action in zip(ok["_id"], ok["action"]):
+        if action == "delete":
+            promoted.pop(doc_id, None)
+        elif doc_id in hashes:
+            promoted[doc_id] = hashes[doc_id]
+    return promoted
+
+
+def diff_documents(
+    docs: Iterable[dict],
+    previous: Dict[str, str],
+    id_field: str = "project_name",
+) -> Tuple[List[tuple], Dict[str, str]]:
+    """Operations needed to turn the previous run's documents into docs.
+
+    Parameters
+    ----------
+    docs : Iterable[dict]
+        Documents as returned by `data_prep_utils.transform_data()`.
+    previous : Dict[str, str]
+        Document hashes from the previous run, keyed by document ID, as
+        returned by `load_hashes()`.
+    id_field : str, optional
+        Metadata key holding a unique project ID. Defaults to
+        "project_name".
+
+    Returns
+    -------
+    Tuple[List[tuple], Dict[str, str]]
+        The `(operation, document ID, document)` operations, where
+        operation is "create", "update" or "delete" & document is None
+        for deletes, and the hashes of docs to keep for the next run.
+
+    Raises
+    ------
+    ValueError
+        Two documents share a document ID.
+    """
+    ops = list()
+    hashes = dict()
+    for doc in docs:
+        doc_id = document_id(doc, id_field=id_field)
+        if doc_id in hashes:
+            raise ValueError(f"Duplicate document ID: {doc_id}")
+        hashes[doc_id] = document_hash(doc)
+        if doc_id not in previous:
+            ops.append(("create", doc_id, doc))
+        elif previous[doc_id] != hashes[doc_id]:
+            ops.append(("update", doc_id, doc))
+    # sorted so that output is reproducible
+    for doc_id in sorted(previous.keys() - hashes.keys()):
+        ops.append(("delete", doc_id, None))
+    return ops, hashes
+
+
+def iter_bulk_batches(
+    ops: Iterable[tuple], index_nm: str, batch_size: int = 500
+) -> Iterator[str]:
+    """Format operations as `_bulk` API request bodies.
+
+    Parameters
+    ----------
+    ops : Iterable[tuple]
+        Operations as returned by `diff_documents()`.
+    index_nm : str
+        Name of the target index.
+    batch_size : int, optional
+        Maximum number of operations per request body. Defaults to 500.
+
+    Returns
+    -------
+    Iterator[str]
+        NDJSON request bodies, each ending in a newline as the `_bulk`
+        API requires.
+
+    Raises
+    ------
+    ValueError
+        `batch_size` is less than 1.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be >= 1. Found {batch_size}")
+    lines = list()
+    n = 0
+    for op, doc_id, doc in ops:
+        action = {BULK_ACTIONS[op]: {"_index": index_nm, "_id": doc_id}}
+        lines.append(json.dumps(action))
+        if doc is not None:
+            lines.append(json.dumps(doc))
+        n += 1
+        if n == batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = list()
+            n = 0
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _bulk_items(resp: requests.Response) -> List[dict]:
+    """Flatten the per-operation results of a `_bulk` API response."""
+    rows = list()
+    for item in resp.json()["items"]:
+        for action, result in item.items():
+            rows.append(
+                {
+                    "_id": result.get("_id"),
+                    "action": action,
+                    "status": result.get("status"),
+                    "error": result.get("error"),
+                }
+            )
+    return rows
+
+
+def load_bulk_batches(
+    batches: Iterable[str],
+    url: str,
+    max_workers: int = 4,
+    sess: requests.Session = None,
+    timeout: float = 30.0,
+) -> pd.DataFrame:
+    """POST `_bulk` request bodies with bounded concurrency.
+
+    At most `max_workers` requests are in flight, and batches are only
+    drawn from `batches` as requests complete, so a generator of batches
+    is never read into memory ahead of the loader.
+
+    Parameters
+    ----------
+    batches : Iterable[str]
+        NDJSON request bodies, as returned by `iter_bulk_batches()`.
+    url : str
+        The `_bulk` endpoint, such as "https://localhost:9200/_bulk".
+    max_workers : int, optional
+        Maximum number of concurrent requests. Defaults to 4.
+    sess : requests.Session, optional
+        Session to send requests with. Defaults to a session with retry,
+        as configured by `requests_utils._configure_requests()`.
+    timeout : float, optional
+        Seconds to wait for each response. Defaults to 30.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per operation with `_id`, `action`, `status` & `error`
+        columns. Errors are reported per operation, rather than raised,
+        as the `_bulk` API applies operations independently.
+
+    Raises
+    ------
+    ValueError
+        `max_workers` is less than 1.
+    requests.HTTPError
+        A request was rejected as a whole.
+    """
+    _url_defence(url, "url", exp_protocol="http")
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be >= 1. Found {max_workers}")
+    if sess is None:
+        sess = _configure_requests()
+    headers = {"Content-Type": "application/x-ndjson"}
+
+    def _post(body: str) -> List[dict]:
+        resp = sess.post(url, data=body, headers=headers, timeout=timeout)
+        return _bulk_items(_handle_response(resp))
+
+    rows = list()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for body in batches:
+            pending.add(executor.submit(_post, body))
+            if len(pending) == max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rows.extend(future.result())
+        for future in pending:
+            rows.extend(future.result())
+    columns = ["_id", "action", "status", "error"]
+    return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,171 @@
+"""Utilities for writing precompressed static artifacts."""
+
+import gzip
+import hashlib
+import json
+import pathlib
+from typing import Dict, Iterable, Union
+
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:  # optional, `pip install '.[compression]'`
+    brotli = None
+
+SUPPORTED_ENCODINGS = ("gz", "br")
+TEXT_SUFFIXES = (
+    ".css",
+    ".html",
+    ".js",
+    ".json",
+    ".svg",
+    ".txt",
+    ".xml",
+)
+
+
+def _compress(content: bytes, encoding: str) -> bytes:
+    """Compress content at maximum compression for the given encoding."""
+    if encoding == "gz":
+        # fixed mtime keeps the output reproducible between builds
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    elif encoding == "br":
+        if brotli is None:
+            raise ImportError(
+                "brotli is required for 'br' encoding. Install with "
+                "`pip install '.[compression]'`"
+            )
+        return brotli.compress(content, quality=11)
+    else:
+        raise ValueError(
+            f"encoding expects one of {', '.join(SUPPORTED_ENCODINGS)}."
+            f" Found {encoding}"
+        )
+
+
+def available_encodings(
+    encodings: Iterable[str] = SUPPORTED_ENCODINGS,
+) -> tuple:
+    """Filter encodings to those supported by the installed packages."""
+    return tuple(e for e in encodings if e != "br" or brotli is not None)
+
+
+def write_compressed_siblings(
+    pth: pathlib.Path,
+    encodings: Iterable[str] = SUPPORTED_ENCODINGS,
+) -> Dict[str, pathlib.Path]:
+    """Write compressed copies of a file alongside the original.
+
+    A file at `search.json` will have compressed siblings written to
+    `search.json.gz` & `search.json.br`.
+
+    Parameters
+    ----------
+    pth: pathlib.Path
+        Path to the file to compress.
+    encodings: Iterable[str]
+        The encodings to write, any of "gz" or "br". Defaults to both.
+
+    Returns
+    -------
+    Dict[str, pathlib.Path]
+        Paths to the written siblings, keyed by encoding.
+
+    Raises
+    ------
+    ValueError
+        An encoding is not supported.
+    ImportError
+        "br" encoding was requested but brotli is not installed.
+    """
+    pth = pathlib.Path(pth)
+    content = pth.read_bytes()
+    siblings = dict()
+    for encoding in encodings:
+        sibling_pth = pth.with_name(f"{pth.name}.{encoding}")
+        sibling_pth.write_bytes(_compress(content, encoding))
+        siblings[encoding] = sibling_pth
+    return siblings
+
+
+def precompress_directory(
+    root: pathlib.Path,
+    manifest_pth: Union[None, pathlib.Path] = None,
+    suffixes: Iterable[str] = TEXT_SUFFIXES,
+    encodings: Union[None, Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Write compressed siblings for every text artifact under root.
+
+    Files whose content hash matches the manifest from a previous run,
+    and whose siblings still exist, are skipped. Siblings of files in
+    that manifest which no longer exist, or are no longer compressed,
+    are deleted & dropped from the manifest.
+
+    Parameters
+    ----------
+    root: pathlib.Path
+        Directory of static artifacts, such as the rendered `docs/`.
+    manifest_pth: Union[None, pathlib.Path]
+        JSON file recording content hashes between runs. Defaults to
+        `.<root name>_precompress_manifest.json` alongside root, outside
+        the served directory.
+    suffixes: Iterable[str]
+        File extensions to compress. Defaults to TEXT_SUFFIXES.
+    encodings: Union[None, Iterable[str]]
+        Encodings to write. Defaults to all available encodings.
+
+    Returns
+    -------
+    pd.DataFrame
+        Size report with one row per artifact: the relative path, size
+        in bytes of the original & each encoding, and whether the file
+        was skipped as unchanged.
+    """
+    root = pathlib.Path(root)
+    if manifest_pth is None:
+        manifest_pth = root.with_name(
+            f".{root.name}_precompress_manifest.json"
+        )
+    manifest_pth = pathlib.Path(manifest_pth)
+    if encodings is None:
+        encodings = available_encodings()
+    encodings = tuple(encodings)
+    suffixes = tuple(suffixes)
+    try:
+        manifest = json.loads(manifest_pth.read_text())
+    except FileNotFoundError:
+        manifest = dict()
+
+    report = list()
+    new_manifest = dict()
+    for pth in sorted(root.rglob("*")):
+        if (
+            not pth.is_file()
+            or pth.suffix not in suffixes
+            or pth == manifest_pth
+        ):
+            continue
+        rel_pth = pth.relative_to(root).as_posix()
+        digest = hashlib.sha256(pth.read_bytes()).hexdigest()
+        siblings = {e: pth.with_name(f"{pth.name}.{e}") for e in encodings}
+        skipped = manifest.get(rel_pth) == digest and all(
+            s.exists() for s in siblings.values()
+        )
+        if not skipped:
+            siblings = write_compressed_siblings(pth, encodings)
+        new_manifest[rel_pth] = digest
+        row = {"path": rel_pth, "bytes": pth.stat().st_size}
+        for e, sibling_pth in siblings.items():
+            row[f"{e}_bytes"] = sibling_pth.stat().st_size
+        row["skipped"] = skipped
+        report.append(row)
+
+    # siblings of artifacts deleted or renamed since the previous run
+    for rel_pth in manifest.keys() - new_manifest.keys():
+        for e in SUPPORTED_ENCODINGS:
+            (root / f"{rel_pth}.{e}").unlink(missing_ok=True)
+
+    manifest_pth.write_text(json.dumps(new_manifest, indent=2))
+    columns = ["path", "bytes"] + [f"{e}_bytes" for e in encodings]
+    return pd.DataFrame(report, columns=columns + ["skipped"])
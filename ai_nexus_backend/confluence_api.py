@@ -1,17 +1,212 @@
 """Integrating with Atlassian confluence api."""
 
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
 import json
+import pathlib
+import re
+from typing import Callable, Dict, Iterator, List, Union
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import pandas as pd
 from requests import Response
 
-from ai_nexus_backend.build_yaml import _parse_yaml
+from ai_nexus_backend.build_yaml import _atomic_write, _parse_yaml
 from ai_nexus_backend.requests_utils import (
+    _configure_http2,
     _configure_requests,
     _handle_response,
     _url_defence,
 )
 
+try:
+    from lxml import html as lxml_html
+except ImportError:  # optional, install with `pip install '.[html]'`
+    lxml_html = None
+
+METADATA_FORMATS = ("yaml", "json")
+PARSER_BACKENDS = ("html.parser", "strainer", "lxml", "stream")
+_STREAM_CHUNK_SIZE = 2**16
+_PAGE_ID_PATTERN = re.compile(
+    r"/pages/(?:viewpage\.action\?pageId=)?(\d+)"
+)
+
+
+class _StopParsing(Exception):
+    """Raised by _CodeBlockParser once the page has a second code block."""
+
+
+class _CodeBlockParser(HTMLParser):
+    """Collects the text of the first code element, stopping at a second.
+
+    Text is gathered from the first code element & any elements nested in
+    it, as BeautifulSoup's `Tag.text` does.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.n_code = 0
+        self.text = list()
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "code":
+            self.n_code += 1
+            if self.n_code > 1:
+                raise _StopParsing
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "code" and self._depth:
+            self._depth -= 1
+
+    def handle_data(self, data):
+        if self._depth:
+            self.text.append(data)
+
+
+def _decode(content: Union[bytes, str]) -> str:
+    """Decode page content, which Confluence serves as UTF-8."""
+    if isinstance(content, bytes):
+        return content.decode("utf-8", errors="replace")
+    return content
+
+
+def _code_texts_stream(content: bytes) -> List[str]:
+    """Text of up to two code elements, from a streaming tokenizer."""
+    content = _decode(content)
+    parser = _CodeBlockParser()
+    try:
+        for start in range(0, len(content), _STREAM_CHUNK_SIZE):
+            end = start + _STREAM_CHUNK_SIZE
+            parser.feed(content[start:end])
+        parser.close()
+    except _StopParsing:
+        pass
+    if not parser.n_code:
+        return []
+    # only the first element's text is collected
+    return ["".join(parser.text)] + [""] * (parser.n_code - 1)
+
+
+def _code_texts_soup(content: bytes, parser: str) -> List[str]:
+    """Text of every code element, from a BeautifulSoup tree."""
+    if parser == "strainer":
+        soup = BeautifulSoup(
+            content, "html.parser", parse_only=SoupStrainer("code")
+        )
+    else:
+        soup = BeautifulSoup(content, parser)
+    return [el.text for el in soup.find_all("code")]
+
+
+def _require_lxml() -> None:
+    """Raise if the optional lxml dependency is not installed."""
+    if lxml_html is None:
+        raise ImportError(
+            "lxml is required for the 'lxml' parser. Install with "
+            "`pip install '.[html]'`"
+        )
+    return None
+
+
+def _code_texts_lxml(content: bytes) -> List[str]:
+    """Text of every code element, from an lxml tree."""
+    _require_lxml()
+    # lxml assumes latin-1 for bytes without a declared charset
+    content = _decode(content)
+    if not content.strip():
+        return []
+    return [
+        el.text_content()
+        for el in lxml_html.fromstring(content).iter("code")
+    ]
+
+
+def _parse_code_block(content: bytes, parser: str = "html.parser") -> str:
+    """Text of the single code element in page content.
+
+    `parser` is one of PARSER_BACKENDS: "html.parser" builds a full
+    BeautifulSoup tree, "strainer" builds a tree of code elements only,
+    "lxml" builds an lxml tree & "stream" tokenizes the page without
+    building a tree, stopping as soon as a second code element is found.
+    """
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(
+            f"parser must be one of {PARSER_BACKENDS}. Found {parser}"
+        )
+    if parser == "stream":
+        code_texts = _code_texts_stream(content)
+    elif parser == "lxml":
+        code_texts = _code_texts_lxml(content)
+    else:
+        code_texts = _code_texts_soup(content, parser)
+    # there must be a single code element, cannot set or target an
+    # ID in Confluence apparently, reference:
+    # https://community.atlassian.com/t5/Confluence-questions/Is-it-possible-to-create-ID-s-for-web-elements/qaq-p/1891040
+    n = len(code_texts)
+    if n == 0:
+        raise ValueError("No code elements were found on this page.")
+    elif n > 1:
+        raise NotImplementedError(
+            "More than one code block was found on this page."
+        )
+    return code_texts[0]
+
+
+def _parse_metadata(meta_text: str, fmt: str) -> dict:
+    """Parse code block text in a metadata format."""
+    return (
+        json.loads(meta_text) if fmt == "json" else _parse_yaml(meta_text)
+    )
+
+
+def _parse_storage_code_block(storage: str) -> str:
+    """Text of the single code macro in storage format page content."""
+    soup = BeautifulSoup(storage, "html.parser")
+    macros = soup.find_all(
+        "ac:structured-macro", attrs={"ac:name": "code"}
+    )
+    n = len(macros)
+    if n == 0:
+        raise ValueError("No code elements were found on this page.")
+    elif n > 1:
+        raise NotImplementedError(
+            "More than one code block was found on this page."
+        )
+    body = macros[0].find("ac:plain-text-body")
+    return body.text if body is not None else ""
+
+
+def _load_page_cache(cache_pth: pathlib.Path) -> Dict[str, dict]:
+    """Read the page cache, empty if it does not exist yet."""
+    cache_pth = pathlib.Path(cache_pth)
+    if not cache_pth.exists():
+        return dict()
+    with open(cache_pth) as f:
+        return json.load(f)
+
+
+def _error_message(e: Exception) -> str:
+    """Exception type & message, as recorded in error columns."""
+    return f"{type(e).__name__}: {e}"
+
+
+def _metadata_row(ids: dict, extract: Callable[[], dict]) -> dict:
+    """Row of extracted metadata, recording rather than raising errors."""
+    try:
+        meta = extract()
+    except Exception as e:
+        return {**ids, "error": _error_message(e)}
+    return {**meta, **ids, "error": None}
+
+
+def _metadata_frame(rows: List[dict], id_cols: List[str]) -> pd.DataFrame:
+    """Frame of metadata rows, ID columns first & error last."""
+    dat = pd.DataFrame(rows)
+    keys = [c for c in dat.columns if c not in id_cols + ["error"]]
+    return dat.reindex(columns=id_cols + keys + ["error"])
+
 
 class ConfluenceClient:
     """A client for interacting with the Atlassian Confluence API.
@@ -27,6 +222,16 @@ class ConfluenceClient:
         The personal access token for authentication.
     user_agent : str, optional
         The user agent string to be used in HTTP requests.
+    parser : str, optional
+        How pages are parsed to find their code element, one of
+        PARSER_BACKENDS. Defaults to "html.parser". The faster backends
+        are opt-in: "stream" tokenizes pages as "html.parser" does
+        without building a tree & "lxml" is fastest, install with
+        `pip install '.[html]'`.
+    http2 : bool, optional
+        Multiplex concurrent requests over a single HTTP/2 connection,
+        see `requests_utils.Http2Session`. Install with
+        `pip install '.[http2]'`. Defaults to False.
 
     Attributes
     ----------
@@ -42,15 +247,44 @@ class ConfluenceClient:
         Extract metadata from a site with a JSON code block.
     extract_yaml_metadata(url:str) -> dict
         Extracts metadata from a site with a YAML code block.
+    extract_metadata_bulk(urls:list, fmt:str, max_workers:int) -> DataFrame
+        Concurrently extracts metadata from many sites' code blocks.
+    iter_cql_pages(base_url:str, cql:str, expand:str, limit:int) -> Iterator
+        Yields the content matching a CQL query, page by page.
+    crawl_metadata(base_url:str, space_key:str, label:str, cql:str,
+    fmt:str) -> DataFrame
+        Extracts metadata from every page in a space or with a label.
+    get_page_versions(base_url:str, page_ids:list, batch_size:int) -> dict
+        Looks up the current version number of many pages.
+    extract_metadata_cached(base_url:str, urls:list, cache_pth:Path,
+    fmt:str, max_workers:int) -> DataFrame
+        Extracts metadata from many pages, re-fetching only changed pages.
     return_page_text(url:str) -> str
         Returns the web page text for the provided url.
     """
 
-    def __init__(self, atlassian_email, atlassian_pat, user_agent=None):
+    def __init__(
+        self,
+        atlassian_email,
+        atlassian_pat,
+        user_agent=None,
+        parser="html.parser",
+        http2=False,
+    ):
+        if parser not in PARSER_BACKENDS:
+            raise ValueError(
+                f"parser must be one of {PARSER_BACKENDS}. Found {parser}"
+            )
+        if parser == "lxml":
+            _require_lxml()
+        self.parser = parser
         self.__email = atlassian_email
         self.__pat = atlassian_pat
         self.__agent = user_agent
-        self._session = self._configure_atlassian()
+        if http2:
+            self._session = self._configure_atlassian(_configure_http2())
+        else:
+            self._session = self._configure_atlassian()
 
     def _configure_atlassian(self, _session=_configure_requests()):
         """Set up a request Session with retry & backoff spec."""
@@ -93,19 +327,7 @@ class ConfluenceClient:
 
         _url_defence(url, param_nm="url")
         self._get_atlassian_page_content(url)  # updates self.response
-        soup = BeautifulSoup(self.response.content, "html.parser")
-        # there must be a single code element, cannot set or target an
-        # ID in Confluence apparently, reference:
-        # https://community.atlassian.com/t5/Confluence-questions/Is-it-possible-to-create-ID-s-for-web-elements/qaq-p/1891040
-        code_elements = soup.find_all("code")
-        n = len(code_elements)
-        if n == 0:
-            raise ValueError("No code elements were found on this page.")
-        elif n > 1:
-            raise NotImplementedError(
-                "More than one code block was found on this page."
-            )
-        meta_text = code_elements[0].text
+        meta_text = _parse_code_block(self.response.content, self.parser)
         self.meta_text = meta_text
         return meta_text
 
@@ -136,7 +358,7 @@ class ConfluenceClient:
             If more than one code block is found on the page.
         """
         self._find_code_metadata(url)
-        meta = json.loads(self.meta_text)
+        meta = _parse_metadata(self.meta_text, "json")
         self.metadata = meta
         return meta
 
@@ -167,10 +389,343 @@ class ConfluenceClient:
             If more than one code block is found on the page.
         """
         self._find_code_metadata(url)
-        meta = _parse_yaml(self.meta_text)
+        meta = _parse_metadata(self.meta_text, "yaml")
         self.metadata = meta
         return meta
 
+    def _fetch_metadata(self, url: str, fmt: str) -> dict:
+        """Extract metadata from url without updating state."""
+        _url_defence(url, param_nm="url")
+        resp = _handle_response(self._session.get(url))
+        meta_text = _parse_code_block(resp.content, self.parser)
+        return _parse_metadata(meta_text, fmt)
+
+    def extract_metadata_bulk(
+        self, urls: List[str], fmt: str = "yaml", max_workers: int = 8
+    ) -> pd.DataFrame:
+        """
+        Extracts metadata from the code blocks of many pages concurrently.
+
+        Unlike extract_yaml_metadata & extract_json_metadata, no state is
+        stored on the client, so pages are fetched & parsed in a pool of
+        threads. Failures are recorded per page rather than raised.
+
+        Parameters
+        ----------
+        urls : List[str]
+            The URLs of the Confluence pages.
+        fmt : str, optional
+            Format of the code blocks, "yaml" or "json". Defaults to
+            "yaml".
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to 8, below
+            the session's connection pool size of 10.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per url, in order, with a `url` column, a column per
+            metadata key & an `error` column holding the exception
+            message for pages that could not be extracted, else None.
+
+        Raises
+        ------
+        ValueError
+            If `fmt` is not a supported format.
+        """
+        if fmt not in METADATA_FORMATS:
+            raise ValueError(
+                f"fmt must be one of {METADATA_FORMATS}. Found {fmt}"
+            )
+
+        def _extract(url: str) -> dict:
+            return _metadata_row(
+                {"url": url}, lambda: self._fetch_metadata(url, fmt)
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(_extract, urls))
+        return _metadata_frame(rows, ["url"])
+
+    def iter_cql_pages(
+        self,
+        base_url: str,
+        cql: str,
+        expand: str = "body.storage,version",
+        limit: int = 50,
+    ) -> Iterator[dict]:
+        """Yields the content matching a CQL query, page by page.
+
+        Follows the cursor in each response's `next` link, so results
+        are never skipped or repeated as content changes mid-crawl.
+
+        Parameters
+        ----------
+        base_url : str
+            The Confluence site, such as
+            "https://<site>.atlassian.net/wiki".
+        cql : str
+            The Confluence Query Language query.
+        expand : str, optional
+            Comma separated properties to include in each result.
+            Defaults to the storage format body & version, so that no
+            further request per page is needed.
+        limit : int, optional
+            Results per request. Defaults to 50, larger values may be
+            capped by Confluence when bodies are expanded.
+
+        Returns
+        -------
+        Iterator[dict]
+            The content search results.
+
+        Raises
+        ------
+        TypeError
+            If `base_url` is not a string.
+        ValueError
+            If `base_url` does not begin with https://.
+        HTTPError
+            If a request to the Confluence API fails.
+        """
+        _url_defence(base_url, param_nm="base_url")
+        base_url = base_url.rstrip("/")
+        url = f"{base_url}/rest/api/content/search"
+        params = {"cql": cql, "expand": expand, "limit": limit}
+        while url:
+            resp = _handle_response(self._session.get(url, params=params))
+            content = resp.json()
+            yield from content["results"]
+            links = content.get("_links", {})
+            next_link = links.get("next")
+            # the next link holds the cursor & every other parameter
+            url = next_link and links.get("base", base_url) + next_link
+            params = None
+
+    def crawl_metadata(
+        self,
+        base_url: str,
+        space_key: Union[None, str] = None,
+        label: Union[None, str] = None,
+        cql: Union[None, str] = None,
+        fmt: str = "yaml",
+    ) -> pd.DataFrame:
+        """Extracts metadata from every page in a space or with a label.
+
+        Pages are discovered with a CQL search whose results include the
+        storage format body, so each page costs no further request. The
+        page's code macro is parsed as for extract_yaml_metadata.
+
+        Parameters
+        ----------
+        base_url : str
+            The Confluence site, such as
+            "https://<site>.atlassian.net/wiki".
+        space_key : str, optional
+            Only crawl pages in this space.
+        label : str, optional
+            Only crawl pages with this label.
+        cql : str, optional
+            A CQL query to crawl instead of `space_key` & `label`.
+        fmt : str, optional
+            Format of the code blocks, "yaml" or "json". Defaults to
+            "yaml".
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per page with `page_id` & `url` columns, a column per
+            metadata key & an `error` column holding the exception
+            message for pages that could not be extracted, else None.
+
+        Raises
+        ------
+        ValueError
+            If `fmt` is not a supported format, or none or both of `cql`
+            and `space_key` or `label` are given.
+        """
+        if fmt not in METADATA_FORMATS:
+            raise ValueError(
+                f"fmt must be one of {METADATA_FORMATS}. Found {fmt}"
+            )
+        filters = {"space": space_key, "label": label}
+        if (cql is None) == all(v is None for v in filters.values()):
+            raise ValueError(
+                "Provide either cql, or space_key and/or label."
+            )
+        if cql is None:
+            cql = " AND ".join(
+                ["type = page"]
+                + [
+                    f"{k} = {json.dumps(v)}"
+                    for k, v in filters.items()
+                    if v is not None
+                ]
+            )
+        rows = list()
+        for page in self.iter_cql_pages(base_url, cql):
+            webui = page.get("_links", {}).get("webui", "")
+            ids = {
+                "page_id": page["id"],
+                "url": base_url.rstrip("/") + webui,
+            }
+            storage = (
+                page.get("body", {}).get("storage", {}).get("value", "")
+            )
+            rows.append(
+                _metadata_row(
+                    ids,
+                    lambda: _parse_metadata(
+                        _parse_storage_code_block(storage), fmt
+                    ),
+                )
+            )
+        return _metadata_frame(rows, ["page_id", "url"])
+
+    def get_page_versions(
+        self, base_url: str, page_ids: List[str], batch_size: int = 100
+    ) -> Dict[str, int]:
+        """Looks up the current version number of many pages.
+
+        Versions are requested in bulk, through CQL searches for up to
+        `batch_size` page IDs at a time, without page bodies.
+
+        Parameters
+        ----------
+        base_url : str
+            The Confluence site, such as
+            "https://<site>.atlassian.net/wiki".
+        page_ids : List[str]
+            IDs of the pages to look up.
+        batch_size : int, optional
+            Page IDs per request. Defaults to 100.
+
+        Returns
+        -------
+        Dict[str, int]
+            Version numbers keyed by page ID. Pages that do not exist or
+            cannot be viewed are missing.
+        """
+        versions = dict()
+        page_ids = list(dict.fromkeys(page_ids))
+        for start in range(0, len(page_ids), batch_size):
+            end = start + batch_size
+            batch = page_ids[start:end]
+            cql = f"id in ({','.join(batch)})"
+            pages = self.iter_cql_pages(
+                base_url, cql, expand="version", limit=batch_size
+            )
+            for page in pages:
+                versions[page["id"]] = page["version"]["number"]
+        return versions
+
+    def extract_metadata_cached(
+        self,
+        base_url: str,
+        urls: List[str],
+        cache_pth: pathlib.Path,
+        fmt: str = "yaml",
+        max_workers: int = 8,
+    ) -> pd.DataFrame:
+        """
+        Extracts metadata from many pages, re-fetching only changed pages.
+
+        The metadata of each page is cached in a json file, keyed by page
+        ID with the page version it was parsed from. Current versions are
+        looked up in bulk with get_page_versions, and only pages whose
+        version moved, or that are not cached, are fetched & parsed, as
+        with extract_metadata_bulk.
+
+        Parameters
+        ----------
+        base_url : str
+            The Confluence site, such as
+            "https://<site>.atlassian.net/wiki".
+        urls : List[str]
+            The URLs of the Confluence pages, containing their page IDs.
+        cache_pth : pathlib.Path
+            Path of the json cache file. Created if it does not exist.
+        fmt : str, optional
+            Format of the code blocks, "yaml" or "json". Defaults to
+            "yaml".
+        max_workers : int, optional
+            Maximum number of concurrent page requests. Defaults to 8.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per url, in order, with `page_id`, `url` & `cached`
+            columns, a column per metadata key & an `error` column
+            holding the exception message for pages that could not be
+            extracted, else None.
+
+        Raises
+        ------
+        ValueError
+            If `fmt` is not a supported format.
+        """
+        if fmt not in METADATA_FORMATS:
+            raise ValueError(
+                f"fmt must be one of {METADATA_FORMATS}. Found {fmt}"
+            )
+        cache = _load_page_cache(cache_pth)
+        matches = {url: _PAGE_ID_PATTERN.search(url) for url in urls}
+        page_ids = {url: m.group(1) for url, m in matches.items() if m}
+        versions = self.get_page_versions(
+            base_url, list(page_ids.values())
+        )
+
+        def _is_fresh(page_id: str) -> bool:
+            entry = cache.get(page_id)
+            return (
+                entry is not None
+                and entry["fmt"] == fmt
+                and entry["version"] == versions.get(page_id)
+            )
+
+        stale = [
+            url
+            for url, page_id in page_ids.items()
+            if page_id in versions and not _is_fresh(page_id)
+        ]
+
+        def _fetch(url: str) -> Union[None, str]:
+            try:
+                meta = self._fetch_metadata(url, fmt)
+            except Exception as e:
+                return _error_message(e)
+            cache[page_ids[url]] = {
+                "version": versions[page_ids[url]],
+                "fmt": fmt,
+                "metadata": meta,
+            }
+            return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            errors = dict(zip(stale, executor.map(_fetch, stale)))
+        _atomic_write(cache_pth, json.dumps(cache))
+
+        rows = list()
+        for url in urls:
+            page_id = page_ids.get(url)
+            if page_id is None:
+                error = f"ValueError: No page ID found in url: {url}"
+            elif page_id not in versions:
+                error = f"LookupError: Page {page_id} was not found"
+            else:
+                error = errors.get(url)
+            ids = {
+                "page_id": page_id,
+                "url": url,
+                "cached": error is None and url not in errors,
+            }
+            if error is None:
+                meta = cache[page_id]["metadata"]
+                rows.append({**meta, **ids, "error": None})
+            else:
+                rows.append({**ids, "error": error})
+        return _metadata_frame(rows, ["page_id", "url", "cached"])
+
     def return_page_text(self, url: str) -> str:
         """Returns text from confluence page content.
 
@@ -6,16 +6,158 @@ TO UPDATE
  - The columns to search over are hard-coded
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import json
+import os
+import textwrap
+from typing import Iterable, Iterator
+import unicodedata
 
+import pyarrow as pa
+import pyarrow.compute as pc
 
-def fetch_data(fname: str) -> list:
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+# Translation tables applied by normalise_text. Typographic punctuation
+# is folded to ASCII, which NFKC leaves alone
+PUNCTUATION_TABLE = {
+    "\u2018": "'",
+    "\u2019": "'",
+    "\u201c": '"',
+    "\u201d": '"',
+    "\u2013": "-",
+    "\u2014": "-",
+    "\u2026": "...",
+}
+# Zero-width characters are deleted
+ZERO_WIDTH_TABLE = {c: "" for c in "\u200b\u200c\u200d\u2060\ufeff"}
+# Unicode whitespace, as str.isspace() defines it, other than the space.
+# Runs of whitespace collapse to one space. RE2 syntax, as used by
+# pyarrow.compute
+_OTHER_WHITESPACE = (
+    r"\t\n\f\r\x{0b}\x{1c}-\x{1f}\x{85}\x{a0}\x{1680}\x{2000}-\x{200a}"
+    r"\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}"
+)
+_WHITESPACE_RUN = f"[ {_OTHER_WHITESPACE}]+"
+_UNCOLLAPSED = f"[{_OTHER_WHITESPACE}]|  |^ | $"
+
+# Key under which normalise_text keeps lowercase copies of the fields
+LOWERCASE_KEY = "_lower"
+
+# If the data contains multiple fields we'd want to search over, list
+# them here
+FIELDS_TO_SEARCH = [
+    "project_name",
+    "description",
+    "what_does_this_initiative_do",
+    "reasons_for_use",
+    "problem_solved_by_the_initiative",
+    "metrics_or_intended_impacts",
+]
+
+
+def _field_meta(project: dict, field: str) -> dict:
+    """Metadata of the document for one field of a project, carrying the
+    lowercase copy of that field only, if normalise_text added them."""
+    meta = project.copy()
+    meta["matched_field"] = field
+    if LOWERCASE_KEY in meta:
+        meta[f"{field}_lower"] = meta.pop(LOWERCASE_KEY).get(field)
+    return meta
+
+
+def _clean_project(project: dict) -> dict:
+    """Replace newlines as they interfere with the matching."""
+    return {
+        k: v.replace("\n", " ") if v is not None else v
+        for k, v in project.items()
+    }
+
+
+def iter_json_array(fname: str, chunk_size: int = 2**16) -> Iterator:
+    """
+    Incrementally parse the items of a top-level json array.
+
+    Only the item currently being decoded is held in memory, so files
+    far larger than the available memory can be read.
+
+    Args
+    :fname: Name/path of the json file to be read in
+    :chunk_size: Number of characters to read from the file at a time
+
+    Return
+    Generator of the decoded array items.
+
+    Raises
+    ValueError if the file does not contain a json array.
+    """
+    decoder = json.JSONDecoder()
+    with open(fname) as f:
+        buf = ""
+        pos = 0
+        eof = False
+        need_more = False
+        started = False
+        expect_item = True
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buf) or need_more:
+                if eof and started:
+                    raise ValueError(f"Unexpected end of file in {fname}")
+                elif eof:
+                    raise ValueError(f"Expected a json array in {fname}")
+                # discard consumed input, keeping any partial item
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                need_more = False
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"Expected a json array in {fname}")
+                started = True
+                pos += 1
+            elif buf[pos] == "]":
+                return
+            elif buf[pos] == "," and not expect_item:
+                expect_item = True
+                pos += 1
+            elif not expect_item:
+                raise json.JSONDecodeError("Expecting ','", buf, pos)
+            else:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    need_more = True
+                    continue
+                if not eof and (
+                    end == len(buf) or buf[end] in _NUMBER_CHARS
+                ):
+                    # a number may continue into the next chunk
+                    need_more = True
+                    continue
+                yield item
+                pos = end
+                expect_item = False
+
+
+def fetch_data(fname: str, replace_newlines: bool = True) -> list:
     """
     Read data from a json file into a list. Perform some basic data
     cleaning.
 
     Args
     :fname: Name/path of the json file to be read in
+    :replace_newlines: Whether to replace newlines in every value. Not
+    needed where normalise_text collapses the whitespace of the fields to
+    search
 
     Return
     A list containing dictionaries with details of projects to include
@@ -26,15 +168,182 @@ def fetch_data(fname: str) -> list:
         project_list = json.load(f)
 
     # Replace newlines as they interfere with the matching
-    project_list = [
+    if replace_newlines:
+        project_list = [_clean_project(p) for p in project_list]
+
+    return project_list
+
+
+def iter_fetch_data(fname: str, chunk_size: int = 2**16) -> Iterator[dict]:
+    """
+    Streaming equivalent of fetch_data. Projects are read and cleaned
+    one at a time, so memory use does not grow with the file size.
+
+    Args
+    :fname: Name/path of the json file to be read in
+    :chunk_size: Number of characters to read from the file at a time
+
+    Return
+    Generator of dictionaries with details of projects to include in the
+    catalogue.
+    """
+    for project in iter_json_array(fname, chunk_size=chunk_size):
+        yield _clean_project(project)
+
+
+def _apply_where(col: pa.Array, mask: pa.Array, fn) -> pa.Array:
+    """Apply a column function to only the values where mask is true."""
+    mask = pc.fill_null(mask, False)
+    if not pc.any(mask).as_py():
+        return col
+    return pc.replace_with_mask(col, mask, fn(pc.filter(col, mask)))
+
+
+def _nfkc(col: pa.Array) -> pa.Array:
+    """NFKC normalise the values of a string column.
+
+    ASCII text is already NFKC normalised, so only the remaining values
+    are normalised in python. pyarrow's utf8_normalize kernel is not used
+    as pyarrow 17 returns decomposed text for the composed forms.
+    """
+    return _apply_where(
+        col,
+        pc.invert(pc.string_is_ascii(col)),
+        lambda c: pa.array(
+            [unicodedata.normalize("NFKC", v) for v in c.to_pylist()],
+            type=pa.string(),
+        ),
+    )
+
+
+def _fold_unicode(col: pa.Array, nfkc: bool = True) -> pa.Array:
+    """Fold punctuation, delete zero-width characters & NFKC normalise.
+
+    Every step only changes non-ASCII text, so only non-ASCII values are
+    visited. Punctuation is folded first, leaving fewer values for the
+    python NFKC.
+    """
+
+    def fold(c: pa.Array) -> pa.Array:
+        for mapping in [PUNCTUATION_TABLE, ZERO_WIDTH_TABLE]:
+            for old, new in mapping.items():
+                c = pc.replace_substring(c, old, new)
+        return _nfkc(c) if nfkc else c
+
+    return _apply_where(col, pc.invert(pc.string_is_ascii(col)), fold)
+
+
+def _collapse_whitespace(col: pa.Array) -> pa.Array:
+    """Collapse whitespace runs to a space & trim a string column.
+
+    A cheap regex match finds the values needing the rewrite first, as
+    most catalogue text is already tidy.
+    """
+    return _apply_where(
+        col,
+        pc.match_substring_regex(col, _UNCOLLAPSED),
+        lambda c: pc.utf8_trim(
+            pc.replace_substring_regex(c, _WHITESPACE_RUN, " "), " "
+        ),
+    )
+
+
+def normalise_text_table(
+    table: pa.Table,
+    fields_to_search: Iterable[str] = FIELDS_TO_SEARCH,
+    nfkc: bool = True,
+    lowercase: bool = True,
+) -> pa.Table:
+    """
+    Columnar implementation of normalise_text, applying each step to a
+    whole Arrow string column at a time.
+
+    Args
+    :table: Table with a string column for each field to search
+    :fields_to_search: Names of the columns to normalise. Other columns
+    are left as they are
+    :nfkc: Whether to apply NFKC unicode normalisation
+    :lowercase: Whether to add a lowercase `<field>_lower` shadow column
+    for each field
+
+    Return
+    The table with normalised columns, and shadow columns appended if
+    lowercase is True.
+    """
+    for field in fields_to_search:
+        col = table[field].combine_chunks().cast(pa.string())
+        col = _fold_unicode(col, nfkc=nfkc)
+        col = _collapse_whitespace(col)
+        table = table.set_column(
+            table.schema.get_field_index(field), field, col
+        )
+        if lowercase:
+            table = table.append_column(
+                f"{field}_lower", pc.utf8_lower(col)
+            )
+    return table
+
+
+def normalise_text(
+    project_list: Iterable[dict],
+    fields_to_search: Iterable[str] = FIELDS_TO_SEARCH,
+    nfkc: bool = True,
+    lowercase: bool = True,
+) -> list:
+    """
+    Normalise the text of the fields to search over. Only those fields
+    are touched, and each step is applied column by column over Arrow
+    string arrays rather than value by value. The exception is NFKC,
+    which is applied in python to the values that are not pure ASCII.
+
+    In order, typographic punctuation is folded using PUNCTUATION_TABLE,
+    zero-width characters are deleted, each field is NFKC normalised, and
+    runs of whitespace, including newlines, are collapsed to a single
+    space & trimmed.
+
+    Args
+    :project_list: Iterable of dictionaries containing project details
+    :fields_to_search: Keys of the fields to normalise. Defaults to
+    FIELDS_TO_SEARCH
+    :nfkc: Whether to apply NFKC unicode normalisation, folding unicode
+    variants such as full-width letters and ligatures
+    :lowercase: Whether to add lowercase copies of the fields, as a
+    dictionary keyed by field under LOWERCASE_KEY. Documents built from
+    the projects carry only the copy of their matched field, under the
+    key `<field>_lower`
+
+    Return
+    List of copies of the projects with normalised fields.
+    """
+    project_list = list(project_list)
+    fields_to_search = list(fields_to_search)
+    table = pa.table(
         {
-            k: v.replace("\n", " ") if v is not None else v
-            for k, v in project.items()
+            field: pa.array(
+                [p[field] for p in project_list], type=pa.string()
+            )
+            for field in fields_to_search
         }
-        for project in project_list
+    )
+    table = normalise_text_table(
+        table, fields_to_search, nfkc=nfkc, lowercase=lowercase
+    )
+    # numpy conversion is far faster than pyarrow's to_pylist
+    columns = [
+        col.to_numpy(zero_copy_only=False).tolist()
+        for col in table.columns
     ]
-
-    return project_list
+    # shadow columns follow the fields, in the same order
+    n_fields = len(fields_to_search)
+    normalised = list()
+    for project, row in zip(project_list, zip(*columns)):
+        project = {**project, **dict(zip(fields_to_search, row))}
+        if lowercase:
+            project[LOWERCASE_KEY] = dict(
+                zip(fields_to_search, row[n_fields:])
+            )
+        normalised.append(project)
+    return normalised
 
 
 def _format_doc_dict(doc: dict, field: str) -> dict:
@@ -62,11 +371,8 @@ def _format_doc_dict(doc: dict, field: str) -> dict:
         # to skip fields where no info is provided
         return None
     else:
-        meta = doc.copy()
-        meta["matched_field"] = field
-
         doc_dict = {
-            "meta": meta,
+            "meta": _field_meta(doc, field),
             "content": content,
         }
 
@@ -86,24 +392,212 @@ def transform_data(project_list: list) -> list:
     project.
     """
 
-    # If the data contains multiple fields we'd want to search over,
-    # list them here
-    fields_to_search = [
-        "project_name",
-        "description",
-        "what_does_this_initiative_do",
-        "reasons_for_use",
-        "problem_solved_by_the_initiative",
-        "metrics_or_intended_impacts",
-    ]
-
-    # Iterate through the list of projects and reformat to more easily
-    # allow us to search over multiple fields
-    dataset = [
-        y
-        for project in project_list
-        for field in fields_to_search
-        if (y := _format_doc_dict(project, field)) is not None
-    ]
+    dataset = list(iter_transform_data(project_list))
 
     return dataset
+
+
+def iter_transform_data(project_list: Iterable[dict]) -> Iterator[dict]:
+    """
+    Streaming equivalent of transform_data, accepting any iterable of
+    projects such as the generator returned by iter_fetch_data.
+
+    Args
+    :project_list: Iterable of dictionaries containing project details
+
+    Return
+    Generator of dictionaries, one for each field to search over for each
+    project.
+    """
+
+    # Iterate through the projects and reformat to more easily allow us
+    # to search over multiple fields
+    for project in project_list:
+        for field in FIELDS_TO_SEARCH:
+            if (y := _format_doc_dict(project, field)) is not None:
+                yield y
+
+
+def _chunk(
+    project_list: Iterable[dict], chunk_size: int
+) -> Iterator[list]:
+    """Split an iterable of projects into lists of chunk_size projects."""
+    project_iter = iter(project_list)
+    while chunk := list(islice(project_iter, chunk_size)):
+        yield chunk
+
+
+def _transform_chunk_json(chunk: list, indent: int) -> tuple:
+    """Transform a chunk of projects & serialise the documents as they
+    appear in a json array written by write_json_stream, so that workers
+    return one bytes object rather than a dictionary per document."""
+    docs = transform_data(chunk)
+    pad = " " * indent
+    # json escapes newlines within strings, so every newline starts a line
+    text = ",\n".join(
+        pad + json.dumps(doc, indent=indent).replace("\n", "\n" + pad)
+        for doc in docs
+    )
+    # bytes are pickled without re-encoding
+    return len(docs), text.encode("utf-8")
+
+
+def write_transform_data_parallel(
+    project_list: Iterable[dict],
+    fname: str,
+    chunk_size: int = 10_000,
+    max_workers: int = None,
+    indent: int = 4,
+) -> int:
+    """
+    Transform projects & write the documents to a json array, with chunks
+    of projects transformed & serialised independently in a pool of
+    processes. The output is identical to
+    `write_json_stream(iter_transform_data(project_list), fname)`.
+
+    Serialising the documents costs several times more than transforming
+    them, so workers return each chunk as json text, which the parent
+    process only writes out. At most two chunks per worker are in flight,
+    so project_list may be a generator such as iter_fetch_data.
+
+    Args
+    :project_list: Iterable of dictionaries containing project details
+    :fname: Name/path of the json file to write
+    :chunk_size: Number of projects sent to a worker at a time
+    :max_workers: Number of worker processes. By default, the number of
+    available cores
+    :indent: Indentation level, as for json.dump
+
+    Return
+    The number of documents written.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1. Found {chunk_size}")
+
+    in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    pending = deque()
+    n = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        with open(fname, "wb") as f:
+
+            def write_next():
+                # chunks are written in submission order
+                nonlocal n
+                n_docs, text = pending.popleft().result()
+                if n_docs:
+                    f.write(b",\n" if n else b"[\n")
+                    f.write(text)
+                    n += n_docs
+
+            for chunk in _chunk(project_list, chunk_size):
+                pending.append(
+                    executor.submit(_transform_chunk_json, chunk, indent)
+                )
+                if len(pending) >= in_flight:
+                    write_next()
+            while pending:
+                write_next()
+            f.write(b"\n]" if n else b"[]")
+
+    return n
+
+
+def normalise_data(
+    project_list: Iterable[dict], id_field: str = None
+) -> dict:
+    """
+    Transform the data as transform_data does, but store the metadata for
+    each project once rather than copying it into every field document.
+
+    Args
+    :project_list: Iterable of dictionaries containing project details
+    :id_field: Optional key holding a unique project ID. By default, the
+    position of the project in project_list is used
+
+    Return
+    Dictionary containing two fields: 1) projects, the metadata for each
+    project keyed by project ID, and 2) documents, a list with one
+    dictionary for each field to search over for each project. Documents
+    hold the content, the matched_field and the project_id only. Use
+    iter_resolve_documents to recover the transform_data format.
+    """
+    projects = dict()
+    documents = list()
+    for i, project in enumerate(project_list):
+        project_id = str(i if id_field is None else project[id_field])
+        if project_id in projects:
+            raise ValueError(f"Duplicate project ID: {project_id}")
+        projects[project_id] = project
+        for field in FIELDS_TO_SEARCH:
+            if project[field] is not None:
+                documents.append(
+                    {
+                        "content": project[field],
+                        "matched_field": field,
+                        "project_id": project_id,
+                    }
+                )
+
+    return {"projects": projects, "documents": documents}
+
+
+def resolve_meta(doc: dict, projects: dict) -> dict:
+    """
+    Build the Haystack metadata for a normalised document on demand.
+
+    Args
+    :doc: A document from the output of normalise_data
+    :projects: The projects from the output of normalise_data
+
+    Return
+    The project metadata, with the matched_field added
+    """
+    return _field_meta(projects[doc["project_id"]], doc["matched_field"])
+
+
+def iter_resolve_documents(normalised: dict) -> Iterator[dict]:
+    """
+    Lazily convert the output of normalise_data into the format returned
+    by transform_data. Only the document currently being consumed holds a
+    copy of its project metadata.
+
+    Args
+    :normalised: The output of normalise_data
+
+    Return
+    Generator of dictionaries containing two fields: 1) content to be
+    searched (a string), and 2) metadata (another dictionary)
+    """
+    projects = normalised["projects"]
+    for doc in normalised["documents"]:
+        yield {
+            "meta": resolve_meta(doc, projects),
+            "content": doc["content"],
+        }
+
+
+def write_json_stream(
+    dataset: Iterable, fname: str, indent: int = 4
+) -> int:
+    """
+    Write an iterable to a json array one item at a time. The output is
+    identical to `json.dump(list(dataset), f, indent=indent)`.
+
+    Args
+    :dataset: Iterable of json serialisable items, such as the generator
+    returned by iter_transform_data
+    :fname: Name/path of the json file to write
+    :indent: Indentation level, as for json.dump
+
+    Return
+    The number of items written.
+    """
+    n = 0
+    with open(fname, "w") as f:
+        for item in dataset:
+            f.write(",\n" if n else "[\n")
+            item_str = json.dumps(item, indent=indent)
+            f.write(textwrap.indent(item_str, " " * indent))
+            n += 1
+        f.write("\n]" if n else "[]")
+    return n
@@ -0,0 +1,175 @@
+"""Remove duplicate field documents before indexing.
+
+Catalogue entries often repeat the same text across several searchable
+fields. Documents from the same project whose content is identical, or
+near-identical by MinHash estimated Jaccard similarity of word shingles,
+are collapsed into one document listing every matched field.
+"""
+
+import hashlib
+from itertools import combinations
+import json
+from typing import Iterable, List
+import zlib
+
+import numpy as np
+
+from ai_nexus_backend.search_index import _tokenise
+
+# Mersenne prime used by the MinHash permutations. Hashes are reduced
+# below it, so products with the permutation coefficients fit in uint64
+_PRIME = np.uint64(2**31 - 1)
+
+
+def _project_key(doc: dict) -> str:
+    """Hash of a document's metadata, other than the matched field & its
+    lowercase shadow."""
+    shadow = f"{doc['meta']['matched_field']}_lower"
+    meta = {
+        k: v
+        for k, v in doc["meta"].items()
+        if k != "matched_field" and k != shadow
+    }
+    canonical = json.dumps(meta, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _shingles(text: str, shingle_size: int) -> np.ndarray:
+    """Hashed word shingles of text, reduced below _PRIME."""
+    tokens = _tokenise(text)
+    windows = zip(*(tokens[k:] for k in range(shingle_size)))
+    shingles = {" ".join(w) for w in windows}
+    if tokens and not shingles:
+        # shorter than one shingle
+        shingles = {" ".join(tokens)}
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return np.array(hashes, dtype=np.uint64) % _PRIME
+
+
+def _minhash(
+    shingles: np.ndarray, coef_a: np.ndarray, coef_b: np.ndarray
+) -> np.ndarray:
+    """MinHash signature of a set of hashed shingles."""
+    if not len(shingles):
+        # no tokens, never a near duplicate of anything
+        return np.full(len(coef_a), _PRIME, dtype=np.uint64)
+    perms = (
+        coef_a[:, None] * shingles[None, :] + coef_b[:, None]
+    ) % _PRIME
+    return perms.min(axis=1)
+
+
+def _find(parent: List[int], i: int) -> int:
+    """Root of i in a union-find forest, halving paths on the way."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def deduplicate_documents(
+    docs: Iterable[dict],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    bands: int = 32,
+    shingle_size: int = 3,
+    seed: int = 0,
+) -> List[dict]:
+    """Collapse duplicate & near-duplicate documents of each project.
+
+    Exact duplicates are found by hashing whitespace & case normalised
+    content. Remaining documents are MinHashed and split into bands, so
+    that only documents sharing a band bucket are compared. Pairs whose
+    estimated Jaccard similarity reaches `threshold` are merged.
+
+    Parameters
+    ----------
+    docs : Iterable[dict]
+        Documents as returned by `data_prep_utils.transform_data()`.
+        Documents belong to the same project when their metadata, other
+        than `matched_field`, is equal.
+    threshold : float, optional
+        Minimum estimated Jaccard similarity of near duplicates. Defaults
+        to 0.8.
+    num_perm : int, optional
+        Number of MinHash permutations. Defaults to 128.
+    bands : int, optional
+        Number of LSH bands, which must divide num_perm. More bands find
+        less similar candidate pairs. Defaults to 32.
+    shingle_size : int, optional
+        Number of words in each shingle. Defaults to 3.
+    seed : int, optional
+        Seed for the MinHash permutations. Defaults to 0.
+
+    Returns
+    -------
+    List[dict]
+        One document per group of duplicates, in order of each group's
+        first document. The longest content in the group is kept, with
+        its field as `matched_field`, and `matched_fields` lists the
+        fields of every document in the group.
+
+    Raises
+    ------
+    ValueError
+        `bands` does not divide `num_perm`.
+    """
+    if num_perm % bands:
+        raise ValueError(
+            f"bands must divide num_perm. Found {bands} & {num_perm}"
+        )
+    docs = list(docs)
+    parent = list(range(len(docs)))
+    projects = [_project_key(d) for d in docs]
+
+    # exact duplicates
+    seen = dict()
+    for i, doc in enumerate(docs):
+        content = " ".join(_tokenise(doc["content"]))
+        key = (projects[i], content)
+        parent[i] = seen.setdefault(key, i)
+    uniques = [i for i in range(len(docs)) if parent[i] == i]
+
+    # near duplicates, compared only within shared LSH buckets
+    rng = np.random.default_rng(seed)
+    coef_a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    coef_b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+    signatures = {
+        i: _minhash(
+            _shingles(docs[i]["content"], shingle_size), coef_a, coef_b
+        )
+        for i in uniques
+    }
+    buckets = dict()
+    for i in uniques:
+        for b, band in enumerate(np.split(signatures[i], bands)):
+            key = (projects[i], b, band.tobytes())
+            buckets.setdefault(key, []).append(i)
+    for members in buckets.values():
+        for i, j in combinations(members, 2):
+            root_i, root_j = _find(parent, i), _find(parent, j)
+            if root_i == root_j:
+                continue
+            similarity = np.mean(signatures[i] == signatures[j])
+            if similarity >= threshold:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = dict()
+    for i in range(len(docs)):
+        groups.setdefault(_find(parent, i), []).append(i)
+    deduplicated = list()
+    for members in groups.values():
+        keep = max(members, key=lambda i: len(docs[i]["content"]))
+        meta = dict(docs[keep]["meta"])
+        meta["matched_fields"] = [
+            docs[i]["meta"]["matched_field"] for i in members
+        ]
+        # lowercase shadows of every matched field
+        for i in members:
+            shadow = f"{docs[i]['meta']['matched_field']}_lower"
+            if shadow in docs[i]["meta"]:
+                meta[shadow] = docs[i]["meta"][shadow]
+        deduplicated.append(
+            {"meta": meta, "content": docs[keep]["content"]}
+        )
+    return deduplicated
@@ -1,20 +1,153 @@
 """Query GitHub api."""
 
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import pathlib
 import re
 import datetime as dt
-from typing import Union
+from typing import Iterator, List, Tuple, Union
+from urllib.parse import urlencode
 
 import pandas as pd
 import requests
 from requests.exceptions import HTTPError
+from yaml import safe_load
 
 from ai_nexus_backend.build_yaml import _parse_yaml
+from ai_nexus_backend.github_auth import TokenPool
 from ai_nexus_backend.requests_utils import (
+    _configure_http2,
     _configure_requests,
     _handle_response,
     _url_defence,
 )
+from ai_nexus_backend.task_queue import (
+    PermanentError,
+    TaskQueue,
+    run_queue,
+)
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+SEARCH_URL = "https://api.github.com/search/repositories"
+# the search API returns at most this many results per query
+SEARCH_CAP = 1000
+# repository fields matching the columns of GithubClient.get_org_repos()
+_REPO_FRAGMENT = """
+fragment repoFields on Repository {
+  databaseId
+  url
+  isPrivate
+  isArchived
+  name
+  description
+  primaryLanguage { name }
+  updatedAt
+  repositoryTopics(first: 100) { nodes { topic { name } } }
+}
+"""
+# client errors GitHub uses for rate limits, worth retrying
+_RATE_LIMIT_STATUSES = (403, 429)
+# kinds of per-repo task run by GithubClient.task_handlers()
+REPO_TASKS = ("topics", "custom_properties", "readme", "commits")
+_REPO_COLUMNS = [
+    "id",
+    "html_url",
+    "repo_url",
+    "is_private",
+    "is_archived",
+    "name",
+    "description",
+    "programming_language",
+    "updated_at",
+    "org_nm",
+    "topics",
+]
+
+
+def _repo_row(j: dict, org_nm: str) -> dict:
+    """Columns of GithubClient.get_org_repos() from a REST repo object.
+
+    Topics are included in the repo listing & single repo payloads, so
+    are kept rather than requested per repo.
+    """
+    return {
+        "id": j["id"],
+        "html_url": j["html_url"],
+        "repo_url": j["url"],
+        "is_private": j["private"],
+        "is_archived": j["archived"],
+        "name": j["name"],
+        "description": j["description"],
+        "programming_language": j["language"],
+        "updated_at": j["updated_at"],
+        "org_nm": org_nm,
+        "topics": j.get("topics", []),
+    }
+
+
+def _iso8601(timestamp: Union[str, dt.datetime, pd.Timestamp]) -> str:
+    """Format a timestamp as the UTC ISO 8601 string GitHub expects.
+
+    Timestamps without a timezone are taken to be UTC.
+    """
+    ts = pd.Timestamp(timestamp)
+    ts = ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _commit_frame(commits: List[dict]) -> pd.DataFrame:
+    """Tabulate a page of commits, parsing every date at once."""
+    authors = [c["commit"].get("author") or {} for c in commits]
+    return pd.DataFrame(
+        {
+            "sha": [c["sha"] for c in commits],
+            "html_url": [c.get("html_url") for c in commits],
+            "author_name": [a.get("name") for a in authors],
+            "author_email": [a.get("email") for a in authors],
+            "date": pd.to_datetime(
+                [a.get("date") for a in authors],
+                utc=True,
+                format="ISO8601",
+            ),
+            "message": [c["commit"].get("message") for c in commits],
+        }
+    )
+
+
+def load_assets(pth: pathlib.Path) -> pd.DataFrame:
+    """Read the allow-list of repos belonging in the catalogue.
+
+    Parameters
+    ----------
+    pth : pathlib.Path
+        YAML list of `{name, organisation}` entries, such as
+        `data/assets.yaml`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Deduplicated `name` & `organisation` columns, in file order.
+
+    Raises
+    ------
+    ValueError
+        An entry is missing its name or organisation.
+    """
+    with open(pth) as f:
+        entries = safe_load(f) or []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not (
+            entry.get("name") and entry.get("organisation")
+        ):
+            raise ValueError(
+                f"Asset {i} needs a name & organisation. Found {entry}"
+            )
+    assets = pd.DataFrame(
+        [[e["name"], e["organisation"]] for e in entries],
+        columns=["name", "organisation"],
+    )
+    return assets.drop_duplicates(ignore_index=True)
 
 
 class GithubClient:
@@ -26,11 +159,18 @@ class GithubClient:
 
     Parameters
     ----------
-    github_pat : str
-        The personal access token for GitHub API authentication.
+    github_pat : Union[str, list, github_auth.TokenPool]
+        The personal access token for GitHub API authentication. A list
+        of tokens, or a `github_auth.TokenPool` of tokens & GitHub App
+        installations, sends each request with the credential with the
+        most remaining rate limit.
     user_agent : str, optional
         The user agent string to be used in HTTP requests. Defaults to
         None.
+    http2 : bool, optional
+        Multiplex concurrent requests over a single HTTP/2 connection,
+        see `requests_utils.Http2Session`. Install with
+        `pip install '.[http2]'`. Defaults to False.
 
     Attributes
     ----------
@@ -52,68 +192,87 @@ class GithubClient:
     -------
     get_org_repos()
         Get all repositories for a specified GitHub organisation.
+    get_org_custom_properties()
+        Get custom property values for every repo in an organisation.
+    get_org_snapshot()
+        Get repos, topics & custom properties for an organisation.
+    search_repos()
+        Discover repos by organisation, topic & push date with the
+        repository search API.
+    get_asset_repos()
+        Get repo metadata & topics for an allow-list of repos.
     get_repo_metadata()
         Get metadata for a specified repo url.
     get_all_repo_metadata()
         Get topics or custom properties for a list of repo html_urls.
+    task_handlers()
+        Get functions running per-repo tasks from a persistent task
+        queue.
     get_readme_content()
         Get the README content for a single repository.
     extract_yaml_from_md()
         Get YAML metadata content from a README content string.
+    iter_commits()
+        Yield a repo's commits between optional since & until times, a
+        page at a time.
     get_commits_for_html_url()
         Get commits within an optional time window for a specified repo's
         html url.
 
     """
 
-    def __init__(self, github_pat, user_agent=None):
+    def __init__(self, github_pat, user_agent=None, http2=False):
         self.__pat = github_pat
         self.__agent = user_agent
-        self._session = self._configure_github()
+        if http2:
+            self._session = self._configure_github(_configure_http2())
+        else:
+            self._session = self._configure_github()
         self.repos = pd.DataFrame()
         self.metadata = pd.DataFrame()
 
     def _configure_github(self, _session=_configure_requests()):
         """Set up a GitHub request Session with retry & backoff spec."""
         _session.headers = {
-            "Authorization": f"Bearer {self.__pat}",
             "User-Agent": self.__agent,
             "X-GitHub-Api-Version": "2022-11-28",
             "accept": "application/vnd.github+json",
         }
+        if isinstance(self.__pat, str):
+            _session.headers["Authorization"] = f"Bearer {self.__pat}"
+            _session.auth = None
+        elif isinstance(self.__pat, TokenPool):
+            _session.auth = self.__pat
+        else:
+            _session.auth = TokenPool(self.__pat)
         self._session = _session
         return _session
 
-    def _paginated_get(
+    def _iter_pages(
         self,
         url: str,
-        sess: requests.Session = _configure_requests(),
+        sess: requests.Session = None,
         debug: bool = False,
-        timedelta_cutoff_days: Union[None, int] = None,
-    ) -> list:
-        """Get paginated responses.
+    ) -> Iterator[list]:
+        """Yield the JSON content of each page as it is received.
+
+        Pages are followed by their `next` links, which carry the page
+        number & any query parameters of `url`.
 
         Parameters
         ----------
         url : str
             The url string to query.
-        params: dict
-            Dictionary of parameters to pass the developer API.
         sess : requests.Session, optional
-            Session configured with retry strategy, by default
-            _configure_requests() default values of n=5, backoff_f=0.1,
-            force_on=[500, 502, 503, 504]
+            Session to send requests with. Defaults to the client's
+            authenticated session.
         debug : bool
             Print debugging statements if set to True. False by default.
 
-        timedelta_cutoff_days: int
-            Return commits only within this window. Only used if commits
-            endpoint is being queried.
-
         Returns
         -------
-        list
-            A nested list containing the response JSON content.
+        Iterator[list]
+            The JSON content of each page.
 
         Raises
         ------
@@ -123,50 +282,20 @@ class GithubClient:
             configure SSO.
 
         """
+        if sess is None:
+            sess = self._session
         page = 1
-        responses = list()
         while True:
             if debug:
                 print(f"Requesting page {page}")
                 print(f"Next iter url: {url}")
-                print(f"Request headers: {self._session.headers}")
-                print(f"Request params: {self._session.params}")
-            sess.params["page"] = page
-            r = self._session.get(url)
+                print(f"Request headers: {sess.headers}")
+            r = sess.get(url)
             if debug:
                 print(f"Paginated status code: {r.status_code}")
                 print(f"Response links: {r.links}")
             if r.ok:
-                page_resp = r.json()
-                if (
-                    timedelta_cutoff_days is not None
-                ) and "commits" in url:
-                    nw = dt.datetime.now()
-                    timedelta_exceeded = [
-                        (
-                            nw
-                            - dt.datetime.strptime(
-                                r.get("commit").get("author").get("date"),
-                                "%Y-%m-%dT%H:%M:%SZ",
-                            )
-                        ).days
-                        > timedelta_cutoff_days
-                        for r in page_resp
-                    ]
-                    # Subset responses to those <= cutoff
-                    page_resp_within_cutoff = [
-                        r
-                        for r, flag in zip(page_resp, timedelta_exceeded)
-                        if not flag
-                    ]
-                    if debug:
-                        print(f"Page responses: {page_resp}")
-                        print(f"Timedelta exceeded: {timedelta_exceeded}")
-                    if any(timedelta_exceeded):
-                        responses.append(page_resp_within_cutoff)
-                        break
-
-                responses.append(page_resp)
+                yield r.json()
                 if "next" in r.links:
                     url = r.links["next"]["url"]
                     page += 1
@@ -176,7 +305,7 @@ class GithubClient:
                         "Requests left: "
                         + r.headers["X-RateLimit-Remaining"]
                     )
-                    break
+                    return
             elif r.status_code == 401:
                 raise PermissionError(
                     "PAT is invalid. Try generating a new PAT."
@@ -190,6 +319,75 @@ class GithubClient:
                 raise HTTPError(
                     f"Unable to get repo: {r.status_code}, {r.reason}"
                 )
+
+    def _paginated_get(
+        self,
+        url: str,
+        sess: requests.Session = None,
+        debug: bool = False,
+        timedelta_cutoff_days: Union[None, int] = None,
+    ) -> list:
+        """Get paginated responses.
+
+        Parameters
+        ----------
+        url : str
+            The url string to query.
+        sess : requests.Session, optional
+            Session to send requests with. Defaults to the client's
+            authenticated session, configured with retry by
+            _configure_requests() default values of n=5, backoff_f=0.1,
+            force_on=[500, 502, 503, 504]
+        debug : bool
+            Print debugging statements if set to True. False by default.
+
+        timedelta_cutoff_days: int
+            Return commits only within this window. Only used if commits
+            endpoint is being queried. Prefer passing `since` to the
+            commits endpoint, as `iter_commits()` does, so that GitHub
+            filters the commits.
+
+        Returns
+        -------
+        list
+            A nested list containing the response JSON content.
+
+        Raises
+        ------
+        PermissionError
+            The PAT is not recognised by GitHub.
+            The PAT is valid but cannot access the resource - needs to
+            configure SSO.
+
+        """
+        responses = list()
+        for page_resp in self._iter_pages(url, sess=sess, debug=debug):
+            if (timedelta_cutoff_days is not None) and "commits" in url:
+                dates = pd.to_datetime(
+                    [r["commit"]["author"]["date"] for r in page_resp],
+                    utc=True,
+                    format="ISO8601",
+                )
+                nw = pd.Timestamp.now(tz="UTC")
+                timedelta_exceeded = (
+                    nw - dates
+                ).days > timedelta_cutoff_days
+                if debug:
+                    print(f"Page responses: {page_resp}")
+                    print(f"Timedelta exceeded: {timedelta_exceeded}")
+                if timedelta_exceeded.any():
+                    # Subset responses to those <= cutoff
+                    responses.append(
+                        [
+                            r
+                            for r, flag in zip(
+                                page_resp, timedelta_exceeded
+                            )
+                            if not flag
+                        ]
+                    )
+                    break
+            responses.append(page_resp)
         return responses
 
     def get_org_repos(
@@ -219,55 +417,342 @@ class GithubClient:
         Returns
         -------
         pd.DataFrame
-            Table of repo metadat.
+            Table of repo metadat, with each repo's topics as a list
+            column.
 
         """
         # GitHub API endpoint to list repos for the organization
-        org_repos_url = f"https://api.github.com/orgs/{org_nm}/repos"
-        params = {}
+        params = {"per_page": 100}
         if public_only:
             params["type"] = "public"
+        org_repos_url = f"https://api.github.com/orgs/{org_nm}/repos"
+        org_repos_url += f"?{urlencode(params)}"
 
         responses = self._paginated_get(
             org_repos_url, sess=self._session, debug=debug
         )
-        DTYPES = {
-            "html_url": str,
-            "repo_url": str,
-            "is_private": bool,
-            "is_archived": bool,
-            "name": str,
-            "description": str,
-            "programming_language": str,
-        }
-        all_repo_deets = pd.DataFrame()
-
-        for i in responses:
-            for j in i:
-                repo_deets = pd.DataFrame(
-                    {
-                        "id": [j["id"]],
-                        "html_url": [j["html_url"]],
-                        "repo_url": [j["url"]],
-                        "is_private": [j["private"]],
-                        "is_archived": [j["archived"]],
-                        "name": [j["name"]],
-                        "description": [j["description"]],
-                        "programming_language": [j["language"]],
-                        "updated_at": [j["updated_at"]],
-                        "org_nm": org_nm,
-                    }
-                )
-                # set dtypes
-                for col, dtype in DTYPES.items():
-                    repo_deets[col].astype(dtype)
-
-                all_repo_deets = pd.concat([all_repo_deets, repo_deets])
-
-        all_repo_deets.reset_index(drop=True, inplace=True)
+        rows = [_repo_row(j, org_nm) for page in responses for j in page]
+        all_repo_deets = pd.DataFrame(rows, columns=_REPO_COLUMNS)
         self.repos = all_repo_deets
         return all_repo_deets
 
+    def get_org_custom_properties(
+        self, org_nm: str, debug: bool = False
+    ) -> pd.DataFrame:
+        """Get custom property values for every repo in an organisation.
+
+        Values are read from the paginated organisation endpoint, 100
+        repos per request, rather than requested per repo.
+
+        Parameters
+        ----------
+        org_nm : str
+            The organisation name.
+        debug: bool
+            Whether to print debug statements. False by default.
+
+        Returns
+        -------
+        pd.DataFrame
+            `repo_url` & `custom_properties` columns, in the format of
+            `get_all_repo_metadata(metadata="custom_properties")`.
+        """
+        url = (
+            f"https://api.github.com/orgs/{org_nm}/properties/values"
+            "?per_page=100"
+        )
+        responses = self._paginated_get(
+            url, sess=self._session, debug=debug
+        )
+        repo_props = [j for page in responses for j in page]
+        return pd.DataFrame(
+            {
+                "repo_url": [
+                    f"https://github.com/{j['repository_full_name']}"
+                    for j in repo_props
+                ],
+                "custom_properties": [j["properties"] for j in repo_props],
+            }
+        )
+
+    def get_org_snapshot(
+        self,
+        org_nm: str,
+        public_only: bool = True,
+        debug: bool = False,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Get repos, topics & custom properties for an organisation.
+
+        Uses organisation level endpoints only, so requests scale with
+        the number of pages of repos rather than the number of repos.
+
+        Parameters
+        ----------
+        org_nm : str
+            The organisation name.
+        public_only : bool
+            Return public repos only. Defaults to True.
+        debug: bool
+            Whether to print debug statements. False by default.
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, pd.DataFrame]
+            Repo metadata with topics, as returned by `get_org_repos()`,
+            & custom properties of those repos, as returned by
+            `get_org_custom_properties()`. Pass both to
+            `parquet_utils.repos_to_table()`.
+        """
+        repos = self.get_org_repos(
+            org_nm, public_only=public_only, debug=debug
+        )
+        custom_props = self.get_org_custom_properties(org_nm, debug=debug)
+        # the properties endpoint also lists private repos
+        custom_props = custom_props[
+            custom_props["repo_url"].isin(repos["html_url"])
+        ].reset_index(drop=True)
+        return repos, custom_props
+
+    def _search_window(
+        self,
+        query: str,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        debug: bool = False,
+    ) -> List[dict]:
+        """Search repos pushed between start & end, halving the window
+        until each query is within the search API's result cap."""
+        q = f"{query} pushed:{_iso8601(start)}..{_iso8601(end)}"
+        url = f"{SEARCH_URL}?{urlencode({'q': q, 'per_page': 100})}"
+        pages = self._iter_pages(url, debug=debug)
+        first = next(pages)
+        too_many = first["total_count"] > SEARCH_CAP
+        if too_many and end - start > pd.Timedelta(seconds=1):
+            mid = (start + (end - start) / 2).floor("s")
+            return self._search_window(
+                query, start, mid, debug=debug
+            ) + self._search_window(
+                query, mid + pd.Timedelta(seconds=1), end, debug=debug
+            )
+        if too_many or first.get("incomplete_results"):
+            print(f"Search results are incomplete for: {q}")
+        items = list(first["items"])
+        for page in pages:
+            items.extend(page["items"])
+        return items
+
+    def search_repos(
+        self,
+        org_nms: List[str],
+        topics: Union[None, List[str]] = None,
+        pushed_after: Union[str, dt.datetime, pd.Timestamp] = "2008-01-01",
+        pushed_before: Union[None, str, dt.datetime, pd.Timestamp] = None,
+        include_archived: bool = False,
+        debug: bool = False,
+    ) -> pd.DataFrame:
+        """Discover repos with the repository search API.
+
+        GitHub filters repos by organisation, topic, push date &
+        archived status, so only the relevant repos are downloaded.
+        Queries matching more results than the search API returns are
+        split into halves of their push date range until each is within
+        the cap.
+
+        Parameters
+        ----------
+        org_nms : List[str]
+            Organisations to search.
+        topics : Union[None, List[str]], optional
+            Return repos with any of these topics. Defaults to None, any
+            topics.
+        pushed_after : Union[str, dt.datetime, pd.Timestamp], optional
+            Only repos pushed to at or after this time. Timestamps
+            without a timezone are taken to be UTC. Defaults to
+            "2008-01-01", before GitHub launched.
+        pushed_before : Union[None, str, dt.datetime, pd.Timestamp]
+            Only repos pushed to at or before this time. Defaults to
+            None, now.
+        include_archived : bool, optional
+            Also return archived repos. Defaults to False.
+        debug: bool
+            Whether to print debug statements. False by default.
+
+        Returns
+        -------
+        pd.DataFrame
+            Table of repo metadata with the columns of `get_org_repos()`,
+            one row per repo however many queries matched it. Updates
+            self.repos.
+        """
+        start = pd.Timestamp(_iso8601(pushed_after))
+        end = pd.Timestamp(
+            _iso8601(
+                pd.Timestamp.now(tz="UTC")
+                if pushed_before is None
+                else pushed_before
+            )
+        )
+        rows = dict()
+        for org_nm in org_nms:
+            # topic qualifiers are combined with AND, so query each topic
+            for topic in topics or [None]:
+                query = f"org:{org_nm}"
+                if topic is not None:
+                    query += f" topic:{topic}"
+                if not include_archived:
+                    query += " archived:false"
+                for j in self._search_window(query, start, end, debug):
+                    rows.setdefault(j["id"], _repo_row(j, org_nm))
+        repos = pd.DataFrame(list(rows.values()), columns=_REPO_COLUMNS)
+        self.repos = repos
+        return repos
+
+    def _graphql_repo_batch(self, batch: List[tuple]) -> List[dict]:
+        """Query up to 100 repos in one GraphQL request.
+
+        Each `(name, organisation)` pair is an aliased `repository`
+        query, with names passed as variables rather than formatted into
+        the query. Repos that are not found are omitted.
+        """
+        var_defs, fields, variables = list(), list(), dict()
+        for i, (name, org_nm) in enumerate(batch):
+            var_defs.append(f"$o{i}: String!, $n{i}: String!")
+            fields.append(
+                f"r{i}: repository(owner: $o{i}, name: $n{i})"
+                " { ...repoFields }"
+            )
+            variables.update({f"o{i}": org_nm, f"n{i}": name})
+        query = (
+            f"query({', '.join(var_defs)}) {{\n"
+            + "\n".join(fields)
+            + "\n}"
+            + _REPO_FRAGMENT
+        )
+        resp = _handle_response(
+            self._session.post(
+                GRAPHQL_URL, json={"query": query, "variables": variables}
+            )
+        )
+        content = resp.json()
+        # missing repos are null with a NOT_FOUND error, anything else
+        # means the batch failed
+        errors = [
+            e
+            for e in content.get("errors", [])
+            if e.get("type") != "NOT_FOUND"
+        ]
+        if errors or content.get("data") is None:
+            messages = "; ".join(e.get("message", "") for e in errors)
+            raise HTTPError(f"GraphQL query failed: {messages}")
+        rows = list()
+        for i, (name, org_nm) in enumerate(batch):
+            repo = content["data"].get(f"r{i}")
+            if repo is None:
+                print(f"Repo {org_nm}/{name} not found")
+                continue
+            rows.append(
+                {
+                    "id": repo["databaseId"],
+                    "html_url": repo["url"],
+                    "repo_url": (
+                        "https://api.github.com/repos/"
+                        f"{org_nm}/{repo['name']}"
+                    ),
+                    "is_private": repo["isPrivate"],
+                    "is_archived": repo["isArchived"],
+                    "name": repo["name"],
+                    "description": repo["description"],
+                    "programming_language": (
+                        repo["primaryLanguage"] or {}
+                    ).get("name"),
+                    "updated_at": repo["updatedAt"],
+                    "org_nm": org_nm,
+                    "topics": [
+                        n["topic"]["name"]
+                        for n in repo["repositoryTopics"]["nodes"]
+                    ],
+                }
+            )
+        return rows
+
+    def _rest_repo(self, name: str, org_nm: str) -> Union[None, dict]:
+        """Get a single repo from the REST API, None if not found."""
+        resp = self._session.get(
+            f"https://api.github.com/repos/{org_nm}/{name}"
+        )
+        if resp.status_code == 404:
+            print(f"Repo {org_nm}/{name} not found")
+            return None
+        return _repo_row(_handle_response(resp).json(), org_nm)
+
+    def get_asset_repos(
+        self,
+        assets: pd.DataFrame,
+        mode: str = "graphql",
+        batch_size: int = 100,
+        max_workers: int = 8,
+    ) -> pd.DataFrame:
+        """Get repo metadata & topics for an allow-list of repos.
+
+        Requests scale with the number of listed repos, rather than with
+        the size of their organisations.
+
+        Parameters
+        ----------
+        assets : pd.DataFrame
+            Repos to get, with `name` & `organisation` columns, as
+            returned by `load_assets()`.
+        mode : str, optional
+            "graphql" to query `batch_size` repos per GraphQL request, or
+            "rest" to get each repo from the REST API. Defaults to
+            "graphql".
+        batch_size : int, optional
+            Repos per GraphQL request, at most 100. Defaults to 100.
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to 8.
+
+        Returns
+        -------
+        pd.DataFrame
+            Table of repo metadata with the columns of `get_org_repos()`
+            plus a `topics` list column, in asset order. Repos that are
+            not found are omitted. Updates self.repos.
+
+        Raises
+        ------
+        ValueError
+            `mode` is not "graphql" or "rest", or `batch_size` is not
+            between 1 & 100.
+        requests.HTTPError
+            A request failed.
+        """
+        pairs = list(zip(assets["name"], assets["organisation"]))
+        if mode == "graphql":
+            if not 1 <= batch_size <= 100:
+                raise ValueError(
+                    f"batch_size must be between 1 & 100. Found {batch_size}"
+                )
+            batches = list()
+            for start in range(0, len(pairs), batch_size):
+                end = start + batch_size
+                batches.append(pairs[start:end])
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(self._graphql_repo_batch, batches)
+                rows = [row for batch in results for row in batch]
+        elif mode == "rest":
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    lambda p: self._rest_repo(*p), pairs
+                )
+                rows = [row for row in results if row is not None]
+        else:
+            raise ValueError(
+                f"mode must be 'graphql' or 'rest'. Found {mode}"
+            )
+        repos = pd.DataFrame(rows, columns=_REPO_COLUMNS)
+        self.repos = repos
+        return repos
+
     def get_repo_metadata(self, html_url: str, metadata: str = "topics"):
         """Query a single repo url for its metadata content.
 
@@ -303,12 +788,23 @@ class GithubClient:
         self,
         html_urls: list,
         metadata: str,
+        max_workers: int = 1,
+        queue_pth: pathlib.Path = None,
+        max_attempts: int = 5,
+        backoff_s: float = 30.0,
     ) -> pd.DataFrame:
         """Get every repo metadata item for a list of repo html_urls.
 
         Currently only supports metadata values "custom_properties" or
         "topics". Updates self.metadata attribute.
 
+        With `queue_pth`, each repo is a task in a persistent
+        `task_queue.TaskQueue`. Failed requests are retried with backoff,
+        other than client errors such as a missing repo, & a rerun after
+        the process dies or runs out of rate limit only requests the
+        repos left unfinished or failed. Once every repo is done the
+        queue is cleared, so the next run fetches fresh metadata.
+
         Parameters
         ----------
         html_urls: list
@@ -317,6 +813,22 @@ class GithubClient:
         metadata: str
             Either "custom_properties" or "topics".
 
+        max_workers: int, optional
+            Maximum number of concurrent requests. Defaults to 1, one
+            request at a time.
+
+        queue_pth: pathlib.Path, optional
+            Path to a SQLite task queue, created if it does not exist.
+            Defaults to None, requesting every repo without a queue.
+
+        max_attempts: int, optional
+            With `queue_pth`, requests per repo before giving up.
+            Defaults to 5.
+
+        backoff_s: float, optional
+            With `queue_pth`, seconds before a failed request is retried,
+            doubling with each attempt. Defaults to 30.
+
         Returns
         -------
         list
@@ -328,29 +840,157 @@ class GithubClient:
             `metadata` is not either 'custom_properties' or 'topics'.
 
         """
-        all_meta = pd.DataFrame()
+        html_urls = list(html_urls)
         n_repos = len(html_urls)
-        for i, html_url in enumerate(html_urls):
+        if queue_pth is not None:
+            metas = self._queued_repo_tasks(
+                html_urls,
+                metadata,
+                queue_pth,
+                max_workers,
+                max_attempts=max_attempts,
+                backoff_s=backoff_s,
+            )
+            all_meta = pd.DataFrame(
+                {"repo_url": html_urls, metadata: metas}
+            )
+            self.metadata = all_meta
+            return all_meta
+
+        def _get(html_url: str):
             try:
-                resp = self.get_repo_metadata(html_url, metadata)
-                repo_meta = resp.json()
-            except requests.exceptions.HTTPError:
+                repo_meta = self.get_repo_metadata(
+                    html_url, metadata
+                ).json()
+            except requests.exceptions.HTTPError as e:
                 repo_meta = None
                 print(
-                    f"Failed request, {resp.status_code}: {resp.reason}",
+                    f"Failed request, {e}",
                     f"{metadata} for {html_url} is None",
                 )
+            return repo_meta
 
-            current_row = pd.DataFrame(
-                {"repo_url": html_url, metadata: [repo_meta]}
-            )
-            all_meta = pd.concat([all_meta, current_row])
-            print(f"Get {metadata} for {html_url}, {i+1}/{n_repos} done.")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            metas = list()
+            for i, repo_meta in enumerate(executor.map(_get, html_urls)):
+                metas.append(repo_meta)
+                print(
+                    f"Get {metadata} for {html_urls[i]}, {i+1}/{n_repos} done."
+                )
 
-        all_meta.reset_index(drop=True, inplace=True)
+        all_meta = pd.DataFrame({"repo_url": html_urls, metadata: metas})
         self.metadata = all_meta
         return all_meta
 
+    def _run_repo_task(self, kind: str, html_url: str, payload: dict):
+        """Run a per-repo task, returning its JSON serialisable result.
+
+        Client errors other than rate limits, such as a missing repo or
+        README, raise `task_queue.PermanentError` so that they are not
+        retried.
+        """
+        try:
+            return self._repo_task_result(kind, html_url, payload)
+        except HTTPError as e:
+            status = getattr(e.response, "status_code", None) or 0
+            if 400 <= status < 500 and status not in _RATE_LIMIT_STATUSES:
+                raise PermanentError(str(e)) from e
+            raise
+
+    def _repo_task_result(self, kind: str, html_url: str, payload: dict):
+        """Result of a per-repo task."""
+        if kind == "readme":
+            return self.get_readme_content(html_url)
+        elif kind == "commits":
+            payload = payload or dict()
+            pages = list(
+                self.iter_commits(
+                    html_url,
+                    since=payload.get("since"),
+                    until=payload.get("until"),
+                )
+            )
+            if not pages:
+                return list()
+            commits = pd.concat(pages, ignore_index=True)
+            commits["date"] = commits["date"].dt.strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            )
+            return commits.to_dict(orient="records")
+        return self.get_repo_metadata(html_url, kind).json()
+
+    def task_handlers(self) -> dict:
+        """Functions running per-repo tasks from a `task_queue.TaskQueue`.
+
+        Tasks are keyed by repo html_url. "commits" tasks take an
+        optional payload with `since` & `until` keys, as passed to
+        `iter_commits()`, & return a list of commit records.
+
+        Returns
+        -------
+        dict
+            Handler for each kind in `REPO_TASKS`, for
+            `task_queue.run_queue()`.
+
+        Examples
+        --------
+        ```
+        queue = TaskQueue("crawl.db")
+        queue.put(("readme", url, None) for url in html_urls)
+        run_queue("crawl.db", client.task_handlers(), max_workers=8)
+        ```
+        """
+        return {
+            kind: partial(self._run_repo_task, kind) for kind in REPO_TASKS
+        }
+
+    def _queued_repo_tasks(
+        self,
+        html_urls: list,
+        kind: str,
+        queue_pth: pathlib.Path,
+        max_workers: int,
+        **queue_kwargs,
+    ) -> list:
+        """Run a kind of task for each repo from a persistent queue,
+        returning results in html_urls order, None where dead lettered.
+
+        Tasks left done or dead lettered by an interrupted crawl are
+        reused or retried, & cleared once the crawl is complete.
+        `queue_kwargs` are passed to `task_queue.TaskQueue`.
+        """
+        with TaskQueue(queue_pth, **queue_kwargs) as queue:
+            # failures of an unfinished crawl, such as on running out of
+            # rate limit, get another chance, while missing repos don't
+            n_requeued = queue.requeue_dead_letters(
+                kind, retryable_only=True
+            )
+            n_new = queue.put((kind, url, None) for url in html_urls)
+        print(
+            f"Queued {n_new} new {kind} tasks of {len(html_urls)},"
+            f" requeued {n_requeued} failed tasks"
+        )
+        counts = run_queue(
+            queue_pth,
+            self.task_handlers(),
+            max_workers=max_workers,
+            **queue_kwargs,
+        )
+        print(f"Task queue finished: {counts}")
+        with TaskQueue(queue_pth) as queue:
+            results = queue.results(kind)
+            dead = queue.dead_letters()
+            # the crawl is complete, the next one fetches every repo
+            queue.clear_finished(kind)
+        dead = dead[(dead["kind"] == kind) & dead["key"].isin(html_urls)]
+        for _, row in dead.iterrows():
+            print(
+                f"Failed request, {row['error']}",
+                f"{kind} for {row['key']} is None",
+            )
+        done = dict(zip(results["key"], results["result"]))
+        return [done.get(url) for url in html_urls]
+
     def _assemble_endpoint_from_repo_url(
         self, repo_url: str, endpoint: str = "readme"
     ) -> str:
@@ -422,7 +1062,10 @@ class GithubClient:
         endpoint = self._assemble_endpoint_from_repo_url(repo_url)
         resp = _handle_response(
             requests.get(
-                endpoint, params=params, headers=self._session.headers
+                endpoint,
+                params=params,
+                headers=self._session.headers,
+                auth=self._session.auth,
             )
         )
         # _handle response will raise if resp is not ok
@@ -478,6 +1121,66 @@ class GithubClient:
         else:
             raise ValueError("No YAML found in `md_content`")
 
+    def iter_commits(
+        self,
+        html_url: str,
+        since: Union[None, str, dt.datetime, pd.Timestamp] = None,
+        until: Union[None, str, dt.datetime, pd.Timestamp] = None,
+        per_page: int = 100,
+        debug: bool = False,
+    ) -> Iterator[pd.DataFrame]:
+        """Yield a repo's commits a page at a time, newest first.
+
+        `since` & `until` are passed to the commits endpoint, so GitHub
+        filters the commits & only pages within the window are
+        requested. Each page is yielded as it arrives, so memory does not
+        grow with the number of commits.
+
+        Parameters
+        ----------
+        html_url: str
+            The HTML url for the repo.
+        since: Union[None, str, dt.datetime, pd.Timestamp]
+            Only commits at or after this time. Timestamps without a
+            timezone are taken to be UTC. By default None, no lower
+            bound.
+        until: Union[None, str, dt.datetime, pd.Timestamp]
+            Only commits at or before this time. By default None, no
+            upper bound.
+        per_page: int
+            Commits per request, at most 100. By default 100.
+        debug: bool
+            Whether to print debugging statements. By default False.
+
+        Returns
+        -------
+        Iterator[pd.DataFrame]
+            One table per page, with `sha`, `html_url`, `author_name`,
+            `author_email`, `date` & `message` columns. `date` is the
+            author date as a UTC datetime64 column.
+
+        Raises
+        ------
+        ValueError
+            `per_page` is not between 1 & 100.
+        """
+        if not 1 <= per_page <= 100:
+            raise ValueError(
+                f"per_page must be between 1 & 100. Found {per_page}"
+            )
+        params = {"per_page": per_page}
+        if since is not None:
+            params["since"] = _iso8601(since)
+        if until is not None:
+            params["until"] = _iso8601(until)
+        url = self._assemble_endpoint_from_repo_url(
+            html_url, endpoint="commits"
+        )
+        url += f"?{urlencode(params)}"
+        for page in self._iter_pages(url, debug=debug):
+            if page:
+                yield _commit_frame(page)
+
     def get_commits_for_html_url(
         self,
         html_url: str,
@@ -496,11 +1199,10 @@ class GithubClient:
         debug: bool
             Whether to print debugging statements. By default False.
         timedelta_cutoff_days: Union[None, int]
-            Used to limit query volume to a time window. If not None, the
-            number of days since the commit was made will be compared to
-            today's date. The paginated queries will break when the first
-            commit with a date that is greater than this threshold is
-            encountered. By default None.
+            Used to limit query volume to a time window. If not None,
+            only commits made fewer than this many whole days ago are
+            returned, filtered by GitHub with the `since` parameter so
+            that older pages are never requested. By default None.
 
         Returns
         -------
@@ -510,10 +1212,13 @@ class GithubClient:
         url = self._assemble_endpoint_from_repo_url(
             html_url, endpoint="commits"
         )
+        if timedelta_cutoff_days is not None:
+            # filtered by GitHub. Commits are dropped once a whole number
+            # of days older than the cutoff, so since is a day earlier
+            since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(
+                days=timedelta_cutoff_days + 1
+            )
+            url += f"?{urlencode({'since': _iso8601(since)})}"
         print(url)
-        resps = self._paginated_get(
-            url=url,
-            debug=debug,
-            timedelta_cutoff_days=timedelta_cutoff_days,
-        )
+        resps = self._paginated_get(url=url, debug=debug)
         return resps
@@ -0,0 +1,333 @@
+"""Pool GitHub credentials to raise aggregate API throughput.
+
+Each credential has its own rate limit, one per API resource such as the
+core REST API or search. Requests are authenticated with the credential
+with the most remaining budget for their resource, as reported by the
+rate limit headers of its latest response, and credentials exhausted
+before their limit resets are parked until then. Credentials can be personal
+access tokens or GitHub App installation tokens, which are refreshed
+before they expire.
+"""
+
+import datetime as dt
+import threading
+import time
+from typing import Iterable, Iterator, Union
+from urllib.parse import urlsplit
+
+import requests
+
+from ai_nexus_backend.requests_utils import (
+    _configure_requests,
+    _handle_response,
+)
+
+try:
+    import jwt
+except ImportError:  # optional, install with `pip install '.[app]'`
+    jwt = None
+
+# budget assumed for a credential until a response reports its own
+DEFAULT_LIMIT = 5000
+# budgets of resources with their own, smaller rate limit
+_RESOURCE_LIMITS = {"search": 30, "code_search": 10}
+# statuses GitHub uses for requests over the primary rate limit
+_RATE_LIMITED = (403, 429)
+
+
+class PatCredential:
+    """A personal access token.
+
+    Parameters
+    ----------
+    pat : str
+        The personal access token.
+    """
+
+    def __init__(self, pat: str):
+        self.__pat = pat
+
+    def token(self) -> str:
+        """The bearer token to send."""
+        return self.__pat
+
+
+def _resource(url: str) -> str:
+    """The rate limit resource a request to url counts against, as
+    GitHub reports in the `X-RateLimit-Resource` header."""
+    path = urlsplit(str(url)).path
+    if path.startswith("/search/code"):
+        return "code_search"
+    if path.startswith("/search/"):
+        return "search"
+    return "core"
+
+
+def _app_jwt(app_id: Union[int, str], private_key: str) -> str:
+    """A JSON web token authenticating as a GitHub App."""
+    if jwt is None:
+        raise ImportError(
+            "PyJWT is required to authenticate as a GitHub App. Install"
+            " with `pip install '.[app]'`"
+        )
+    now = int(time.time())
+    # backdated to allow for clock drift, GitHub allows up to 10 minutes
+    payload = {"iat": now - 60, "exp": now + 540, "iss": str(app_id)}
+    return jwt.encode(payload, private_key, algorithm="RS256")
+
+
+class AppInstallationCredential:
+    """A GitHub App installation token, refreshed before it expires.
+
+    Parameters
+    ----------
+    app_id : Union[int, str]
+        The GitHub App's ID.
+    private_key : str
+        The GitHub App's PEM encoded private key.
+    installation_id : Union[int, str]
+        ID of the App's installation on the organisation.
+    refresh_margin : float, optional
+        Seconds before expiry at which the token is refreshed. Defaults
+        to 300.
+    sess : requests.Session, optional
+        Session used to request tokens. Defaults to a session with retry,
+        as configured by `requests_utils._configure_requests()`.
+    """
+
+    def __init__(
+        self,
+        app_id: Union[int, str],
+        private_key: str,
+        installation_id: Union[int, str],
+        refresh_margin: float = 300.0,
+        sess: requests.Session = None,
+    ):
+        self.app_id = app_id
+        self.__private_key = private_key
+        self.installation_id = installation_id
+        self.refresh_margin = refresh_margin
+        self._session = sess if sess is not None else _configure_requests()
+        self._lock = threading.Lock()
+        self.__token = None
+        self.expires_at = 0.0
+
+    def token(self) -> str:
+        """The bearer token to send, refreshed if close to expiry.
+
+        Raises
+        ------
+        ImportError
+            PyJWT is not installed.
+        requests.HTTPError
+            GitHub did not issue a token.
+        """
+        with self._lock:
+            if time.time() >= self.expires_at - self.refresh_margin:
+                self._refresh()
+            return self.__token
+
+    def _refresh(self) -> None:
+        """Exchange a JSON web token for a new installation token."""
+        url = (
+            "https://api.github.com/app/installations/"
+            f"{self.installation_id}/access_tokens"
+        )
+        app_jwt = _app_jwt(self.app_id, self.__private_key)
+        headers = {
+            "Authorization": f"Bearer {app_jwt}",
+            "accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        content = _handle_response(
+            self._session.post(url, headers=headers)
+        ).json()
+        self.__token = content["token"]
+        # fromisoformat only accepts a Z suffix from python 3.11
+        expires_at = content["expires_at"].replace("Z", "+00:00")
+        self.expires_at = dt.datetime.fromisoformat(expires_at).timestamp()
+        return None
+
+
+class TokenPool(requests.auth.AuthBase):
+    """Authenticate requests with the least used of several credentials.
+
+    Set as a session's `auth`, each request is sent with the credential
+    with the most remaining budget for its rate limit resource, such as
+    "core" or "search". Budget is reserved as each request is sent &
+    corrected from the `X-RateLimit-Remaining`, `X-RateLimit-Reset` &
+    `X-RateLimit-Resource` headers of its response. A request rejected by
+    the rate limit parks its credential until reset & is resent with
+    another.
+    When every credential is parked, requests wait for the earliest
+    reset, up to max_wait, & the request is resent.
+    Also authenticates the requests of a `requests_utils.Http2Session`.
+
+    Parameters
+    ----------
+    credentials : Iterable
+        The credentials to pool, as `PatCredential` or
+        `AppInstallationCredential`. Strings are treated as personal
+        access tokens.
+    max_wait : float, optional
+        Maximum seconds to wait for a rate limit to reset. Defaults to
+        3600, GitHub's rate limit window.
+
+    Attributes
+    ----------
+    remaining : dict
+        Remaining budget of each credential, keyed by resource.
+    reset : dict
+        Epoch seconds at which each credential's budget resets, keyed by
+        resource.
+
+    Raises
+    ------
+    ValueError
+        No credentials were given.
+    """
+
+    def __init__(
+        self,
+        credentials: Iterable[
+            Union[str, PatCredential, AppInstallationCredential]
+        ],
+        max_wait: float = 3600.0,
+    ):
+        self.credentials = [
+            PatCredential(c) if isinstance(c, str) else c
+            for c in credentials
+        ]
+        if not self.credentials:
+            raise ValueError("TokenPool needs at least one credential")
+        self.max_wait = max_wait
+        self.remaining = dict()
+        self.reset = dict()
+        self._lock = threading.Lock()
+        # bearer token: credential index, to attribute responses
+        self._sent_with = dict()
+
+    @property
+    def _max_tries(self) -> int:
+        """Sends of a rate limited request: once with each credential,
+        then again with each after waiting for their reset."""
+        return 2 * len(self.credentials)
+
+    def _budget(self, resource: str) -> tuple:
+        """Remaining & reset lists of a resource, created on first use.
+        Call while holding the lock."""
+        if resource not in self.remaining:
+            limit = _RESOURCE_LIMITS.get(resource, DEFAULT_LIMIT)
+            self.remaining[resource] = [limit] * len(self.credentials)
+            self.reset[resource] = [0.0] * len(self.credentials)
+        return self.remaining[resource], self.reset[resource]
+
+    def _acquire(self, resource: str = "core") -> int:
+        """Reserve budget for a resource on the credential with the most
+        remaining.
+
+        Raises
+        ------
+        requests.HTTPError
+            Every credential is parked for longer than max_wait.
+        """
+        limit = _RESOURCE_LIMITS.get(resource, DEFAULT_LIMIT)
+        while True:
+            with self._lock:
+                remaining, resets = self._budget(resource)
+                now = time.time()
+                for i, reset in enumerate(resets):
+                    if remaining[i] <= 0 and now >= reset:
+                        # parked credential's window has reset
+                        remaining[i] = limit
+                i = max(
+                    range(len(self.credentials)),
+                    key=remaining.__getitem__,
+                )
+                if remaining[i] > 0:
+                    remaining[i] -= 1
+                    return i
+                wait_s = min(resets) - now
+            if wait_s > self.max_wait:
+                raise requests.HTTPError(
+                    f"Every token is rate limited for {wait_s:.0f}s,"
+                    f" longer than max_wait of {self.max_wait:.0f}s"
+                )
+            time.sleep(max(wait_s, 0.0))
+
+    def __call__(
+        self, r: requests.PreparedRequest
+    ) -> requests.PreparedRequest:
+        i = self._acquire(_resource(r.url))
+        token = self.credentials[i].token()
+        with self._lock:
+            self._sent_with[token] = i
+        r.headers["Authorization"] = f"Bearer {token}"
+        if self._on_response not in r.hooks["response"]:
+            r.register_hook("response", self._on_response)
+        return r
+
+    def _record(
+        self, i: int, status_code: int, headers, resource: str
+    ) -> bool:
+        """Record the rate limit headers of a response to credential i,
+        True if the response was rejected by the rate limit.
+
+        Budget is recorded against the resource named by the response,
+        else the resource the request was reserved from.
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None:
+            return False
+        resource = headers.get("X-RateLimit-Resource", resource)
+        with self._lock:
+            budget, resets = self._budget(resource)
+            budget[i] = int(remaining)
+            if reset is not None:
+                resets[i] = float(reset)
+        return status_code in _RATE_LIMITED and int(remaining) <= 0
+
+    def _on_response(
+        self, resp: requests.Response, **kwargs
+    ) -> requests.Response:
+        """Record the rate limit headers of a response, resending it with
+        another credential if it was rate limited."""
+        token = resp.request.headers["Authorization"].removeprefix(
+            "Bearer "
+        )
+        with self._lock:
+            i = self._sent_with.get(token)
+        if i is None or not self._record(
+            i, resp.status_code, resp.headers, _resource(resp.request.url)
+        ):
+            return resp
+        tries = getattr(resp.request, "_pool_tries", 1)
+        if tries >= self._max_tries:
+            return resp
+        # release the connection before resending, as requests' own
+        # digest auth does
+        resp.content
+        resp.close()
+        resent = resp.request.copy()
+        resent._pool_tries = tries + 1
+        self(resent)
+        new_resp = resp.connection.send(resent, **kwargs)
+        new_resp.history.append(resp)
+        new_resp.request = resent
+        return self._on_response(new_resp, **kwargs)
+
+    def auth_flow(self, request) -> Iterator:
+        """Authenticate a httpx request, as `requests_utils.Http2Session`
+        sends them, resending it with another credential if it was rate
+        limited."""
+        resource = _resource(request.url)
+        for _ in range(self._max_tries):
+            i = self._acquire(resource)
+            token = self.credentials[i].token()
+            request.headers["Authorization"] = f"Bearer {token}"
+            response = yield request
+            if not self._record(
+                i, response.status_code, response.headers, resource
+            ):
+                return
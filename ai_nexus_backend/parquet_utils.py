@@ -0,0 +1,237 @@
+"""Typed Arrow schema & partitioned parquet dataset for repo snapshots."""
+
+import pathlib
+import shutil
+from typing import List, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CUSTOM_PROPERTY_PREFIX = "custom_property_"
+PARTITIONING = ds.partitioning(
+    pa.schema([("org_nm", pa.dictionary(pa.int32(), pa.string()))]),
+    flavor="hive",
+)
+REPO_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("html_url", pa.string()),
+        ("repo_url", pa.string()),
+        ("is_private", pa.bool_()),
+        ("is_archived", pa.bool_()),
+        ("name", pa.string()),
+        ("description", pa.string()),
+        (
+            "programming_language",
+            pa.dictionary(pa.int32(), pa.string()),
+        ),
+        ("updated_at", pa.timestamp("s", tz="UTC")),
+        ("org_nm", pa.dictionary(pa.int32(), pa.string())),
+        ("topics", pa.list_(pa.string())),
+    ]
+)
+
+
+def _topic_list(topics: Union[None, dict, list]) -> list:
+    """Flatten topics to a list of topic names.
+
+    Accepts topics API responses, as stored in untyped parquet, or
+    arrays read from `list<string>` columns.
+    """
+    if topics is None:
+        return []
+    if isinstance(topics, dict):
+        return [str(t) for names in topics.values() for t in names]
+    return [str(t) for t in topics]
+
+
+def _pivot_custom_properties(custom_props: pd.DataFrame) -> pd.DataFrame:
+    """Pivot custom properties responses into one column per property.
+
+    Columns are sorted by property name so the schema is stable.
+    """
+    rows = dict()
+    for html_url, props in zip(
+        custom_props["repo_url"], custom_props["custom_properties"]
+    ):
+        rows[html_url] = {
+            p["property_name"]: p["value"] for p in (props or [])
+        }
+    pivoted = pd.DataFrame.from_dict(rows, orient="index")
+    pivoted = pivoted.reindex(columns=sorted(pivoted.columns))
+    pivoted.columns = [
+        f"{CUSTOM_PROPERTY_PREFIX}{c}" for c in pivoted.columns
+    ]
+    pivoted.index.name = "html_url"
+    return pivoted
+
+
+def _property_list(value) -> Union[None, list]:
+    """Wrap a single custom property value in a list, None if unset."""
+    if isinstance(value, list):
+        return value
+    if value is None or pd.isna(value):
+        return None
+    return [value]
+
+
+def _custom_property_fields(pivoted: pd.DataFrame) -> List[pa.Field]:
+    """A list<string> field per custom property column.
+
+    Every property is a list, whatever its values, so that a property is
+    the same type in every organisation's partition & snapshot, even
+    where it is multi-select in one & single valued in another.
+    """
+    fields = list()
+    for col in pivoted.columns:
+        pivoted[col] = pivoted[col].map(_property_list)
+        fields.append(pa.field(col, pa.list_(pa.string())))
+    return fields
+
+
+def repos_to_table(
+    repos: pd.DataFrame,
+    custom_props: Union[None, pd.DataFrame] = None,
+    topics: Union[None, pd.DataFrame] = None,
+) -> pa.Table:
+    """Combine repo metadata into a table conforming to REPO_SCHEMA.
+
+    Parameters
+    ----------
+    repos: pd.DataFrame
+        Repo metadata, as returned by `GithubClient.get_org_repos()`.
+    custom_props: Union[None, pd.DataFrame]
+        Custom properties, as returned by
+        `GithubClient.get_all_repo_metadata(metadata="custom_properties")`.
+        Pivoted into one `list<string>` `custom_property_<name>` column
+        per property.
+    topics: Union[None, pd.DataFrame]
+        Topics, as returned by
+        `GithubClient.get_all_repo_metadata(metadata="topics")`.
+
+    Returns
+    -------
+    pa.Table
+        Typed table of repo snapshots. Topics are `list<string>`,
+        `updated_at` a UTC timestamp & `org_nm` and
+        `programming_language` are dictionary encoded.
+    """
+    dat = repos.reset_index().set_index("html_url", drop=False)
+    dat["updated_at"] = pd.to_datetime(dat["updated_at"], utc=True)
+    if topics is not None:
+        topic_lists = dict(
+            zip(topics["repo_url"], map(_topic_list, topics["topics"]))
+        )
+        dat["topics"] = [topic_lists.get(u, []) for u in dat.index]
+    elif "topics" in dat.columns:
+        dat["topics"] = dat["topics"].map(_topic_list)
+    else:
+        dat["topics"] = [[] for _ in dat.index]
+    # an empty column would otherwise be float
+    dat["topics"] = dat["topics"].astype(object)
+    schema = REPO_SCHEMA
+    if custom_props is not None and len(custom_props):
+        pivoted = _pivot_custom_properties(custom_props)
+        for field in _custom_property_fields(pivoted):
+            schema = schema.append(field)
+        dat = dat.join(pivoted)
+    return pa.Table.from_pandas(
+        dat[schema.names], schema=schema, preserve_index=False
+    )
+
+
+def write_repo_dataset(
+    table: pa.Table,
+    root: pathlib.Path,
+    compression: str = "zstd",
+    max_rows_per_group: int = 64 * 1024,
+    org_nms: Union[None, List[str]] = None,
+) -> None:
+    """Write repo snapshots as a parquet dataset partitioned by org.
+
+    Partitions for the organisations in `table` are replaced, other
+    organisations' partitions are left untouched. Row group statistics
+    are written so that readers can skip row groups on filtered reads.
+    An organisation without rows replaces no partition, so pass it in
+    `org_nms` to remove its partition.
+
+    Parameters
+    ----------
+    table: pa.Table
+        Table as returned by `repos_to_table()`.
+    root: pathlib.Path
+        Dataset root directory, partitions are written to
+        `<root>/org_nm=<org>/`.
+    compression: str
+        Parquet compression codec. Defaults to "zstd".
+    max_rows_per_group: int
+        Maximum number of rows in each parquet row group.
+    org_nms: Union[None, List[str]]
+        Organisations snapshotted in `table`. Partitions of those
+        without rows are removed. Defaults to None, the organisations
+        in `table`.
+
+    Returns
+    -------
+    None
+    """
+    written = set(pc.unique(table.column("org_nm")).to_pylist())
+    for org_nm in set(org_nms or []) - written:
+        shutil.rmtree(
+            pathlib.Path(root) / f"org_nm={org_nm}", ignore_errors=True
+        )
+    if not table.num_rows:
+        return None
+    file_options = ds.ParquetFileFormat().make_write_options(
+        compression=compression, write_statistics=True
+    )
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        file_options=file_options,
+        max_rows_per_group=max_rows_per_group,
+        existing_data_behavior="delete_matching",
+    )
+    return None
+
+
+def read_repo_dataset(
+    root: pathlib.Path,
+    org_nm: Union[None, str] = None,
+    columns: Union[None, List[str]] = None,
+) -> pd.DataFrame:
+    """Read repo snapshots from a partitioned parquet dataset.
+
+    Filtering on `org_nm` prunes partitions, so other organisations'
+    row groups are never decoded.
+
+    Parameters
+    ----------
+    root: pathlib.Path
+        Dataset root directory written by `write_repo_dataset()`.
+    org_nm: Union[None, str]
+        Organisation to read. Defaults to None, which reads all.
+    columns: Union[None, List[str]]
+        Columns to read. Defaults to None, which reads all.
+
+    Returns
+    -------
+    pd.DataFrame
+        The repo snapshots.
+    """
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    # partitions may hold different custom properties, read them all
+    schema = pa.unify_schemas(
+        [pq.read_schema(f) for f in dataset.files] + [PARTITIONING.schema]
+    )
+    dataset = ds.dataset(
+        root, schema=schema, format="parquet", partitioning=partitioning
+    )
+    filt = None if org_nm is None else pc.field("org_nm") == org_nm
+    return dataset.to_table(columns=columns, filter=filt).to_pandas()
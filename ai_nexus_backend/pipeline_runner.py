@@ -0,0 +1,373 @@
+"""Run pipeline stages in dependency order, skipping unchanged stages.
+
+Each stage declares the files it reads, the files it writes & the source
+files it runs. A stage is fingerprinted by hashing its inputs & code, and
+is skipped when the fingerprint matches its last successful run and its
+outputs are as that run left them. File digests are cached against file
+size & modification time, so a run where nothing changed only stats
+files. Stages reading the outputs of other stages run after them, all
+other stages run concurrently.
+"""
+
+import ast
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import json
+import pathlib
+import subprocess
+import time
+from typing import Callable, Dict, Iterable, List, Union
+
+import pandas as pd
+
+from ai_nexus_backend.build_yaml import _atomic_write
+
+# read size when hashing files, keeps memory flat for large parquet files
+_CHUNK_SIZE = 2**20
+# directory of this package, whose modules stages import
+_PACKAGE_DIR = pathlib.Path(__file__).parent
+
+
+class Stage:
+    """A pipeline stage.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the stage.
+    action : Union[Callable, List[str]]
+        A function called with no arguments, or a command run as a
+        subprocess, such as `["python3", "pipeline/01_gulp_data.py"]`.
+    inputs : Iterable[pathlib.Path], optional
+        Files or directories read by the stage.
+    outputs : Iterable[pathlib.Path], optional
+        Files or directories written by the stage.
+    code : Iterable[pathlib.Path], optional
+        Source files the stage runs, such as its script & the modules it
+        imports. Fingerprinted with the inputs, so that code changes
+        rerun the stage.
+    after : Iterable[str], optional
+        Names of stages to run before this one, in addition to the
+        stages writing its inputs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        action: Union[Callable, List[str]],
+        inputs: Iterable[pathlib.Path] = (),
+        outputs: Iterable[pathlib.Path] = (),
+        code: Iterable[pathlib.Path] = (),
+        after: Iterable[str] = (),
+    ):
+        self.name = name
+        self.action = action
+        self.inputs = [pathlib.Path(p) for p in inputs]
+        self.outputs = [pathlib.Path(p) for p in outputs]
+        self.code = [pathlib.Path(p) for p in code]
+        self.after = list(after)
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r})"
+
+    def _action_id(self) -> str:
+        """Identifies the action, so that changing it reruns the stage."""
+        if callable(self.action):
+            return f"{self.action.__module__}.{self.action.__qualname__}"
+        return json.dumps([str(arg) for arg in self.action])
+
+    def run(self) -> None:
+        """Run the stage's action.
+
+        Raises
+        ------
+        subprocess.CalledProcessError
+            A command exited with a nonzero status.
+        """
+        if callable(self.action):
+            self.action()
+        else:
+            subprocess.run([str(arg) for arg in self.action], check=True)
+        return None
+
+
+def _imported_modules(
+    pth: pathlib.Path, package_dir: pathlib.Path
+) -> List[pathlib.Path]:
+    """Source files of the package modules a file imports."""
+    pkg = package_dir.name
+    names = list()
+    for node in ast.walk(ast.parse(pathlib.Path(pth).read_text())):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            if node.module == pkg:
+                # from package import module
+                names += [f"{pkg}.{alias.name}" for alias in node.names]
+            else:
+                names.append(node.module)
+    modules = list()
+    for nm in names:
+        parts = nm.split(".")
+        if parts[0] != pkg or len(parts) < 2:
+            continue
+        src = package_dir.joinpath(*parts[1:]).with_suffix(".py")
+        if src.exists():
+            modules.append(src)
+    return modules
+
+
+def script_sources(
+    script: pathlib.Path, package_dir: pathlib.Path = _PACKAGE_DIR
+) -> List[pathlib.Path]:
+    """A script & the package modules it imports, directly or through
+    other modules, for a stage's `code`.
+
+    Deriving a stage's code from its imports keeps its fingerprint in
+    step with the modules it actually runs.
+
+    Parameters
+    ----------
+    script : pathlib.Path
+        The stage's script.
+    package_dir : pathlib.Path, optional
+        Directory of the package whose modules are followed. Defaults to
+        `ai_nexus_backend`.
+
+    Returns
+    -------
+    List[pathlib.Path]
+        The script, followed by the imported modules in sorted order.
+    """
+    script = pathlib.Path(script)
+    seen = set()
+    todo = [script]
+    while todo:
+        for src in _imported_modules(todo.pop(), package_dir):
+            if src not in seen:
+                seen.add(src)
+                todo.append(src)
+    return [script] + sorted(seen - {script})
+
+
+def _overlaps(a: pathlib.Path, b: pathlib.Path) -> bool:
+    """Whether one path is, or is inside, the other."""
+    a, b = a.resolve(), b.resolve()
+    return a == b or a in b.parents or b in a.parents
+
+
+def _dependencies(stages: List[Stage]) -> Dict[str, set]:
+    """Names of the stages each stage must run after.
+
+    Raises
+    ------
+    ValueError
+        Stage names are not unique, a stage runs after an unknown stage,
+        or the dependencies contain a cycle.
+    """
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Stage names must be unique. Found {names}")
+    deps = dict()
+    for stage in stages:
+        unknown = set(stage.after) - set(names)
+        if unknown:
+            raise ValueError(
+                f"Stage {stage.name} runs after unknown stages: {unknown}"
+            )
+        deps[stage.name] = set(stage.after) | {
+            other.name
+            for other in stages
+            if other is not stage
+            and any(
+                _overlaps(inp, out)
+                for inp in stage.inputs
+                for out in other.outputs
+            )
+        }
+
+    # repeatedly remove stages with no remaining dependencies
+    remaining = {nm: set(d) for nm, d in deps.items()}
+    while remaining:
+        free = {nm for nm, d in remaining.items() if not d}
+        if not free:
+            raise ValueError(
+                f"Stage dependencies contain a cycle: {sorted(remaining)}"
+            )
+        remaining = {
+            nm: d - free for nm, d in remaining.items() if nm not in free
+        }
+    return deps
+
+
+def _file_digest(pth: pathlib.Path, cached: dict, seen: dict) -> str:
+    """SHA-256 of a file, reusing the cached digest if its size & mtime
+    are unchanged. Entries used are copied into seen, so that entries for
+    deleted files are dropped from the next run's cache."""
+    stat = pth.stat()
+    key = str(pth)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    entry = seen.get(key) or cached.get(key)
+    if entry is None or entry[:2] != stamp:
+        digest = hashlib.sha256()
+        with open(pth, "rb") as f:
+            while chunk := f.read(_CHUNK_SIZE):
+                digest.update(chunk)
+        entry = stamp + [digest.hexdigest()]
+    seen[key] = entry
+    return entry[2]
+
+
+def _fingerprint(
+    paths: Iterable[pathlib.Path], cached: dict, seen: dict
+) -> str:
+    """Hash of the names & content of every file under paths."""
+    digest = hashlib.sha256()
+    for pth in paths:
+        if pth.is_dir():
+            files = sorted(p for p in pth.rglob("*") if p.is_file())
+        elif pth.exists():
+            files = [pth]
+        else:
+            # distinguishes a missing path from an empty directory
+            digest.update(f"{pth}\0missing\0".encode("utf-8"))
+            continue
+        for f in files:
+            file_digest = _file_digest(f, cached, seen)
+            digest.update(f"{f}\0{file_digest}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_state(state_pth: pathlib.Path) -> dict:
+    """Read the run state, empty if no run has been recorded."""
+    if not state_pth.exists():
+        return {"files": dict(), "stages": dict()}
+    with open(state_pth) as f:
+        return json.load(f)
+
+
+def run_pipeline(
+    stages: Iterable[Stage],
+    state_pth: pathlib.Path,
+    max_workers: int = 4,
+    force: Iterable[str] = (),
+) -> pd.DataFrame:
+    """Run stages in dependency order, skipping unchanged stages.
+
+    Parameters
+    ----------
+    stages : Iterable[Stage]
+        The stages to run.
+    state_pth : pathlib.Path
+        JSON file recording the fingerprints of successful runs & cached
+        file digests. Created if it does not exist.
+    max_workers : int, optional
+        Maximum number of stages running at once. Defaults to 4.
+    force : Iterable[str], optional
+        Names of stages to run even if unchanged, such as stages fetching
+        data from an API. Stages reading their outputs run if the
+        outputs change.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per stage, in order of completion, with `stage`, `status`,
+        `seconds` & `error` columns. Status is "ran", "skipped", "failed"
+        or "blocked", where blocked stages were not run as a stage they
+        depend on failed.
+
+    Raises
+    ------
+    ValueError
+        `max_workers` is less than 1, `force` names an unknown stage, or
+        the stage dependencies are invalid.
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be >= 1. Found {max_workers}")
+    stages = list(stages)
+    deps = _dependencies(stages)
+    force = set(force)
+    unknown = force - set(deps)
+    if unknown:
+        raise ValueError(f"Cannot force unknown stages: {unknown}")
+    state_pth = pathlib.Path(state_pth)
+    state = _load_state(state_pth)
+    cached = state["files"]
+    seen = dict()
+
+    def _save() -> None:
+        state_pth.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(
+            state_pth,
+            json.dumps({"files": seen, "stages": state["stages"]}),
+        )
+
+    status = dict()
+    rows = list()
+    # future: (stage, fingerprint, start time)
+    running = dict()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(status) < len(stages):
+            decided = False
+            started = {stage.name for stage, _, _ in running.values()}
+            for stage in stages:
+                if stage.name in status or stage.name in started:
+                    continue
+                upstream = [status.get(nm) for nm in deps[stage.name]]
+                if None in upstream:
+                    continue
+                if "failed" in upstream or "blocked" in upstream:
+                    status[stage.name] = "blocked"
+                    rows.append([stage.name, "blocked", 0.0, None])
+                    decided = True
+                    continue
+                start = time.perf_counter()
+                fp = _fingerprint(stage.inputs + stage.code, cached, seen)
+                fp = hashlib.sha256(
+                    f"{stage._action_id()}\0{fp}".encode("utf-8")
+                ).hexdigest()
+                record = {
+                    "fingerprint": fp,
+                    "outputs": _fingerprint(stage.outputs, cached, seen),
+                }
+                if (
+                    stage.name not in force
+                    and state["stages"].get(stage.name) == record
+                ):
+                    status[stage.name] = "skipped"
+                    elapsed = time.perf_counter() - start
+                    rows.append([stage.name, "skipped", elapsed, None])
+                    decided = True
+                    continue
+                future = executor.submit(stage.run)
+                running[future] = (stage, fp, start)
+            # skipped & blocked stages may have unblocked others
+            if decided or not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fp, start = running.pop(future)
+                elapsed = time.perf_counter() - start
+                try:
+                    future.result()
+                except Exception as e:
+                    # rerun on the next run, whatever the fingerprint
+                    state["stages"].pop(stage.name, None)
+                    status[stage.name] = "failed"
+                    error = f"{type(e).__name__}: {e}"
+                    rows.append([stage.name, "failed", elapsed, error])
+                else:
+                    state["stages"][stage.name] = {
+                        "fingerprint": fp,
+                        "outputs": _fingerprint(
+                            stage.outputs, cached, seen
+                        ),
+                    }
+                    status[stage.name] = "ran"
+                    rows.append([stage.name, "ran", elapsed, None])
+                # recorded as stages finish, so an interrupted run keeps
+                # the stages it completed
+                _save()
+    _save()
+    columns = ["stage", "status", "seconds", "error"]
+    return pd.DataFrame(rows, columns=columns)
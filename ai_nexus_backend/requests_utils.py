@@ -1,9 +1,20 @@
 """Utilities common across generic requests sessions."""
 
+import time
 from typing import List
 
 import requests
 
+try:
+    import httpx
+except ImportError:  # optional, install with `pip install '.[http2]'`
+    httpx = None
+
+# methods urllib3 retries on a status in force_on, as requests does
+_IDEMPOTENT = frozenset(
+    ["DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"]
+)
+
 
 def _configure_requests(
     n: int = 5,
@@ -37,6 +48,205 @@ def _configure_requests(
     return s
 
 
+class Http2Response:
+    """A httpx response with the `requests.Response` attributes the
+    clients use, such as `ok` & `reason`."""
+
+    def __init__(self, resp):
+        self._resp = resp
+
+    @property
+    def ok(self) -> bool:
+        return self._resp.status_code < 400
+
+    @property
+    def reason(self) -> str:
+        return self._resp.reason_phrase
+
+    def __getattr__(self, nm):
+        # status_code, headers, links, content, text, json, history...
+        return getattr(self._resp, nm)
+
+
+class _AuthFlow(httpx.Auth if httpx is not None else object):
+    """Adapts an auth with an `auth_flow`, such as
+    `github_auth.TokenPool`, to httpx."""
+
+    def __init__(self, auth):
+        self._auth = auth
+
+    def auth_flow(self, request):
+        return self._auth.auth_flow(request)
+
+
+class Http2Session:
+    """A requests-like session multiplexing requests over HTTP/2.
+
+    Concurrent requests to a host share a single connection rather than
+    each needing a connection of their own, saving the handshakes &
+    connections of large concurrent crawls. Requests are retried as
+    `_configure_requests()` retries them & responses can be passed to
+    `_handle_response()`.
+
+    Parameters
+    ----------
+    n : int, optional
+        Number of retries, by default 5
+    backoff_f : float, optional
+        backoff_factor, by default 0.1
+    force_on : List[int], optional
+        HTTP status errors to retry, by default [500,502,503,504]
+    prior_knowledge : bool, optional
+        Speak HTTP/2 without negotiating it, as needed for plain http
+        servers. By default False, negotiating HTTP/2 over TLS & falling
+        back to HTTP/1.1.
+    timeout : float, optional
+        Seconds to wait for a response, by default 30.
+
+    Attributes
+    ----------
+    headers : dict
+        Headers sent with every request.
+    auth : Union[tuple, github_auth.TokenPool], optional
+        A (user, password) tuple for basic authentication or an auth with
+        an httpx `auth_flow`.
+
+    Raises
+    ------
+    ImportError
+        httpx is not installed.
+    """
+
+    def __init__(
+        self,
+        n: int = 5,
+        backoff_f: float = 0.1,
+        force_on: List[int] = [500, 502, 503, 504],
+        prior_knowledge: bool = False,
+        timeout: float = 30.0,
+    ):
+        if httpx is None:
+            raise ImportError(
+                "httpx is required for HTTP/2 sessions. Install with"
+                " `pip install '.[http2]'`"
+            )
+        self.n = n
+        self.backoff_f = backoff_f
+        self.force_on = force_on
+        self.headers = dict()
+        self.auth = None
+        self._client = httpx.Client(
+            http1=not prior_knowledge, http2=True, timeout=timeout
+        )
+
+    def _httpx_auth(self):
+        """The session's auth, as httpx accepts it."""
+        if hasattr(self.auth, "auth_flow"):
+            return _AuthFlow(self.auth)
+        return self.auth
+
+    def request(
+        self, method: str, url: str, headers: dict = None, **kwargs
+    ) -> Http2Response:
+        """Send a request, retrying connection errors & force_on statuses.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method.
+        url : str
+            The url to request.
+        headers : dict, optional
+            Headers sent in addition to the session's headers.
+        **kwargs
+            Passed to `httpx.Client.request`, such as params & json.
+
+        Returns
+        -------
+        Http2Response
+            The response, once it is not a force_on status or retries are
+            exhausted.
+
+        Raises
+        ------
+        requests.ConnectionError
+            The request failed to connect after every retry.
+        requests.Timeout
+            The request timed out after every retry.
+        """
+        merged = httpx.Headers(self.headers)
+        merged.update(headers or dict())
+        retry_status = method.upper() in _IDEMPOTENT
+        for attempt in range(self.n + 1):
+            if attempt:
+                # urllib3's backoff between consecutive retries
+                time.sleep(self.backoff_f * 2 ** (attempt - 1))
+            try:
+                resp = self._client.request(
+                    method,
+                    url,
+                    headers=merged,
+                    auth=self._httpx_auth(),
+                    **kwargs,
+                )
+            except httpx.TimeoutException as e:
+                if attempt == self.n:
+                    raise requests.Timeout(str(e)) from e
+                continue
+            except httpx.TransportError as e:
+                if attempt == self.n:
+                    raise requests.ConnectionError(str(e)) from e
+                continue
+            if not (retry_status and resp.status_code in self.force_on):
+                break
+        return Http2Response(resp)
+
+    def get(self, url: str, **kwargs) -> Http2Response:
+        """Send a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> Http2Response:
+        """Send a POST request."""
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        """Close the session's connections."""
+        self._client.close()
+
+
+def _configure_http2(
+    n: int = 5,
+    backoff_f: float = 0.1,
+    force_on: List[int] = [500, 502, 503, 504],
+    prior_knowledge: bool = False,
+) -> Http2Session:
+    """Set up a HTTP/2 session with retry.
+
+    Parameters
+    ----------
+    n : int, optional
+        Number of retries, by default 5
+    backoff_f : float, optional
+        backoff_factor, by default 0.1
+    force_on : List[int], optional
+        HTTP status errors to retry, by default [500,502,503,504]
+    prior_knowledge : bool, optional
+        Speak HTTP/2 without negotiating it, by default False
+
+    Returns
+    -------
+    Http2Session
+        The session configured with the specified retry strategy.
+
+    """
+    return Http2Session(
+        n=n,
+        backoff_f=backoff_f,
+        force_on=force_on,
+        prior_knowledge=prior_knowledge,
+    )
+
+
 def _url_defence(
     url: str, param_nm: str, exp_protocol: str = "https://"
 ) -> None:
@@ -58,5 +268,5 @@ def _handle_response(resp: requests.Response) -> requests.Response:
         return resp
     else:
         raise requests.HTTPError(
-            f"HTTP error {resp.status_code}:\n{resp.reason}"
+            f"HTTP error {resp.status_code}:\n{resp.reason}", response=resp
         )
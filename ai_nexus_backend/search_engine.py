@@ -0,0 +1,235 @@
+"""In-process BM25 search over transformed catalogue documents."""
+
+from collections import Counter
+import json
+import pathlib
+from typing import Dict, List, Union
+
+import numpy as np
+
+from ai_nexus_backend.search_index import _tokenise
+
+_ARRAYS = ("indptr", "doc_ids", "weights")
+
+
+class BM25Index:
+    """A BM25 inverted index over `{"content", "meta"}` documents.
+
+    Postings are stored CSR-style: the postings for the term with ID `t`
+    are `doc_ids[indptr[t]:indptr[t + 1]]`, with the precomputed BM25
+    weight of each posting in `weights`. A query sums the weights of its
+    terms' postings with a single `np.bincount`.
+
+    Parameters
+    ----------
+    k1 : float, optional
+        Term frequency saturation. Defaults to 1.5.
+    b : float, optional
+        Document length normalisation. Defaults to 0.75.
+    field_boosts : dict, optional
+        Score multipliers keyed by the `matched_field` of a document's
+        metadata, such as `{"project_name": 2.0}`. Fields not listed are
+        not boosted.
+
+    Attributes
+    ----------
+    docs : list
+        The indexed documents, in document ID order.
+    vocab : dict
+        Maps each term to its term ID.
+
+    Methods
+    -------
+    fit(docs:list) -> BM25Index
+        Build the index from a list of documents.
+    search(query:str, top_k:int) -> list
+        Return the top_k highest scoring documents for a query.
+    save(out_dir:pathlib.Path) -> None
+        Write the index to a directory.
+    load(index_dir:pathlib.Path, mmap:bool) -> BM25Index
+        Read an index written by save().
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        field_boosts: Union[None, Dict[str, float]] = None,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.field_boosts = field_boosts or dict()
+        self.docs = list()
+        self.vocab = dict()
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+
+    def fit(self, docs: List[dict]) -> "BM25Index":
+        """Build the index from a list of documents.
+
+        Parameters
+        ----------
+        docs : List[dict]
+            Documents as returned by `data_prep_utils.transform_data()`.
+
+        Returns
+        -------
+        BM25Index
+            The fitted index, for chaining.
+        """
+        term_ids, doc_ids, tfs = list(), list(), list()
+        doc_lens = np.zeros(len(docs), dtype=np.float32)
+        vocab = dict()
+        for doc_id, doc in enumerate(docs):
+            counts = Counter(_tokenise(doc["content"]))
+            doc_lens[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+
+        # sort postings by term, stable so doc IDs stay ascending
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tfs = (
+            term_ids[order],
+            doc_ids[order],
+            tfs[order],
+        )
+        df = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        n_docs = len(docs)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = doc_lens.mean() if n_docs else 0.0
+        norm = self.k1 * (1 - self.b + self.b * doc_lens / max(avgdl, 1))
+        boosts = np.array(
+            [
+                self.field_boosts.get(d["meta"].get("matched_field"), 1.0)
+                for d in docs
+            ],
+            dtype=np.float32,
+        )
+        weights = (
+            idf[term_ids]
+            * tfs
+            * (self.k1 + 1)
+            / (tfs + norm[doc_ids])
+            * boosts[doc_ids]
+        )
+
+        self.docs = list(docs)
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights.astype(np.float32)
+        return self
+
+    def _scores(self, query: str) -> np.ndarray:
+        """Score every document against the query."""
+        term_ids = [
+            self.vocab[t] for t in _tokenise(query) if t in self.vocab
+        ]
+        if not term_ids:
+            return np.zeros(len(self.docs), dtype=np.float32)
+        slices = [
+            slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids
+        ]
+        doc_ids = np.concatenate([self.doc_ids[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        return np.bincount(doc_ids, weights, minlength=len(self.docs))
+
+    def search(self, query: str, top_k: int = 10) -> List[dict]:
+        """Return the top_k highest scoring documents for a query.
+
+        Parameters
+        ----------
+        query : str
+            Free text query.
+        top_k : int, optional
+            Maximum number of documents to return. Defaults to 10.
+
+        Returns
+        -------
+        List[dict]
+            Matching documents with an added `score` key, in descending
+            score order. Documents matching no query terms are omitted.
+        """
+        scores = self._scores(query)
+        k = min(top_k, len(scores))
+        if k < 1:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            dict(self.docs[i], score=float(scores[i]))
+            for i in top
+            if scores[i] > 0
+        ]
+
+    def save(self, out_dir: pathlib.Path) -> None:
+        """Write the index to a directory.
+
+        Parameters
+        ----------
+        out_dir : pathlib.Path
+            Directory to write to. Created if it does not exist.
+
+        Returns
+        -------
+        None
+        """
+        out_dir = pathlib.Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for nm in _ARRAYS:
+            np.save(out_dir / f"{nm}.npy", getattr(self, nm))
+        params = {
+            "k1": self.k1,
+            "b": self.b,
+            "field_boosts": self.field_boosts,
+            # terms in term ID order
+            "vocab": sorted(self.vocab, key=self.vocab.get),
+            "docs": self.docs,
+        }
+        with open(out_dir / "index.json", "w") as f:
+            json.dump(params, f)
+        return None
+
+    @classmethod
+    def load(
+        cls, index_dir: pathlib.Path, mmap: bool = True
+    ) -> "BM25Index":
+        """Read an index written by save().
+
+        Parameters
+        ----------
+        index_dir : pathlib.Path
+            Directory written by `BM25Index.save()`.
+        mmap : bool, optional
+            Memory-map the postings rather than reading them into
+            memory. Defaults to True.
+
+        Returns
+        -------
+        BM25Index
+            The loaded index.
+        """
+        index_dir = pathlib.Path(index_dir)
+        with open(index_dir / "index.json") as f:
+            params = json.load(f)
+        index = cls(
+            k1=params["k1"],
+            b=params["b"],
+            field_boosts=params["field_boosts"],
+        )
+        index.docs = params["docs"]
+        index.vocab = {t: i for i, t in enumerate(params["vocab"])}
+        for nm in _ARRAYS:
+            arr = np.load(
+                index_dir / f"{nm}.npy", mmap_mode="r" if mmap else None
+            )
+            setattr(index, nm, arr)
+        return index
@@ -0,0 +1,256 @@
+"""Build a sharded, precompressed search index for the static site.
+
+The index is an inverted index of tokenised catalogue text, split into
+shards by term prefix so that a browser client needs only fetch the
+shards touched by a query, as `www/search_index.js` does for the site's
+search page. The index directory contains:
+
+- `manifest.json`: the prefix length, document count & shard file names.
+- `docs.json`: display fields for each document, indexed by document ID.
+- `shards/<prefix>.json`: maps terms to delta-encoded, ascending arrays
+  of document IDs. Gzip (and brotli, if installed) siblings are written
+  alongside every file.
+"""
+
+from itertools import accumulate
+import json
+import os
+import pathlib
+import re
+import shutil
+import tempfile
+from typing import Dict, List, Sequence
+
+from ai_nexus_backend.compress_utils import (
+    available_encodings,
+    write_compressed_siblings,
+)
+from ai_nexus_backend.parquet_utils import _topic_list, read_repo_dataset
+
+INDEX_VERSION = 1
+_TOKEN_PATTERN = re.compile(r"\w+")
+_SAFE_PREFIX = re.compile(r"^[a-z0-9_]+$")
+
+
+def _tokenise(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+
+def _delta_encode(ids: List[int]) -> List[int]:
+    """Delta-encode an ascending list of integers."""
+    return [ids[0]] + [b - a for a, b in zip(ids, ids[1:])] if ids else []
+
+
+def _delta_decode(deltas: List[int]) -> List[int]:
+    """Reverse _delta_encode."""
+    return list(accumulate(deltas))
+
+
+def _shard_key(term: str, prefix_len: int) -> str:
+    """Shard name for a term, hex-encoded where not filename safe."""
+    prefix = term[:prefix_len]
+    if _SAFE_PREFIX.match(prefix):
+        return prefix
+    return "x" + prefix.encode("utf-8").hex()
+
+
+def load_repo_documents(prq_dir: pathlib.Path) -> List[dict]:
+    """Read the repo dataset into search documents.
+
+    Parameters
+    ----------
+    prq_dir: pathlib.Path
+        Root of the repo dataset written by
+        `parquet_utils.write_repo_dataset()`.
+
+    Returns
+    -------
+    List[dict]
+        One dictionary per repo with title, href, description,
+        organisation & topics keys.
+    """
+    columns = ["name", "html_url", "description", "org_nm", "topics"]
+    dat = read_repo_dataset(prq_dir, columns=columns)
+    return [
+        {
+            "title": r["name"],
+            "href": r["html_url"],
+            "description": r["description"],
+            "organisation": r["org_nm"],
+            "topics": _topic_list(r["topics"]),
+        }
+        for _, r in dat.iterrows()
+    ]
+
+
+def _write_index(
+    index_dir: pathlib.Path,
+    docs: List[dict],
+    shards: Dict[str, dict],
+    fields: Sequence[str],
+    prefix_len: int,
+) -> None:
+    """Write the shards, display documents & manifest of an index, with
+    their compressed siblings, to an empty directory."""
+    shard_dir = index_dir / "shards"
+    shard_dir.mkdir()
+    encodings = available_encodings()
+    manifest_shards = dict()
+    for key, shard in shards.items():
+        shard_pth = shard_dir / f"{key}.json"
+        shard_pth.write_text(json.dumps(shard, separators=(",", ":")))
+        write_compressed_siblings(shard_pth, encodings)
+        manifest_shards[key] = {
+            "file": f"shards/{shard_pth.name}",
+            "n_terms": len(shard),
+        }
+
+    display_docs = [
+        {k: doc.get(k) for k in ["title", "href", "description"]}
+        for doc in docs
+    ]
+    manifest = {
+        "version": INDEX_VERSION,
+        "prefix_len": prefix_len,
+        "n_docs": len(docs),
+        "fields": list(fields),
+        "encodings": list(encodings),
+        "shards": manifest_shards,
+    }
+    for nm, content in [("docs", display_docs), ("manifest", manifest)]:
+        pth = index_dir / f"{nm}.json"
+        pth.write_text(json.dumps(content, separators=(",", ":")))
+        write_compressed_siblings(pth, encodings)
+    return None
+
+
+def _replace_dir(src: pathlib.Path, dst: pathlib.Path) -> None:
+    """Swap directory src in for dst.
+
+    A directory can only be renamed over an empty one, so an existing dst
+    is first moved aside, leaving it missing only between two renames,
+    then deleted. src gets the mode `mkdir()` would create it with, as
+    `tempfile.mkdtemp` creates directories readable by their owner only.
+    """
+    # the umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(src, 0o777 & ~umask)
+    if not dst.exists():
+        os.replace(src, dst)
+        return None
+    old = src.with_name(f"{src.name}.old")
+    os.replace(dst, old)
+    os.replace(src, dst)
+    shutil.rmtree(old)
+    return None
+
+
+def build_search_index(
+    docs: List[dict],
+    out_dir: pathlib.Path,
+    fields: Sequence[str] = ("title", "description", "topics"),
+    prefix_len: int = 2,
+) -> Dict[str, List[int]]:
+    """Write a sharded inverted index of docs to out_dir.
+
+    Parameters
+    ----------
+    docs: List[dict]
+        Documents to index. Document IDs are positions in this list.
+    out_dir: pathlib.Path
+        Directory to write the index to. Created if it does not exist,
+        otherwise replaced once the new index is fully written.
+    fields: Sequence[str]
+        Document keys to tokenise. List values are joined with spaces.
+        Defaults to title, description & topics.
+    prefix_len: int
+        Number of leading term characters used to assign shards.
+        Defaults to 2.
+
+    Returns
+    -------
+    Dict[str, List[int]]
+        The (undelta-ed) postings for every term.
+
+    Raises
+    ------
+    ValueError
+        `prefix_len` is less than 1.
+    """
+    if prefix_len < 1:
+        raise ValueError(f"prefix_len must be >= 1. Found {prefix_len}")
+    out_dir = pathlib.Path(out_dir)
+
+    postings = dict()
+    for doc_id, doc in enumerate(docs):
+        terms = set()
+        for field in fields:
+            val = doc.get(field)
+            if isinstance(val, (list, tuple)):
+                val = " ".join(val)
+            terms.update(_tokenise(val))
+        for term in terms:
+            # doc ids are visited in ascending order, postings stay sorted
+            postings.setdefault(term, []).append(doc_id)
+
+    shards = dict()
+    for term in sorted(postings):
+        key = _shard_key(term, prefix_len)
+        shards.setdefault(key, {})[term] = _delta_encode(postings[term])
+
+    # built in a sibling directory & swapped in whole, so that the index
+    # is never seen half written & stale shards go with the old index
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    build_dir = pathlib.Path(
+        tempfile.mkdtemp(
+            dir=out_dir.parent, prefix=f".{out_dir.name}.", suffix=".tmp"
+        )
+    )
+    try:
+        _write_index(build_dir, docs, shards, fields, prefix_len)
+        _replace_dir(build_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    return postings
+
+
+def query_search_index(index_dir: pathlib.Path, query: str) -> List[int]:
+    """Return IDs of documents containing every query term.
+
+    Reads only the shards touched by the query, mirroring the lookups a
+    browser client makes against the index.
+
+    Parameters
+    ----------
+    index_dir: pathlib.Path
+        Directory written by `build_search_index()`.
+    query: str
+        Free text query.
+
+    Returns
+    -------
+    List[int]
+        Ascending document IDs matching all query terms.
+    """
+    index_dir = pathlib.Path(index_dir)
+    manifest = json.loads((index_dir / "manifest.json").read_text())
+    terms = _tokenise(query)
+    if not terms:
+        return []
+    loaded = dict()
+    matches = None
+    for term in terms:
+        key = _shard_key(term, manifest["prefix_len"])
+        if key not in manifest["shards"]:
+            return []
+        if key not in loaded:
+            shard_pth = index_dir / manifest["shards"][key]["file"]
+            loaded[key] = json.loads(shard_pth.read_text())
+        ids = set(_delta_decode(loaded[key].get(term, [])))
+        matches = ids if matches is None else matches & ids
+    return sorted(matches)
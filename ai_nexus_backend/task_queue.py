@@ -0,0 +1,584 @@
+"""A persistent SQLite queue of per-repo tasks, such as fetching a repo's
+metadata, README or commits.
+
+Tasks are identified by kind & key, so enqueueing a task that is already
+queued or done is a no-op & a restarted crawl only runs the tasks left
+unfinished. Workers lease tasks for a fixed time, so the tasks of a
+worker that dies are leased again once their lease expires. Failed tasks
+are retried with exponential backoff, then moved to a dead letter table
+once out of attempts, or at once if a handler raises `PermanentError`.
+Dead lettered tasks can be requeued for another run, & finished tasks
+cleared once a crawl is complete so that the next crawl starts afresh.
+Workers can run in threads or processes, each with its own connection to
+the database.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+import pandas as pd
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    result TEXT,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_available
+    ON tasks (status, available_at);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    failed_at REAL NOT NULL,
+    retryable INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (kind, key)
+);
+"""
+# seconds a worker waits before polling for tasks leased elsewhere
+_POLL_S = 1.0
+
+
+class PermanentError(Exception):
+    """Raised by a handler for a task that would fail again if retried,
+    such as a request for a missing repo, to dead letter it at once."""
+
+
+class TaskQueue:
+    """A persistent queue of tasks in a SQLite database.
+
+    Each instance holds its own connection, so create one per thread or
+    process.
+
+    Parameters
+    ----------
+    pth : pathlib.Path
+        Path to the database, created if it does not exist.
+    lease_s : float, optional
+        Seconds a leased task is reserved for its worker, after which
+        it is leased to another. Defaults to 600.
+    max_attempts : int, optional
+        Attempts at a task before it is moved to the dead letter table.
+        Defaults to 5.
+    backoff_s : float, optional
+        Seconds before a failed task is retried, doubling with each
+        attempt. Defaults to 30.
+    max_backoff_s : float, optional
+        Longest wait before a failed task is retried. Defaults to 3600,
+        GitHub's rate limit window.
+
+    Raises
+    ------
+    ValueError
+        `max_attempts` is less than 1.
+    """
+
+    def __init__(
+        self,
+        pth: pathlib.Path,
+        lease_s: float = 600.0,
+        max_attempts: int = 5,
+        backoff_s: float = 30.0,
+        max_backoff_s: float = 3600.0,
+    ):
+        if max_attempts < 1:
+            raise ValueError(
+                f"max_attempts must be at least 1. Found {max_attempts}"
+            )
+        self.pth = pathlib.Path(pth)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        # autocommit, transactions are opened explicitly
+        self._conn = sqlite3.connect(
+            self.pth, timeout=30.0, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        # readers don't block the writer leasing tasks
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        """Run statements as a single write, excluding other writers."""
+        return _Transaction(self._conn)
+
+    def put(self, tasks: Iterable[Tuple[str, str, Any]]) -> int:
+        """Enqueue tasks not already queued, done or dead lettered.
+
+        Parameters
+        ----------
+        tasks : Iterable[Tuple[str, str, Any]]
+            (kind, key, payload) tuples, such as
+            `("readme", html_url, None)`. Payloads must be JSON
+            serialisable.
+
+        Returns
+        -------
+        int
+            The number of tasks enqueued.
+        """
+        rows = [
+            (kind, key, json.dumps(payload), kind, key)
+            for kind, key, payload in tasks
+        ]
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload)"
+                " SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM"
+                " dead_letters WHERE kind = ? AND key = ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def lease(self, owner: str, n: int = 1) -> List[dict]:
+        """Lease up to n tasks that are due, oldest first.
+
+        Tasks are due once pending & past their backoff, or once their
+        lease has expired. Tasks whose lease expired on their last
+        attempt are dead lettered rather than leased.
+
+        Parameters
+        ----------
+        owner : str
+            Identifies the worker, which must hold the lease to complete
+            or fail the task.
+        n : int, optional
+            Maximum number of tasks to lease. Defaults to 1.
+
+        Returns
+        -------
+        List[dict]
+            The leased tasks, with `id`, `kind`, `key`, `payload` &
+            `attempts` keys. Empty if no tasks are due.
+        """
+        now = time.time()
+        with self._transaction():
+            expired = self._conn.execute(
+                "SELECT id FROM tasks WHERE status = 'leased'"
+                " AND lease_expires <= ? AND attempts >= ?",
+                (now, self.max_attempts),
+            ).fetchall()
+            for row in expired:
+                self._dead_letter(row["id"], "Lease expired", now)
+            rows = self._conn.execute(
+                "SELECT id, kind, key, payload, attempts FROM tasks"
+                " WHERE (status = 'pending' AND available_at <= ?)"
+                " OR (status = 'leased' AND lease_expires <= ?)"
+                " ORDER BY id LIMIT ?",
+                (now, now, n),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE tasks SET status = 'leased', attempts = attempts"
+                " + 1, lease_owner = ?, lease_expires = ? WHERE id = ?",
+                [(owner, now + self.lease_s, r["id"]) for r in rows],
+            )
+        return [
+            {
+                "id": r["id"],
+                "kind": r["kind"],
+                "key": r["key"],
+                "payload": json.loads(r["payload"]),
+                "attempts": r["attempts"] + 1,
+            }
+            for r in rows
+        ]
+
+    def complete(self, task: dict, owner: str, result: Any = None) -> bool:
+        """Mark a leased task done, storing its result.
+
+        Parameters
+        ----------
+        task : dict
+            A task returned by `lease()`.
+        owner : str
+            The worker holding the lease.
+        result : Any, optional
+            The JSON serialisable result of the task.
+
+        Returns
+        -------
+        bool
+            False if the lease was lost, expiring & being leased to
+            another worker, in which case the result is discarded.
+        """
+        with self._transaction():
+            cur = self._conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?,"
+                " lease_owner = NULL, lease_expires = NULL, last_error ="
+                " NULL WHERE id = ? AND status = 'leased'"
+                " AND lease_owner = ?",
+                (json.dumps(result), task["id"], owner),
+            )
+            return cur.rowcount == 1
+
+    def fail(
+        self, task: dict, owner: str, error: str, retry: bool = True
+    ) -> bool:
+        """Record a failed attempt at a leased task.
+
+        The task is retried after `backoff_s * 2 ** (attempts - 1)`
+        seconds, up to `max_backoff_s`, or dead lettered once it has
+        been attempted `max_attempts` times or if `retry` is False.
+
+        Parameters
+        ----------
+        task : dict
+            A task returned by `lease()`.
+        owner : str
+            The worker holding the lease.
+        error : str
+            Description of the failure.
+        retry : bool, optional
+            Whether the task may succeed if retried. Defaults to True.
+
+        Returns
+        -------
+        bool
+            False if the lease was lost.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT attempts FROM tasks WHERE id = ?"
+                " AND status = 'leased' AND lease_owner = ?",
+                (task["id"], owner),
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row["attempts"]
+            if not retry or attempts >= self.max_attempts:
+                self._dead_letter(task["id"], error, now, retry)
+                return True
+            delay = min(
+                self.backoff_s * 2 ** (attempts - 1), self.max_backoff_s
+            )
+            self._conn.execute(
+                "UPDATE tasks SET status = 'pending', available_at = ?,"
+                " lease_owner = NULL, lease_expires = NULL,"
+                " last_error = ? WHERE id = ?",
+                (now + delay, error, task["id"]),
+            )
+            return True
+
+    def release(self, task: dict, owner: str) -> bool:
+        """Return a leased task to the queue without using an attempt,
+        as when its worker is interrupted.
+
+        Returns
+        -------
+        bool
+            False if the lease was lost.
+        """
+        with self._transaction():
+            cur = self._conn.execute(
+                "UPDATE tasks SET status = 'pending', available_at = 0,"
+                " attempts = attempts - 1, lease_owner = NULL,"
+                " lease_expires = NULL WHERE id = ? AND status = 'leased'"
+                " AND lease_owner = ?",
+                (task["id"], owner),
+            )
+            return cur.rowcount == 1
+
+    def _dead_letter(
+        self, task_id: int, error: str, now: float, retryable: bool = True
+    ) -> None:
+        """Move a task to the dead letter table, within a transaction."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO dead_letters"
+            " (kind, key, payload, attempts, error, failed_at, retryable)"
+            " SELECT kind, key, payload, attempts, ?, ?, ? FROM tasks"
+            " WHERE id = ?",
+            (error, now, int(retryable), task_id),
+        )
+        self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def next_due(self) -> Union[None, float]:
+        """Epoch seconds at which the next unfinished task is due, None
+        if every task is done or dead lettered."""
+        row = self._conn.execute(
+            "SELECT MIN(CASE status WHEN 'pending' THEN available_at"
+            " ELSE lease_expires END) AS due FROM tasks"
+            " WHERE status IN ('pending', 'leased')"
+        ).fetchone()
+        return row["due"]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks by status, including dead lettered tasks."""
+        counts = {"pending": 0, "leased": 0, "done": 0}
+        for row in self._conn.execute(
+            "SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"
+        ):
+            counts[row["status"]] = row["n"]
+        counts["dead"] = self._conn.execute(
+            "SELECT COUNT(*) FROM dead_letters"
+        ).fetchone()[0]
+        return counts
+
+    def results(self, kind: str) -> pd.DataFrame:
+        """Results of the done tasks of a kind.
+
+        Returns
+        -------
+        pd.DataFrame
+            With `key` & `result` columns, in the order the tasks were
+            enqueued.
+        """
+        rows = self._conn.execute(
+            "SELECT key, result FROM tasks WHERE kind = ?"
+            " AND status = 'done' ORDER BY id",
+            (kind,),
+        ).fetchall()
+        return pd.DataFrame(
+            {
+                "key": [r["key"] for r in rows],
+                "result": [json.loads(r["result"]) for r in rows],
+            }
+        )
+
+    def dead_letters(self) -> pd.DataFrame:
+        """Tasks out of attempts, with the error of their last attempt.
+
+        Returns
+        -------
+        pd.DataFrame
+            With `kind`, `key`, `payload`, `attempts`, `error`,
+            `failed_at` & `retryable` columns, `retryable` being False
+            for tasks failed without retrying.
+        """
+        rows = self._conn.execute(
+            "SELECT kind, key, payload, attempts, error, failed_at,"
+            " retryable FROM dead_letters ORDER BY id"
+        ).fetchall()
+        dat = pd.DataFrame(
+            [dict(r) for r in rows],
+            columns=[
+                "kind",
+                "key",
+                "payload",
+                "attempts",
+                "error",
+                "failed_at",
+                "retryable",
+            ],
+        )
+        dat["payload"] = dat["payload"].map(json.loads)
+        dat["retryable"] = dat["retryable"].astype(bool)
+        return dat
+
+    def clear_finished(self, kind: str = None) -> int:
+        """Delete done & dead lettered tasks, so that enqueueing them again
+        starts a fresh crawl rather than reusing their results.
+
+        Parameters
+        ----------
+        kind : str, optional
+            Only clear tasks of this kind. Defaults to None, every kind.
+
+        Returns
+        -------
+        int
+            The number of tasks deleted.
+        """
+        where, params = ("AND kind = ?", (kind,)) if kind else ("", ())
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.execute(
+                f"DELETE FROM tasks WHERE status = 'done' {where}", params
+            )
+            self._conn.execute(
+                f"DELETE FROM dead_letters WHERE 1 {where}", params
+            )
+            return self._conn.total_changes - before
+
+    def requeue_dead_letters(
+        self, kind: str = None, retryable_only: bool = False
+    ) -> int:
+        """Move dead lettered tasks back to the queue with fresh attempts.
+
+        Parameters
+        ----------
+        kind : str, optional
+            Only requeue tasks of this kind. Defaults to None, every
+            kind.
+        retryable_only : bool, optional
+            Only requeue tasks that ran out of attempts, leaving those
+            failed without retrying, such as by raising `PermanentError`.
+            Defaults to False.
+
+        Returns
+        -------
+        int
+            The number of tasks requeued.
+        """
+        conditions, params = [], []
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        if retryable_only:
+            conditions.append("retryable = 1")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload)"
+                f" SELECT kind, key, payload FROM dead_letters {where}",
+                params,
+            )
+            n = self._conn.total_changes - before
+            self._conn.execute(f"DELETE FROM dead_letters {where}", params)
+        return n
+
+
+class _Transaction:
+    """Context manager for an IMMEDIATE transaction, committed on exit
+    or rolled back if an exception was raised."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, *exc):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def run_worker(
+    pth: pathlib.Path,
+    handlers: Dict[str, Callable],
+    owner: str = None,
+    **queue_kwargs,
+) -> Dict[str, int]:
+    """Run tasks from the queue until every task is done or dead.
+
+    Tasks in backoff, or leased by other workers, are waited for, so a
+    worker only returns once the queue is finished.
+    An interrupted worker returns its task to the queue, while the tasks
+    of a worker killed outright are leased again once their lease
+    expires.
+
+    Parameters
+    ----------
+    pth : pathlib.Path
+        Path to the queue's database.
+    handlers : Dict[str, Callable]
+        Function running each kind of task, called with the task's key &
+        payload & returning its JSON serialisable result. Exceptions
+        fail the task, `PermanentError` without retrying it.
+    owner : str, optional
+        Identifies the worker. Defaults to the process & thread IDs.
+    **queue_kwargs
+        Passed to `TaskQueue`, such as `max_attempts`.
+
+    Returns
+    -------
+    Dict[str, int]
+        Number of tasks the worker completed & failed.
+    """
+    if owner is None:
+        owner = f"{os.getpid()}-{threading.get_ident()}"
+    tally = {"completed": 0, "failed": 0}
+    with TaskQueue(pth, **queue_kwargs) as queue:
+        while True:
+            tasks = queue.lease(owner)
+            if not tasks:
+                due = queue.next_due()
+                if due is None:
+                    return tally
+                time.sleep(min(max(due - time.time(), 0.0), _POLL_S))
+                continue
+            task = tasks[0]
+            try:
+                result = handlers[task["kind"]](
+                    task["key"], task["payload"]
+                )
+            except PermanentError as e:
+                queue.fail(
+                    task, owner, f"{type(e).__name__}: {e}", retry=False
+                )
+                tally["failed"] += 1
+            except Exception as e:
+                queue.fail(task, owner, f"{type(e).__name__}: {e}")
+                tally["failed"] += 1
+            except BaseException:
+                # interrupted, leave the task for the next run
+                queue.release(task, owner)
+                raise
+            else:
+                queue.complete(task, owner, result)
+                tally["completed"] += 1
+
+
+def run_queue(
+    pth: pathlib.Path,
+    handlers: Dict[str, Callable],
+    max_workers: int = 4,
+    processes: bool = False,
+    **queue_kwargs,
+) -> Dict[str, int]:
+    """Run the queue's tasks with several workers until it is finished.
+
+    Parameters
+    ----------
+    pth : pathlib.Path
+        Path to the queue's database.
+    handlers : Dict[str, Callable]
+        Function running each kind of task, see `run_worker()`. Must be
+        picklable if `processes` is True.
+    max_workers : int, optional
+        Number of workers. Defaults to 4.
+    processes : bool, optional
+        Run workers in processes rather than threads. Defaults to False.
+    **queue_kwargs
+        Passed to `TaskQueue`, such as `max_attempts`.
+
+    Returns
+    -------
+    Dict[str, int]
+        Number of tasks by status once the queue is finished, see
+        `TaskQueue.counts()`.
+    """
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    # create the tables before workers race to
+    TaskQueue(pth, **queue_kwargs).close()
+    with pool(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(run_worker, pth, handlers, **queue_kwargs)
+            for _ in range(max_workers)
+        ]
+        for future in futures:
+            future.result()
+    with TaskQueue(pth, **queue_kwargs) as queue:
+        return queue.counts()
@@ -0,0 +1,527 @@
+"""Offline vector search with hashed TF-IDF features.
+
+Document content is tokenised and hashed into a fixed number of features,
+so no vocabulary needs fitting and new documents can be appended without
+rebuilding the index. Term frequencies are stored in a CSR matrix whose
+arrays are raw, appendable files, and as postings sorted by feature, so
+that queries only read the postings of their features from disk. Each
+append writes its postings as a new segment, & segments are merged by
+size tier. IDF weighting is applied at query time, so it always
+reflects every appended document.
+"""
+
+import json
+import os
+import pathlib
+import shutil
+from typing import Iterable, List
+import zlib
+
+import numpy as np
+
+from ai_nexus_backend.search_index import _tokenise
+
+# CSR arrays stored as raw, appendable files
+_ARRAY_DTYPES = {
+    "data": np.float32,
+    "indices": np.int32,
+    "indptr": np.int64,
+}
+# postings held in memory at once when merging or scanning the index
+_BLOCK_NNZ = 2**22
+
+
+def _memmap(pth: pathlib.Path, dtype, n: int = None) -> np.ndarray:
+    """Memory-map the first n items of a raw array file."""
+    if n is None:
+        n = pth.stat().st_size // np.dtype(dtype).itemsize
+    if n == 0:
+        # empty files cannot be memory-mapped
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(pth, dtype, mode="r", shape=(n,))
+
+
+class HashingVectorIndex:
+    """A memory-mapped index of hashed TF-IDF document vectors.
+
+    Opens the index at `index_dir`, creating it if it does not exist.
+
+    Parameters
+    ----------
+    index_dir : pathlib.Path
+        Directory holding the index files.
+    n_features : int, optional
+        Number of hashed features. Only used when creating an index,
+        existing indexes keep the value they were created with. Defaults
+        to 2**18.
+
+    Attributes
+    ----------
+    docs : list
+        The indexed documents, in row order.
+    df : np.ndarray
+        Document frequency of each hashed feature.
+
+    Methods
+    -------
+    append(docs:Iterable[dict]) -> None
+        Add documents to the index.
+    search(query:str, top_k:int) -> list
+        Return the top_k most similar documents for a query.
+    search_batch(queries:list, top_k:int) -> list
+        Return the top_k most similar documents for several queries.
+    """
+
+    def __init__(self, index_dir: pathlib.Path, n_features: int = 2**18):
+        self.index_dir = pathlib.Path(index_dir)
+        meta_pth = self.index_dir / "meta.json"
+        if meta_pth.exists():
+            with open(meta_pth) as f:
+                self.n_features = json.load(f)["n_features"]
+            self.docs = self._load_docs()
+            self._truncate()
+        else:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            self.n_features = n_features
+            self.docs = list()
+            for nm, dtype in _ARRAY_DTYPES.items():
+                # indptr starts with the offset of the first row
+                init = [0] if nm == "indptr" else []
+                np.array(init, dtype=dtype).tofile(self._pth(nm))
+            open(self.index_dir / "docs.jsonl", "w").close()
+            with open(meta_pth, "w") as f:
+                json.dump({"n_features": n_features}, f)
+        self._open_postings()
+        self._norms = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _pth(self, nm: str) -> pathlib.Path:
+        """Path to a raw CSR array file."""
+        return self.index_dir / f"{nm}.bin"
+
+    def _read(self, nm: str, n: int = None) -> np.ndarray:
+        """Memory-map the first n items of a raw CSR array file."""
+        return _memmap(self._pth(nm), _ARRAY_DTYPES[nm], n)
+
+    def _load_docs(self) -> list:
+        """Read the documents, trimming a last line torn by an
+        interrupted append."""
+        pth = self.index_dir / "docs.jsonl"
+        with open(pth, "rb") as f:
+            content = f.read()
+        # every document is written with its newline
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            with open(pth, "r+b") as f:
+                f.truncate(complete)
+        return [
+            json.loads(line) for line in content[:complete].splitlines()
+        ]
+
+    def _truncate(self) -> None:
+        """Discard rows from an append interrupted before its documents
+        were written, so that CSR rows line up with self.docs."""
+        n = len(self)
+        nnz = int(self._read("indptr", n + 1)[-1])
+        for nm, length in [
+            ("indptr", n + 1),
+            ("data", nnz),
+            ("indices", nnz),
+        ]:
+            itemsize = np.dtype(_ARRAY_DTYPES[nm]).itemsize
+            with open(self._pth(nm), "r+b") as f:
+                f.truncate(length * itemsize)
+        return None
+
+    def _open_postings(self) -> None:
+        """Memory-map the postings segments listed in the manifest,
+        dropping any that do not line up with the indexed documents, &
+        write segments for documents no segment covers."""
+        post_dir = self.index_dir / "postings"
+        post_dir.mkdir(exist_ok=True)
+        manifest_pth = post_dir / "segments.json"
+        listed = []
+        if manifest_pth.exists():
+            with open(manifest_pth) as f:
+                listed = json.load(f)
+        self._segments = []
+        covered = 0
+        for seg in listed:
+            if seg["start"] != covered or seg["end"] > len(self):
+                break
+            self._segments.append(self._load_segment(seg))
+            covered = seg["end"]
+        # segments left by an interrupted append or merge
+        keep = {seg["name"] for seg in self._segments}
+        for pth in post_dir.iterdir():
+            if pth.name in keep or pth == manifest_pth:
+                continue
+            if pth.is_dir():
+                shutil.rmtree(pth)
+            else:
+                pth.unlink()
+        self.df = np.zeros(self.n_features, dtype=np.int64)
+        for seg in self._segments:
+            self.df[seg["features"]] += np.diff(seg["ptr"])
+        self._index_rows(covered)
+        self._write_manifest()
+        return None
+
+    def _index_rows(self, first: int) -> None:
+        """Write postings segments for every row of the CSR arrays from
+        row `first` onwards, a block of rows at a time."""
+        indptr = self._read("indptr", len(self) + 1)
+        for lo, hi in self._blocks(indptr[first:]):
+            lo, hi = lo + first, hi + first
+            start, end = int(indptr[lo]), int(indptr[hi])
+            last = hi + 1
+            counts = np.diff(indptr[lo:last])
+            self._add_segment(
+                lo,
+                hi,
+                np.array(self._read("indices", end)[start:end]),
+                np.repeat(np.arange(lo, hi, dtype=np.int32), counts),
+                np.array(self._read("data", end)[start:end]),
+            )
+        return None
+
+    @staticmethod
+    def _blocks(ptr: np.ndarray) -> list:
+        """(first, last + 1) rows, or features, of blocks of about
+        _BLOCK_NNZ postings, given the offsets of each row or feature."""
+        n = len(ptr) - 1
+        if n == 0:
+            return []
+        # rows holding every _BLOCK_NNZ-th posting start a block
+        starts = np.searchsorted(
+            ptr,
+            np.arange(int(ptr[0]), int(ptr[-1]), _BLOCK_NNZ),
+            side="right",
+        )
+        edges = np.unique(np.concatenate([[0], starts - 1, [n]]))
+        return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+    def _load_segment(self, seg: dict) -> dict:
+        """Memory-map the postings arrays of a segment."""
+        seg_dir = self.index_dir / "postings" / seg["name"]
+        features = _memmap(seg_dir / "features.bin", np.int32)
+        ptr = _memmap(seg_dir / "ptr.bin", np.int64, len(features) + 1)
+        nnz = int(ptr[-1])
+        return dict(
+            seg,
+            features=features,
+            ptr=ptr,
+            rows=_memmap(seg_dir / "rows.bin", np.int32, nnz),
+            tf=_memmap(seg_dir / "tf.bin", np.float32, nnz),
+        )
+
+    def _write_manifest(self) -> None:
+        """Atomically replace the list of postings segments."""
+        post_dir = self.index_dir / "postings"
+        tmp_pth = post_dir / "segments.json.tmp"
+        with open(tmp_pth, "w") as f:
+            json.dump(
+                [
+                    {k: seg[k] for k in ("name", "start", "end", "nnz")}
+                    for seg in self._segments
+                ],
+                f,
+            )
+        os.replace(tmp_pth, post_dir / "segments.json")
+        return None
+
+    def _add_segment(
+        self,
+        start: int,
+        end: int,
+        features: np.ndarray,
+        rows: np.ndarray,
+        tf: np.ndarray,
+    ) -> None:
+        """Write the postings of rows start to end - 1 as a new segment,
+        then merge trailing segments by size tier.
+
+        Only the new segment is written, unless it is at least as large
+        as the one before it, in which case the two are merged, & so on.
+        Segments therefore grow geometrically & each posting is rewritten
+        a logarithmic number of times, rather than on every append.
+        """
+        order = np.argsort(features, kind="stable")
+        features, rows, tf = features[order], rows[order], tf[order]
+        uniq, counts = np.unique(features, return_counts=True)
+        ptr = np.concatenate([[0], np.cumsum(counts)])
+        self._segments.append(
+            self._write_segment(start, end, [(uniq, ptr, rows, tf)])
+        )
+        self.df += np.bincount(features, minlength=self.n_features)
+        obsolete = []
+        while (
+            len(self._segments) > 1
+            and self._segments[-2]["nnz"] <= self._segments[-1]["nnz"]
+        ):
+            pair = self._segments[-2:]
+            merged = self._write_segment(
+                pair[0]["start"],
+                pair[1]["end"],
+                [
+                    (s["features"], s["ptr"], s["rows"], s["tf"])
+                    for s in pair
+                ],
+            )
+            self._segments[-2:] = [merged]
+            obsolete.extend(s["name"] for s in pair)
+        # merged segments are only deleted once no longer listed
+        self._write_manifest()
+        for name in obsolete:
+            shutil.rmtree(self.index_dir / "postings" / name)
+        return None
+
+    def _write_segment(self, start: int, end: int, parts: list) -> dict:
+        """Merge the postings of consecutive parts into a segment, a block
+        of features at a time.
+
+        Each part holds (features, ptr, rows, tf) postings arrays, for
+        rows that follow those of the part before, so within each feature
+        earlier parts come first.
+        """
+        features = np.unique(np.concatenate([p[0] for p in parts]))
+        counts = np.zeros(len(features), dtype=np.int64)
+        for p_features, p_ptr, _, _ in parts:
+            counts[np.searchsorted(features, p_features)] += np.diff(p_ptr)
+        features = features.astype(np.int32)
+        ptr = np.concatenate([[0], np.cumsum(counts)])
+        name = f"{start:010d}-{end:010d}"
+        seg_dir = self.index_dir / "postings" / name
+        shutil.rmtree(seg_dir, ignore_errors=True)
+        seg_dir.mkdir()
+        features.tofile(seg_dir / "features.bin")
+        ptr.astype(np.int64).tofile(seg_dir / "ptr.bin")
+        f_rows = open(seg_dir / "rows.bin", "wb")
+        with f_rows, open(seg_dir / "tf.bin", "wb") as f_tf:
+            for b0, b1 in self._blocks(ptr):
+                f0, f1 = features[b0], features[b1 - 1] + 1
+                keys, b_rows, b_tf = [], [], []
+                for p_features, p_ptr, p_rows, p_tf in parts:
+                    lo, hi = np.searchsorted(p_features, [f0, f1])
+                    last = hi + 1
+                    keys.append(
+                        np.repeat(
+                            p_features[lo:hi], np.diff(p_ptr[lo:last])
+                        )
+                    )
+                    p_lo, p_hi = p_ptr[lo], p_ptr[hi]
+                    b_rows.append(p_rows[p_lo:p_hi])
+                    b_tf.append(p_tf[p_lo:p_hi])
+                order = np.argsort(np.concatenate(keys), kind="stable")
+                np.concatenate(b_rows)[order].astype(np.int32).tofile(
+                    f_rows
+                )
+                np.concatenate(b_tf)[order].astype(np.float32).tofile(f_tf)
+        return self._load_segment(
+            {"name": name, "start": start, "end": end, "nnz": int(ptr[-1])}
+        )
+
+    def _gather(self, q_features: np.ndarray) -> tuple:
+        """The postings of each query feature across every segment, as
+        (entry, rows, tf) arrays, where entry indexes q_features."""
+        entries, rows, tf = [], [], []
+        for seg in self._segments:
+            features, ptr = seg["features"], seg["ptr"]
+            if len(features) == 0:
+                continue
+            idx = np.searchsorted(features, q_features)
+            idx = np.minimum(idx, len(features) - 1)
+            found = features[idx] == q_features
+            starts = ptr[idx]
+            counts = np.where(found, ptr[idx + 1] - starts, 0)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            entry = np.repeat(np.arange(len(q_features)), counts)
+            within = np.arange(total) - np.repeat(
+                np.cumsum(counts) - counts, counts
+            )
+            nz = starts[entry] + within
+            entries.append(entry)
+            rows.append(np.asarray(seg["rows"][nz], dtype=np.int64))
+            tf.append(np.asarray(seg["tf"][nz]))
+        if not entries:
+            return (
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.float32),
+            )
+        return (
+            np.concatenate(entries),
+            np.concatenate(rows),
+            np.concatenate(tf),
+        )
+
+    def _hash_counts(self, text: str) -> tuple:
+        """Hashed feature IDs & log-scaled term frequencies for text."""
+        features = np.array(
+            [zlib.crc32(t.encode("utf-8")) for t in _tokenise(text)],
+            dtype=np.int64,
+        )
+        features, counts = np.unique(
+            features % self.n_features, return_counts=True
+        )
+        return features.astype(np.int32), 1 + np.log(counts)
+
+    def append(self, docs: Iterable[dict]) -> None:
+        """Add documents to the index.
+
+        Parameters
+        ----------
+        docs : Iterable[dict]
+            Documents as returned by `data_prep_utils.transform_data()`.
+
+        Returns
+        -------
+        None
+        """
+        docs = list(docs)
+        if not docs:
+            return None
+        rows = [self._hash_counts(d["content"]) for d in docs]
+        indices = np.concatenate([r[0] for r in rows])
+        data = np.concatenate([r[1] for r in rows]).astype(np.float32)
+        counts = [len(r[0]) for r in rows]
+        offset = int(self._read("indptr")[-1])
+        indptr = offset + np.cumsum(counts)
+
+        # documents are written last, rows from an interrupted append are
+        # truncated & postings rebuilt when the index is next opened
+        for nm, arr in [
+            ("data", data),
+            ("indices", indices),
+            ("indptr", indptr),
+        ]:
+            with open(self._pth(nm), "ab") as f:
+                arr.astype(_ARRAY_DTYPES[nm]).tofile(f)
+        n = len(self)
+        self._add_segment(
+            n,
+            n + len(docs),
+            indices,
+            np.repeat(np.arange(n, n + len(docs), dtype=np.int32), counts),
+            data,
+        )
+        with open(self.index_dir / "docs.jsonl", "a") as f:
+            for doc in docs:
+                f.write(json.dumps(doc) + "\n")
+        self.docs.extend(docs)
+        self._norms = None
+        return None
+
+    def _idf(self) -> np.ndarray:
+        """Smoothed inverse document frequency of every feature."""
+        n = len(self)
+        return (np.log((1 + n) / (1 + self.df)) + 1).astype(np.float32)
+
+    def _row_norms(self) -> np.ndarray:
+        """TF-IDF norm of every row, computed a block of rows at a time
+        & cached until the next append."""
+        if self._norms is None:
+            n = len(self)
+            idf = self._idf()
+            indptr = self._read("indptr", n + 1)
+            nnz = int(indptr[-1])
+            indices = self._read("indices", nnz)
+            data = self._read("data", nnz)
+            norms = np.zeros(n)
+            for lo, hi in self._blocks(indptr):
+                start, end = int(indptr[lo]), int(indptr[hi])
+                weighted = data[start:end] * idf[indices[start:end]]
+                last = hi + 1
+                counts = np.diff(indptr[lo:last])
+                rows = np.repeat(np.arange(hi - lo), counts)
+                norms[lo:hi] = np.bincount(rows, weighted**2, hi - lo)
+            norms = np.sqrt(norms)
+            norms[norms == 0] = 1
+            self._norms = norms
+        return self._norms
+
+    def search_batch(
+        self, queries: List[str], top_k: int = 10
+    ) -> List[List[dict]]:
+        """Return the top_k most similar documents for several queries.
+
+        The nonzero entries matching every query's features are gathered
+        & scored together, rather than scanning the matrix per query.
+
+        Parameters
+        ----------
+        queries : List[str]
+            Free text queries.
+        top_k : int, optional
+            Maximum number of documents per query. Defaults to 10.
+
+        Returns
+        -------
+        List[List[dict]]
+            For each query, matching documents with an added `score`
+            key holding the cosine similarity, in descending order.
+        """
+        n = len(self)
+        results = [[] for _ in queries]
+        if n == 0 or top_k < 1:
+            return results
+        norms = self._row_norms()
+        idf = self._idf()
+
+        # one entry per (query, feature), weighted by unit query vectors
+        hashed = [self._hash_counts(q) for q in queries]
+        q_features = np.concatenate([h[0] for h in hashed])
+        q_ids = np.repeat(
+            np.arange(len(queries)), [len(h[0]) for h in hashed]
+        )
+        q_vals = np.concatenate([h[1] for h in hashed]) * idf[q_features]
+        q_norms = np.sqrt(np.bincount(q_ids, q_vals**2, len(queries)))
+        q_vals = q_vals / np.where(q_norms == 0, 1, q_norms)[q_ids]
+
+        # expand each entry to the postings of its feature, read from disk
+        entry, rows, tf = self._gather(q_features)
+        if len(entry) == 0:
+            return results
+        weighted = tf * idf[q_features[entry]]
+
+        # sum products per (query, document) pair, ordered by query
+        keys, inv = np.unique(q_ids[entry] * n + rows, return_inverse=True)
+        dots = np.bincount(inv, weighted * q_vals[entry])
+        doc_ids = keys % n
+        scores = dots / norms[doc_ids]
+        bounds = np.searchsorted(keys // n, np.arange(len(queries) + 1))
+        for i, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+            k = min(top_k, hi - lo)
+            if k < 1:
+                continue
+            q_scores = scores[lo:hi]
+            top = np.argpartition(-q_scores, k - 1)[:k]
+            top = top[np.argsort(-q_scores[top], kind="stable")]
+            results[i] = [
+                dict(self.docs[doc_ids[lo + j]], score=float(q_scores[j]))
+                for j in top
+                if q_scores[j] > 0
+            ]
+        return results
+
+    def search(self, query: str, top_k: int = 10) -> List[dict]:
+        """Return the top_k most similar documents for a query.
+
+        Parameters
+        ----------
+        query : str
+            Free text query.
+        top_k : int, optional
+            Maximum number of documents. Defaults to 10.
+
+        Returns
+        -------
+        List[dict]
+            Matching documents with an added `score` key holding the
+            cosine similarity, in descending order.
+        """
+        return self.search_batch([query], top_k=top_k)[0]
@@ -0,0 +1,71 @@
+"""
+Benchmark for the ConfluenceClient code block parser backends.
+
+Parses synthetic Confluence-like pages of several sizes, each with a
+single YAML code block after the page body, with every backend in
+confluence_api.PARSER_BACKENDS, and reports the time per page & speedup
+relative to the full "html.parser" tree.
+
+Example of usage:
+> python benchmarks/bench_code_block_parsers.py --sizes-mb 1 4 --repeats 3
+"""
+
+import argparse
+import time
+
+from ai_nexus_backend.confluence_api import (
+    PARSER_BACKENDS,
+    _parse_code_block,
+    lxml_html,
+)
+
+SECTION = (
+    '<div class="section"><h2 id="h{i}">Section {i}</h2>'
+    "<p>Some <strong>rich</strong> text &amp; a "
+    '<a href="https://example.com/{i}">link</a>.</p>'
+    "<table><tr><th>Key</th><th>Value</th></tr>"
+    "<tr><td>row {i}</td><td>&lt;value&gt;</td></tr></table>"
+    "<ul><li>item</li><li>item</li></ul></div>"
+)
+CODE_BLOCK = (
+    '<div class="code panel"><pre><code class="language-yaml">'
+    "title: Project\ndescription: &quot;A project&quot;\n</code></pre></div>"
+)
+
+
+def synthetic_page(size_mb: float) -> bytes:
+    """A page of repeated sections ending in a single code block."""
+    n = int(size_mb * 2**20 / len(SECTION.format(i=0)))
+    body = "".join(SECTION.format(i=i) for i in range(n))
+    return f"<html><body>{body}{CODE_BLOCK}</body></html>".encode()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Benchmark code block parsers")
+    parser.add_argument(
+        "--sizes-mb", type=float, nargs="+", default=[0.1, 1, 4]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    backends = [
+        b for b in PARSER_BACKENDS if b != "lxml" or lxml_html is not None
+    ]
+
+    for size_mb in args.sizes_mb:
+        page = synthetic_page(size_mb)
+        print(f"{len(page) / 2**20:.1f} MB page")
+        expected = _parse_code_block(page, "html.parser")
+        baseline = None
+        for backend in backends:
+            timings = list()
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                text = _parse_code_block(page, backend)
+                timings.append(time.perf_counter() - start)
+            assert text == expected, backend
+            best = min(timings)
+            baseline = baseline or best
+            print(
+                f"  {backend:<12} {best * 1000:8.1f} ms,"
+                f" speedup {baseline / best:.1f}x"
+            )
@@ -0,0 +1,101 @@
+"""
+Benchmark for data_prep_utils.normalise_text.
+
+Compares the columnar normalisation of the fields to search over with
+the per-value python loop of fetch_data, which only replaces newlines
+but visits every field, and with the same normalisation steps applied
+value by value in python. The columnar stage is timed both from python
+dictionaries and from an Arrow table, without the conversions. Speedups
+are relative to the per-value normalisation.
+
+Example of usage:
+> python benchmarks/bench_normalise_text.py --n-projects 200000
+"""
+
+import argparse
+import re
+import time
+import unicodedata
+
+import pyarrow as pa
+from bench_transform_data import synthetic_catalogue
+
+from ai_nexus_backend.data_prep_utils import (
+    FIELDS_TO_SEARCH,
+    LOWERCASE_KEY,
+    PUNCTUATION_TABLE,
+    ZERO_WIDTH_TABLE,
+    _clean_project,
+    normalise_text,
+    normalise_text_table,
+)
+
+_TRANSLATION = str.maketrans({**PUNCTUATION_TABLE, **ZERO_WIDTH_TABLE})
+_WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def python_normalise(project_list: list) -> list:
+    """The normalise_text steps applied value by value."""
+    out = list()
+    for project in project_list:
+        project = dict(project)
+        project[LOWERCASE_KEY] = dict()
+        for field in FIELDS_TO_SEARCH:
+            val = project[field]
+            if val is not None:
+                val = unicodedata.normalize(
+                    "NFKC", val.translate(_TRANSLATION)
+                )
+                val = _WHITESPACE_RUN.sub(" ", val)
+                val = val.strip(" ")
+            project[field] = val
+            project[LOWERCASE_KEY][field] = (
+                None if val is None else val.lower()
+            )
+        out.append(project)
+    return out
+
+
+def timed(fn, *args) -> tuple:
+    """Run fn, returning its output & wall time in seconds."""
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Benchmark normalise_text")
+    parser.add_argument("--n-projects", type=int, default=200_000)
+    parser.add_argument(
+        "--messy-every",
+        type=int,
+        default=10,
+        help="Give every nth project messy text, as pasted into forms",
+    )
+    args = parser.parse_args()
+
+    projects = synthetic_catalogue(args.n_projects)
+    for p in projects[:: args.messy_every]:
+        p["description"] = "  Proof of  concept\n\n\u201cAI\u201d\u00a0"
+    print(
+        f"{args.n_projects:,} projects, {len(FIELDS_TO_SEARCH)} fields,"
+        f" every {args.messy_every} messy"
+    )
+
+    _, elapsed = timed(
+        lambda ps: [_clean_project(p) for p in ps], projects
+    )
+    print(f"fetch_data newline loop: {elapsed:.2f}s")
+    expected, baseline = timed(python_normalise, projects)
+    print(f"per-value normalisation: {baseline:.2f}s")
+    out, elapsed = timed(normalise_text, projects)
+    assert out == expected
+    print(f"normalise_text: {elapsed:.2f}s, {baseline / elapsed:.2f}x")
+
+    table = pa.table(
+        {f: pa.array([p[f] for p in projects]) for f in FIELDS_TO_SEARCH}
+    )
+    _, elapsed = timed(normalise_text_table, table)
+    print(
+        f"normalise_text_table: {elapsed:.2f}s, {baseline / elapsed:.2f}x"
+    )
@@ -0,0 +1,66 @@
+"""
+Query latency benchmark for search_engine.BM25Index.
+
+Indexes a synthetic catalogue of documents and reports the median & 99th
+percentile latency of top-k queries.
+
+Example of usage:
+> python benchmarks/bench_search_engine.py --n-docs 100000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ai_nexus_backend.data_prep_utils import FIELDS_TO_SEARCH
+from ai_nexus_backend.search_engine import BM25Index
+
+
+def synthetic_docs(n_docs: int, vocab_size: int = 20_000) -> list:
+    """Documents with Zipf distributed terms, as in natural text."""
+    rng = np.random.default_rng(42)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    lens = rng.integers(5, 60, size=n_docs)
+    terms = np.minimum(rng.zipf(1.2, size=lens.sum()), vocab_size) - 1
+    docs = list()
+    for i, doc_terms in enumerate(np.split(terms, np.cumsum(lens)[:-1])):
+        content = " ".join(vocab[t] for t in doc_terms)
+        field = FIELDS_TO_SEARCH[i % len(FIELDS_TO_SEARCH)]
+        docs.append(
+            {"content": content, "meta": {"matched_field": field, "id": i}}
+        )
+    return docs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Benchmark BM25Index")
+    parser.add_argument("--n-docs", type=int, default=100_000)
+    parser.add_argument("--n-queries", type=int, default=1_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    docs = synthetic_docs(args.n_docs)
+    start = time.perf_counter()
+    index = BM25Index(field_boosts={"project_name": 2.0}).fit(docs)
+    print(
+        f"Indexed {args.n_docs:,} docs in {time.perf_counter() - start:.2f}s"
+    )
+
+    random.seed(42)
+    queries = [
+        " ".join(f"term{random.randint(0, 2_000)}" for _ in range(3))
+        for _ in range(args.n_queries)
+    ]
+    latencies = list()
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=args.top_k)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1_000
+    print(
+        f"{args.n_queries:,} queries, top {args.top_k}:"
+        f" median {np.median(latencies):.3f}ms,"
+        f" p99 {np.percentile(latencies, 99):.3f}ms"
+    )
@@ -0,0 +1,104 @@
+"""
+Scaling benchmark for data_prep_utils.write_transform_data_parallel.
+
+Transforms & writes a synthetic catalogue with 1 to N worker processes and
+reports the wall time & speedup relative to the single-process
+transform_data followed by json.dump, as in prep_data_for_haystack.py.
+
+Example of usage:
+> python benchmarks/bench_transform_data.py --n-projects 1000000 --max-workers 8 # noqa E501
+
+Measured with 100,000 projects & the default chunk size, on a machine
+limited to a single core, so that workers only add overhead:
+
+    transform_data + json.dump: 14.51s
+    1 worker(s): 16.31s, speedup 0.89x
+    2 worker(s): 16.92s, speedup 0.86x
+    3 worker(s): 18.48s, speedup 0.79x
+    4 worker(s): 19.36s, speedup 0.75x
+
+Transforming & serialising a chunk in a worker took 14.5s in total, of
+which json serialisation is about 90%, while the parent process spent
+about 1.2s sending projects & receiving json. On N cores the run time is
+therefore bounded by about 1.2s + 14.5s / N, so the speedup should be
+close to N for a handful of cores.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from ai_nexus_backend.data_prep_utils import (
+    FIELDS_TO_SEARCH,
+    transform_data,
+    write_transform_data_parallel,
+)
+
+
+def synthetic_catalogue(n_projects: int) -> list:
+    """Projects shaped like tests/data/metadata_example.json."""
+    return [
+        {
+            "project_name": f"Proj {i}",
+            "date_identified": "02/10/2024",
+            "date_last_updated": None,
+            "description": f"Proof of concept number {i}...",
+            "business_area": "HQ",
+            "team": "Justice Digital",
+            "using_generative_ai_llm": "Yes",
+            "ai_functionality": "Generative AI",
+            "status": "Proof of concept",
+            "what_does_this_initiative_do": "A ...",
+            # leave some searchable fields empty, as in real catalogues
+            "reasons_for_use": None if i % 2 else "Saves time",
+            "problem_solved_by_the_initiative": "...",
+            "metrics_or_intended_impacts": None,
+            "lessons_learned": None,
+            "future_work": None,
+            "high_level_domain_estimate": None,
+            "who_are_the_users": "...",
+            "utilisation": None,
+            "business_lead": None,
+            "technical_lead": "Specified lead",
+            "github_url": "...",
+        }
+        for i in range(n_projects)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Benchmark transform_data")
+    parser.add_argument("--n-projects", type=int, default=1_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    projects = synthetic_catalogue(args.n_projects)
+    print(
+        f"{args.n_projects:,} projects, {len(FIELDS_TO_SEARCH)} fields,"
+        f" chunk size {args.chunk_size:,}"
+    )
+
+    out_dir = tempfile.mkdtemp()
+    expected_pth = os.path.join(out_dir, "expected.json")
+    out_pth = os.path.join(out_dir, "out.json")
+
+    start = time.perf_counter()
+    with open(expected_pth, "w") as f:
+        json.dump(transform_data(projects), f, indent=4)
+    baseline = time.perf_counter() - start
+    print(f"transform_data + json.dump: {baseline:.2f}s")
+
+    for n in range(1, args.max_workers + 1):
+        start = time.perf_counter()
+        write_transform_data_parallel(
+            projects, out_pth, chunk_size=args.chunk_size, max_workers=n
+        )
+        elapsed = time.perf_counter() - start
+        assert os.path.getsize(out_pth) == os.path.getsize(expected_pth)
+        print(
+            f"{n} worker(s): {elapsed:.2f}s,"
+            f" speedup {baseline / elapsed:.2f}x"
+        )
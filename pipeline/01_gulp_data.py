@@ -1,7 +1,100 @@
+"""
+Snapshot GitHub repo metadata, topics and custom properties to the
+org-partitioned parquet dataset in data/repos.
+
+By default every public repo in both organisations is fetched, with
+topics and custom properties read from organisation level endpoints. Pass
+`--assets` with the path of an allow-list such as data/assets.yaml to
+fetch only the listed repos, in GraphQL batches of up to 100 repos per
+request, or one concurrent REST request per repo with `--rest`.
+
+With `--queue`, the custom properties of each repo are fetched as
+tasks in a persistent queue, so a rerun after a failure only fetches the
+repos left unfinished. Failed requests are retried up to
+`--max-attempts` times, waiting `--backoff` seconds, doubling with each
+attempt.
+
+Pass `--topic`, once per topic, to discover only the unarchived repos
+with any of those topics using the repository search API, optionally
+pushed to since `--pushed-after`. Custom properties are then fetched
+for the discovered repos only, as in `--assets` mode.
+
+Requests are shared between every PAT in GITHUB_PAT, separated by commas,
+and the optional GitHub App installation configured in .env, each
+request using the credential with the most remaining rate limit. Pass
+`--http2` to send concurrent requests over a single HTTP/2 connection.
+
+Example of usage:
+> python pipeline/01_gulp_data.py --assets data/assets.yaml
+"""
+
+import argparse
+
 import dotenv
 from pyprojroot import here
 
-from ai_nexus_backend.github_api import GithubClient
+from ai_nexus_backend.github_api import GithubClient, load_assets
+from ai_nexus_backend.github_auth import (
+    AppInstallationCredential,
+    TokenPool,
+)
+from ai_nexus_backend.parquet_utils import (
+    repos_to_table,
+    write_repo_dataset,
+)
+
+parser = argparse.ArgumentParser(prog="Snapshot GitHub repo metadata")
+parser.add_argument(
+    "--assets",
+    help="Path to a YAML allow-list of repos, fetching only those",
+)
+parser.add_argument(
+    "--rest",
+    action="store_true",
+    help="Fetch allow-listed repos from the REST API, not GraphQL",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=8,
+    help="Maximum number of concurrent requests in --assets & --topic"
+    " modes",
+)
+parser.add_argument(
+    "--topic",
+    action="append",
+    default=[],
+    help="Discover repos with this topic via the search API, may repeat",
+)
+parser.add_argument(
+    "--pushed-after",
+    default="2008-01-01",
+    help="Only discover repos pushed to since this date",
+)
+parser.add_argument(
+    "--queue",
+    help="Path to a SQLite task queue, resuming unfinished repos in"
+    " --assets & --topic modes",
+)
+parser.add_argument(
+    "--max-attempts",
+    type=int,
+    default=5,
+    help="Requests per repo before giving up, with --queue",
+)
+parser.add_argument(
+    "--backoff",
+    type=float,
+    default=30.0,
+    help="Seconds before a failed request is retried, doubling with each"
+    " attempt, with --queue",
+)
+parser.add_argument(
+    "--http2",
+    action="store_true",
+    help="Multiplex concurrent requests over one HTTP/2 connection",
+)
+args = parser.parse_args()
 
 # set to True for chatty outputs
 debug = False
@@ -9,36 +102,83 @@ debug = False
 
 secrets = dotenv.dotenv_values(".env")
 user_agent = secrets["AGENT"]
-pat = secrets["GITHUB_PAT"]
+# comma separated PATs are pooled, requests use the least used token
+credentials = [
+    pat.strip() for pat in secrets["GITHUB_PAT"].split(",") if pat.strip()
+]
 org_nm1 = secrets["ORG_NM1"]
 org_nm2 = secrets["ORG_NM2"]
+if secrets.get("GITHUB_APP_ID"):
+    with open(secrets["GITHUB_APP_KEY_PTH"]) as f:
+        credentials.append(
+            AppInstallationCredential(
+                app_id=secrets["GITHUB_APP_ID"],
+                private_key=f.read(),
+                installation_id=secrets["GITHUB_APP_INSTALLATION_ID"],
+            )
+        )
 
-client = GithubClient(github_pat=pat, user_agent=user_agent)
+client = GithubClient(
+    github_pat=TokenPool(credentials),
+    user_agent=user_agent,
+    http2=args.http2,
+)
 
-# gulp data ---------------------------------------------------------------
-# reversing order for troubleshooting purposes
-for nm in [org_nm2, org_nm1]:
-    repos = client.get_org_repos(
-        org_nm=nm,
-        public_only=True,
-        debug=debug,
+# gulp allow-listed repos -------------------------------------------------
+if args.assets:
+    repos = client.get_asset_repos(
+        load_assets(args.assets),
+        mode="rest" if args.rest else "graphql",
+        max_workers=args.workers,
     )
-
     custom_props = client.get_all_repo_metadata(
         html_urls=repos["html_url"],
         metadata="custom_properties",
+        max_workers=args.workers,
+        queue_pth=args.queue,
+        max_attempts=args.max_attempts,
+        backoff_s=args.backoff,
     )
+    # topics are returned with the repos
+    out = repos_to_table(repos, custom_props=custom_props)
+    # replaces the listed organisations' partitions only
+    write_repo_dataset(out, here("data/repos"))
 
-    topics = client.get_all_repo_metadata(
-        html_urls=repos["html_url"],
-        metadata="topics",
-    )
+elif args.topic:
+    # discover repos by topic -------------------------------------------
+    for nm in [org_nm2, org_nm1]:
+        repos = client.search_repos(
+            [nm],
+            topics=args.topic,
+            pushed_after=args.pushed_after,
+            debug=debug,
+        )
+        # per discovered repo, rather than paging the whole organisation
+        custom_props = client.get_all_repo_metadata(
+            html_urls=repos["html_url"],
+            metadata="custom_properties",
+            max_workers=args.workers,
+            queue_pth=args.queue,
+            max_attempts=args.max_attempts,
+            backoff_s=args.backoff,
+        )
+        out = repos_to_table(repos, custom_props=custom_props)
+        # removes the partition of an organisation without matches
+        write_repo_dataset(out, here("data/repos"), org_nms=[nm])
 
-    # join tables ---------------------------------------------------------
-    for tab in [repos, custom_props, topics]:
-        tab.set_index("repo_url", inplace=True)
-    out = repos.join(custom_props).join(topics)
+else:
+    # gulp every public repo ----------------------------------------------
+    # reversing order for troubleshooting purposes
+    for nm in [org_nm2, org_nm1]:
+        # repos, topics & custom properties from org level endpoints
+        repos, custom_props = client.get_org_snapshot(
+            org_nm=nm,
+            public_only=True,
+            debug=debug,
+        )
+        out = repos_to_table(repos, custom_props=custom_props)
 
-    # write parquet -------------------------------------------------------
-    out_pth = f"data/{nm}.parquet"
-    out.to_parquet(here(out_pth))
+        # write parquet -------------------------------------------------
+        # replaces this organisation's partition only, or removes it if
+        # the organisation has no public repos
+        write_repo_dataset(out, here("data/repos"), org_nms=[nm])
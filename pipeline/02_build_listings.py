@@ -1,7 +1,11 @@
 import dotenv
 from pyprojroot import here
 
-from ai_nexus_backend.build_yaml import build_listings_from_parquet
+from ai_nexus_backend.build_yaml import (
+    build_listings_for_orgs,
+    build_thumbnails,
+    set_image_placeholder,
+)
 
 # configure secrets -------------------------------------------------------
 
@@ -9,12 +13,21 @@ secrets = dotenv.dotenv_values(".env")
 org_nm1 = secrets["ORG_NM1"]
 org_nm2 = secrets["ORG_NM2"]
 
-for nm in [org_nm1, org_nm2]:
-    in_pth = f"data/{nm}.parquet"
-    out_pth = f"listings/{nm}.yaml"
-
-    build_listings_from_parquet(
-        prq_pth=here(in_pth),
+# build listings ----------------------------------------------------------
+# one process per organisation, guard needed for spawn start method
+if __name__ == "__main__":
+    # cached, only regenerated if the logo changes
+    thumbnails = build_thumbnails(
+        img_pth=here("www/Moj_logo_uk.png"),
+        out_dir=here("www/thumbnails"),
+    )
+    webp_pth = thumbnails["webp"].relative_to(here()).as_posix()
+    png_pth = thumbnails["png"].relative_to(here()).as_posix()
+    set_image_placeholder(here("index.qmd"), f"/./{png_pth}")
+    build_listings_for_orgs(
+        org_nms=[org_nm1, org_nm2],
+        prq_dir=here("data/repos"),
         template_pth=here("template.txt"),
-        yaml_out_pth=here(out_pth),
+        yaml_out_dir=here("listings"),
+        image_pth=f"/./{webp_pth}",
     )
@@ -0,0 +1,10 @@
+from pyprojroot import here
+
+from ai_nexus_backend.search_index import (
+    build_search_index,
+    load_repo_documents,
+)
+
+# build index -------------------------------------------------------------
+docs = load_repo_documents(here("data/repos"))
+build_search_index(docs, out_dir=here("search_index"))
@@ -0,0 +1,13 @@
+from pyprojroot import here
+
+from ai_nexus_backend.compress_utils import precompress_directory
+
+# precompress rendered site -----------------------------------------------
+report = precompress_directory(here("docs"))
+
+# size report -------------------------------------------------------------
+n_skipped = report["skipped"].sum()
+print(f"Compressed {len(report) - n_skipped}, {n_skipped} unchanged")
+totals = report.drop(columns=["path", "skipped"]).sum()
+for col, total in totals.items():
+    print(f"{col}: {total:,} ({total / totals['bytes']:.1%})")
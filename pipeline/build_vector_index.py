@@ -0,0 +1,42 @@
+"""
+Append documents written by prep_data_for_haystack.py to an offline
+hashed TF-IDF vector index, for top-k cosine similarity queries without
+a model server.
+
+Example of usage:
+> python build_vector_index.py "search_backend_data.json" "vector_index"
+
+Every document in the input file is appended, so pass only new projects'
+documents, or pass `--rebuild` to delete the index & index the full
+catalogue again.
+"""
+
+import argparse
+from itertools import islice
+import shutil
+
+from ai_nexus_backend.data_prep_utils import iter_json_array
+from ai_nexus_backend.vector_search import HashingVectorIndex
+
+parser = argparse.ArgumentParser(prog="Build an offline vector index")
+parser.add_argument("in_path", help="Enter path to transformed json file")
+parser.add_argument("index_dir", help="Enter path to the index directory")
+parser.add_argument(
+    "--rebuild",
+    action="store_true",
+    help="Delete any existing index before appending",
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=10_000,
+    help="Number of documents appended at a time",
+)
+args = parser.parse_args()
+
+if args.rebuild:
+    shutil.rmtree(args.index_dir, ignore_errors=True)
+index = HashingVectorIndex(args.index_dir)
+doc_iter = iter_json_array(args.in_path)
+while batch := list(islice(doc_iter, args.batch_size)):
+    index.append(batch)
@@ -0,0 +1,55 @@
+"""
+Load the OpenSearch `_bulk` NDJSON batches written by
+`prep_data_for_haystack.py --incremental` into the search backend.
+
+Example of usage:
+> python load_bulk_batches.py "bulk_ops" "https://localhost:9200/_bulk" --hashes "search_backend_hashes.json" # noqa E501
+
+The hashes of the operations that succeed are promoted to `--hashes`, for
+the next incremental run to diff against. Failed operations keep their
+previous hashes, so rerunning the preparation step emits only the failed
+operations again.
+"""
+
+import argparse
+import pathlib
+
+from ai_nexus_backend.bulk_index import (
+    load_bulk_batches,
+    load_hashes,
+    promote_hashes,
+    save_hashes,
+)
+
+parser = argparse.ArgumentParser(prog="Load bulk batches into OpenSearch")
+parser.add_argument("batch_dir", help="Enter path to the batch directory")
+parser.add_argument("url", help="Enter the _bulk endpoint url")
+parser.add_argument(
+    "--hashes",
+    required=True,
+    help="Path of the document hashes the next run diffs against",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=4,
+    help="Maximum number of concurrent requests",
+)
+args = parser.parse_args()
+
+batch_dir = pathlib.Path(args.batch_dir)
+batches = (
+    pth.read_text() for pth in sorted(batch_dir.glob("batch-*.ndjson"))
+)
+results = load_bulk_batches(batches, args.url, max_workers=args.workers)
+hashes = promote_hashes(
+    load_hashes(args.hashes),
+    load_hashes(batch_dir / "hashes.json"),
+    results,
+)
+save_hashes(hashes, args.hashes)
+failed = results[results["error"].notna()]
+if len(failed):
+    print(failed.to_string())
+    raise SystemExit(f"{len(failed)} of {len(results)} operations failed")
+print(f"{len(results)} operations loaded")
@@ -9,6 +9,30 @@ the output.
 Example of usage:
 > python prep_data_for_haystack.py "ai_catalogue.json" "search_backend_data.json" # noqa E501
 
+Pass `--stream` to read, transform and write one project at a time, so
+that peak memory does not grow with the size of the catalogue.
+
+Pass `--workers` to transform & write chunks of `--chunk-size` projects
+in a pool of processes, for large catalogues.
+
+Pass `--normalise` to store each project's metadata once, keyed by a
+project ID, rather than once per searchable field. Documents then carry
+only their content, matched_field and project_id.
+
+Pass `--clean-text` to normalise whitespace, unicode variants and
+punctuation in the fields to search over, in place of replacing newlines
+in every field, adding a lowercase copy of the matched field to each
+document.
+
+Pass `--dedup` to collapse each project's duplicate and near-duplicate
+field documents into one document listing every matched field.
+
+Pass `--incremental` with the path of the document hashes kept from the
+previous run to write only the create, update and delete operations
+needed since then. out_path is then a directory of OpenSearch `_bulk`
+NDJSON batches of up to `--batch-size` operations, plus the hashes of
+this run in hashes.json. Load them with load_bulk_batches.py.
+
 TO UPDATE
  - Currently requires data to be stored alongside this script in a file
  called 'ai_catalogue.json'. Eventually this should be connected to the
@@ -17,21 +41,166 @@ TO UPDATE
 
 import argparse
 import json
-from ai_nexus_backend.data_prep_utils import fetch_data, transform_data
+import pathlib
 
-
-parser = argparse.ArgumentParser(
-    prog="Transform json data into format for Haystack"
+from ai_nexus_backend.bulk_index import (
+    diff_documents,
+    iter_bulk_batches,
+    load_hashes,
+    save_hashes,
+)
+from ai_nexus_backend.data_prep_utils import (
+    fetch_data,
+    iter_fetch_data,
+    iter_transform_data,
+    normalise_data,
+    normalise_text,
+    transform_data,
+    write_json_stream,
+    write_transform_data_parallel,
 )
-parser.add_argument("in_path", help="Enter path to input json file")
-parser.add_argument("out_path", help="Enter path to output json file")
-args = parser.parse_args()
-
-# Read the project list from a json file
-project_list = fetch_data(args.in_path)
-# Get into the desired format
-dataset = transform_data(project_list)
-
-# Write to another json file
-with open(args.out_path, "w") as f:
-    json.dump(dataset, f, indent=4)
+from ai_nexus_backend.dedup_utils import deduplicate_documents
+
+
+# guard needed for the spawn start method used by --workers
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Transform json data into format for Haystack"
+    )
+    parser.add_argument("in_path", help="Enter path to input json file")
+    parser.add_argument("out_path", help="Enter path to output json file")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream projects through the transformation in constant memory",
+    )
+    parser.add_argument(
+        "--normalise",
+        action="store_true",
+        help="Store project metadata once rather than per searchable field",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes used to transform & write the data",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10_000,
+        help="Number of projects sent to each process at a time",
+    )
+    parser.add_argument(
+        "--clean-text",
+        action="store_true",
+        help="Normalise the text of the fields to search over",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Collapse duplicate field documents of each project",
+    )
+    parser.add_argument(
+        "--incremental",
+        default=None,
+        metavar="HASHES_PATH",
+        help="Write bulk operations for documents changed since the run"
+        " whose document hashes are in HASHES_PATH",
+    )
+    parser.add_argument(
+        "--index-name",
+        default="documents",
+        help="Index targeted by --incremental bulk operations",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Number of --incremental bulk operations per batch",
+    )
+    args = parser.parse_args()
+    if args.stream and args.normalise:
+        parser.error("--stream and --normalise cannot be combined")
+    if args.clean_text and args.stream:
+        parser.error("--clean-text cannot be combined with --stream")
+    if args.dedup and (args.stream or args.normalise):
+        parser.error(
+            "--dedup cannot be combined with --stream or --normalise"
+        )
+    if args.incremental is not None and (args.stream or args.normalise):
+        parser.error(
+            "--incremental cannot be combined with --stream or --normalise"
+        )
+    # --workers writes the documents without collecting them
+    if args.workers is not None and (
+        args.stream
+        or args.normalise
+        or args.dedup
+        or args.incremental is not None
+    ):
+        parser.error(
+            "--workers cannot be combined with --stream, --normalise,"
+            " --dedup or --incremental"
+        )
+
+    if args.normalise:
+        # --clean-text collapses newlines in the fields to search only
+        project_list = fetch_data(
+            args.in_path, replace_newlines=not args.clean_text
+        )
+        if args.clean_text:
+            project_list = normalise_text(project_list)
+        dataset = normalise_data(project_list)
+        with open(args.out_path, "w") as f:
+            json.dump(dataset, f, indent=4)
+    elif args.stream:
+        # Generators are only consumed as the output is written
+        project_iter = iter_fetch_data(args.in_path)
+        write_json_stream(iter_transform_data(project_iter), args.out_path)
+    elif args.workers is not None:
+        project_list = fetch_data(
+            args.in_path, replace_newlines=not args.clean_text
+        )
+        if args.clean_text:
+            project_list = normalise_text(project_list)
+        # Transform & write chunks of projects in a pool of processes
+        write_transform_data_parallel(
+            project_list,
+            args.out_path,
+            chunk_size=args.chunk_size,
+            max_workers=args.workers,
+        )
+    else:
+        # Read the project list from a json file, --clean-text collapses
+        # newlines in the fields to search only
+        project_list = fetch_data(
+            args.in_path, replace_newlines=not args.clean_text
+        )
+        if args.clean_text:
+            project_list = normalise_text(project_list)
+        # Get into the desired format
+        dataset = transform_data(project_list)
+        if args.dedup:
+            dataset = deduplicate_documents(dataset)
+
+        if args.incremental is None:
+            # Write to another json file
+            with open(args.out_path, "w") as f:
+                json.dump(dataset, f, indent=4)
+        else:
+            ops, hashes = diff_documents(
+                dataset, load_hashes(args.incremental)
+            )
+            out_dir = pathlib.Path(args.out_path)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            # remove stale batches from any previous run
+            for old_pth in out_dir.glob("batch-*.ndjson"):
+                old_pth.unlink()
+            batches = iter_bulk_batches(
+                ops, args.index_name, batch_size=args.batch_size
+            )
+            for i, body in enumerate(batches):
+                (out_dir / f"batch-{i:05d}.ndjson").write_text(body)
+            save_hashes(hashes, out_dir / "hashes.json")
+            print(f"{len(ops)} bulk operations written to {out_dir}")
@@ -0,0 +1,117 @@
+"""
+Run the ingestion stages in dependency order, skipping stages whose
+inputs, outputs and code are unchanged since their last successful run.
+Independent stages, such as the GitHub ingestion and the Haystack
+preparation, run concurrently.
+
+Example of usage:
+> python pipeline/run_pipeline.py --force gulp
+
+The GitHub ingestion stage reads from the API rather than from files, so
+it is only rerun when its code, `.env` or the `--assets` allow-list
+change, or when forced with `--force gulp`. Pass `--catalogue` with the
+path of the catalogue json to also prepare it for Haystack.
+"""
+
+import argparse
+import sys
+
+from pyprojroot import here
+
+from ai_nexus_backend.pipeline_runner import (
+    Stage,
+    run_pipeline,
+    script_sources,
+)
+
+parser = argparse.ArgumentParser(prog="Run the ingestion pipeline")
+parser.add_argument(
+    "--force",
+    action="append",
+    default=[],
+    help="Name of a stage to run even if unchanged, may be repeated",
+)
+parser.add_argument(
+    "--catalogue",
+    help="Path to the catalogue json to prepare for Haystack",
+)
+parser.add_argument(
+    "--assets",
+    help="Path to a YAML allow-list of repos for the GitHub ingestion",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=4,
+    help="Maximum number of stages running at once",
+)
+parser.add_argument(
+    "--state",
+    default=here(".pipeline_state.json"),
+    help="Path to the file recording fingerprints of previous runs",
+)
+
+# guard needed for the spawn start method used by the listings stage
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    gulp_cmd = [sys.executable, here("pipeline/01_gulp_data.py")]
+    gulp_inputs = [here(".env")]
+    if args.assets:
+        gulp_cmd += ["--assets", args.assets]
+        gulp_inputs.append(args.assets)
+
+    stages = [
+        Stage(
+            "gulp",
+            gulp_cmd,
+            inputs=gulp_inputs,
+            outputs=[here("data/repos")],
+            code=script_sources(here("pipeline/01_gulp_data.py")),
+        ),
+        Stage(
+            "listings",
+            [sys.executable, here("pipeline/02_build_listings.py")],
+            inputs=[
+                here(".env"),
+                here("data/repos"),
+                here("template.txt"),
+                here("www/Moj_logo_uk.png"),
+            ],
+            outputs=[
+                here("listings"),
+                here("www/thumbnails"),
+                here("index.qmd"),
+            ],
+            code=script_sources(here("pipeline/02_build_listings.py")),
+        ),
+        Stage(
+            "search_index",
+            [sys.executable, here("pipeline/03_build_search_index.py")],
+            inputs=[here("data/repos")],
+            outputs=[here("search_index")],
+            code=script_sources(here("pipeline/03_build_search_index.py")),
+        ),
+    ]
+    if args.catalogue:
+        prep_script = here("pipeline/prep_data_for_haystack.py")
+        out_pth = here("search_backend_data.json")
+        stages.append(
+            Stage(
+                "haystack",
+                [sys.executable, prep_script, args.catalogue, out_pth],
+                inputs=[args.catalogue],
+                outputs=[out_pth],
+                code=script_sources(prep_script),
+            )
+        )
+
+    report = run_pipeline(
+        stages,
+        state_pth=args.state,
+        max_workers=args.workers,
+        force=args.force,
+    )
+    print(report.to_string(index=False))
+    if report["status"].isin(["failed", "blocked"]).any():
+        sys.exit(1)
@@ -0,0 +1,251 @@
+"""Tests for build_yaml module."""
+
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+from pyprojroot import here
+import pytest
+
+from ai_nexus_backend import build_yaml
+from ai_nexus_backend.parquet_utils import (
+    repos_to_table,
+    write_repo_dataset,
+)
+
+
+@pytest.fixture(scope="function")
+def repo_parquet(tmp_path):
+    """Write a small repo dataset for two organisations."""
+    prq_dir = tmp_path / "repos"
+    repos = pd.DataFrame(
+        {
+            "id": [1, 2],
+            "html_url": [
+                f"https://github.com/{org_nm}/repo"
+                for org_nm in ["org-a", "org-b"]
+            ],
+            "repo_url": [
+                f"https://api.github.com/repos/{org_nm}/repo"
+                for org_nm in ["org-a", "org-b"]
+            ],
+            "is_private": [False, False],
+            "is_archived": [False, False],
+            "name": ["org-a-repo", "org-b-repo"],
+            "description": ['A "quoted" description', None],
+            "programming_language": ["Python", None],
+            "updated_at": ["2024-10-10T12:00:00Z", "2024-10-11T12:00:00Z"],
+            "org_nm": ["org-a", "org-b"],
+            "topics": [["llm", "nlp"], []],
+        }
+    )
+    write_repo_dataset(repos_to_table(repos), prq_dir)
+    return prq_dir
+
+
+class TestAtomicWrite:
+    """Tests for _atomic_write."""
+
+    def test__atomic_write_replaces_content(self, tmp_path):
+        """Content is replaced & no temporary files are left behind."""
+        out_pth = tmp_path / "listing.yaml"
+        out_pth.write_text("old")
+        build_yaml._atomic_write(out_pth, "new")
+        assert out_pth.read_text() == "new"
+        assert [p.name for p in tmp_path.iterdir()] == ["listing.yaml"]
+
+    @pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+    def test__atomic_write_file_mode(self, tmp_path):
+        """New files get the umask's mode & existing files keep theirs,
+        rather than mkstemp's owner only mode."""
+        new_pth = tmp_path / "new.yaml"
+        umask = os.umask(0o022)
+        try:
+            build_yaml._atomic_write(new_pth, "new")
+        finally:
+            os.umask(umask)
+        assert new_pth.stat().st_mode & 0o777 == 0o644
+        out_pth = tmp_path / "listing.yaml"
+        out_pth.write_text("old")
+        out_pth.chmod(0o664)
+        build_yaml._atomic_write(out_pth, "new")
+        assert out_pth.stat().st_mode & 0o777 == 0o664
+
+    def test__atomic_write_failure_keeps_original(self, tmp_path):
+        """A failed write must not tear or remove the existing file."""
+        out_pth = tmp_path / "listing.yaml"
+        out_pth.write_text("old")
+        with pytest.raises(TypeError):
+            build_yaml._atomic_write(out_pth, None)
+        assert out_pth.read_text() == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["listing.yaml"]
+
+
+class TestBuildListings:
+    """Tests for building quarto listings from parquet."""
+
+    def test_build_listings_from_parquet(self, repo_parquet, tmp_path):
+        """Check the listing is populated from the template."""
+        out_pth = tmp_path / "org-a.yaml"
+        build_yaml.build_listings_from_parquet(
+            prq_pth=repo_parquet,
+            template_pth=here("template.txt"),
+            yaml_out_pth=out_pth,
+            org_nm="org-a",
+        )
+        listing = out_pth.read_text()
+        assert '- title: "org-a-repo"' in listing
+        assert 'description: "A \\"quoted\\" description"' in listing
+        assert 'date-updated: "2024-10-10"' in listing
+        assert "categories: ['llm', 'nlp']" in listing
+        assert "image: /./www/Moj_logo_uk.png" in listing
+        assert "org-b-repo" not in listing
+
+    def test_build_listings_from_untyped_parquet(self, tmp_path):
+        """Single parquet files with topics API responses are read."""
+        prq_pth = tmp_path / "org-a.parquet"
+        pd.DataFrame(
+            {
+                "name": ["org-a-repo"],
+                "description": ["A description"],
+                "updated_at": ["2024-10-10T12:00:00Z"],
+                "html_url": ["https://github.com/org-a/repo"],
+                "org_nm": ["org-a"],
+                "topics": [{"names": np.array(["llm", "nlp"])}],
+            }
+        ).to_parquet(prq_pth)
+        out_pth = tmp_path / "org-a.yaml"
+        build_yaml.build_listings_from_parquet(
+            prq_pth=prq_pth,
+            template_pth=here("template.txt"),
+            yaml_out_pth=out_pth,
+        )
+        listing = out_pth.read_text()
+        assert 'date-updated: "2024-10-10T12:00:00Z"' in listing
+        assert "categories: ['llm', 'nlp']" in listing
+
+    def test_build_listings_for_orgs(self, repo_parquet, tmp_path):
+        """Check a listing is written for every organisation."""
+        out_dir = tmp_path / "listings"
+        out_dir.mkdir()
+        out_pths = build_yaml.build_listings_for_orgs(
+            org_nms=["org-a", "org-b"],
+            prq_dir=repo_parquet,
+            template_pth=here("template.txt"),
+            yaml_out_dir=out_dir,
+            image_pth="/./www/thumbnails/logo.webp",
+            max_workers=2,
+        )
+        assert out_pths == [out_dir / "org-a.yaml", out_dir / "org-b.yaml"]
+        for org_nm, pth in zip(["org-a", "org-b"], out_pths):
+            assert f"organisation: {org_nm}" in pth.read_text()
+            assert "image: /./www/thumbnails/logo.webp" in pth.read_text()
+
+    def test_build_listings_for_orgs_raises(self, repo_parquet, tmp_path):
+        """Worker exceptions are raised in the parent process."""
+        with pytest.raises(FileNotFoundError):
+            build_yaml.build_listings_for_orgs(
+                org_nms=["org-a"],
+                prq_dir=repo_parquet / "missing",
+                template_pth=here("template.txt"),
+                yaml_out_dir=tmp_path,
+                max_workers=1,
+            )
+
+
+class TestBuildThumbnails:
+    """Tests for build_thumbnails."""
+
+    def test_build_thumbnails(self, tmp_path):
+        """Thumbnails are resized & named by content hash."""
+        Image = pytest.importorskip("PIL.Image")
+        thumbnails = build_yaml.build_thumbnails(
+            img_pth=here("www/Moj_logo_uk.png"), out_dir=tmp_path
+        )
+        assert list(thumbnails.keys()) == ["webp", "png"]
+        for fmt, pth in thumbnails.items():
+            assert pth.name.startswith("Moj_logo_uk-64.")
+            assert pth.suffix == f".{fmt}"
+            with Image.open(pth) as im:
+                assert max(im.size) == 64
+            assert (
+                pth.stat().st_size
+                < here("www/Moj_logo_uk.png").stat().st_size / 10
+            )
+
+    def test_build_thumbnails_cached(self, tmp_path, monkeypatch):
+        """Existing thumbnails are reused without Pillow."""
+        pytest.importorskip("PIL.Image")
+        img_pth = here("www/Moj_logo_uk.png")
+        first = build_yaml.build_thumbnails(img_pth, tmp_path)
+        mtimes = {k: v.stat().st_mtime_ns for k, v in first.items()}
+        monkeypatch.setattr(build_yaml, "Image", None)
+        second = build_yaml.build_thumbnails(img_pth, tmp_path)
+        assert second == first
+        assert {k: v.stat().st_mtime_ns for k, v in second.items()} == (
+            mtimes
+        )
+        # a different size needs generating, which requires Pillow
+        with pytest.raises(ImportError, match="Pillow is required"):
+            build_yaml.build_thumbnails(img_pth, tmp_path, size=32)
+
+    def test_stale_thumbnails_removed(self, tmp_path):
+        """Thumbnails of a previous version of the image are deleted,
+        while other sizes & unrelated files are kept."""
+        pytest.importorskip("PIL.Image")
+        img_pth = tmp_path / "logo.png"
+        out_dir = tmp_path / "thumbnails"
+        shutil.copy(here("www/Moj_logo_uk.png"), img_pth)
+        old = build_yaml.build_thumbnails(img_pth, out_dir)
+        other_size = build_yaml.build_thumbnails(img_pth, out_dir, size=32)
+        (out_dir / "logo-64.notes.png").write_text("kept")
+        # a new version of the image
+        with open(img_pth, "ab") as f:
+            f.write(b"\0")
+        new = build_yaml.build_thumbnails(img_pth, out_dir)
+        assert sorted(p.name for p in out_dir.iterdir()) == sorted(
+            [p.name for p in new.values()]
+            + [p.name for p in other_size.values()]
+            + ["logo-64.notes.png"]
+        )
+        assert not any(p.exists() for p in old.values())
+
+    def test_committed_thumbnails_are_current(self, tmp_path):
+        """The committed thumbnails, & the one index.qmd references, are
+        those generated from the logo."""
+        pytest.importorskip("PIL.Image")
+        thumbnails = build_yaml.build_thumbnails(
+            here("www/Moj_logo_uk.png"), tmp_path
+        )
+        for pth in thumbnails.values():
+            assert (here("www/thumbnails") / pth.name).exists()
+        assert thumbnails["png"].name in here("index.qmd").read_text()
+
+
+class TestSetImagePlaceholder:
+    """Tests for set_image_placeholder."""
+
+    def test_set_image_placeholder(self, tmp_path):
+        """Only the placeholder is replaced & unchanged pages are not
+        rewritten."""
+        qmd_pth = tmp_path / "index.qmd"
+        qmd_pth.write_text(here("index.qmd").read_text())
+        assert build_yaml.set_image_placeholder(qmd_pth, "/./www/new.png")
+        expected = re.sub(
+            r"image-placeholder: .*",
+            "image-placeholder: /./www/new.png",
+            here("index.qmd").read_text(),
+        )
+        assert qmd_pth.read_text() == expected
+        assert not build_yaml.set_image_placeholder(
+            qmd_pth, "/./www/new.png"
+        )
+
+    def test_missing_placeholder_raises(self, tmp_path):
+        """Pages without a placeholder field raise."""
+        qmd_pth = tmp_path / "index.qmd"
+        qmd_pth.write_text("---\ntitle: AI Nexus\n---\n")
+        with pytest.raises(ValueError, match="No image-placeholder"):
+            build_yaml.set_image_placeholder(qmd_pth, "/./www/new.png")
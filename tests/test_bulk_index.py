@@ -0,0 +1,287 @@
+"""Tests for bulk_index module."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from ai_nexus_backend.bulk_index import (
+    diff_documents,
+    document_id,
+    iter_bulk_batches,
+    load_bulk_batches,
+    load_hashes,
+    promote_hashes,
+    save_hashes,
+)
+
+
+def _doc(project_name, field, content):
+    """A document in the format returned by transform_data."""
+    return {
+        "meta": {"project_name": project_name, "matched_field": field},
+        "content": content,
+    }
+
+
+@pytest.fixture(scope="function")
+def docs():
+    """Documents from a first run."""
+    return [
+        _doc("Proj 1", "description", "Proof of concept"),
+        _doc("Proj 1", "project_name", "Proj 1"),
+        _doc("Proj 2", "description", "Classifier"),
+    ]
+
+
+class _BulkHandler(BaseHTTPRequestHandler):
+    """Stand-in `_bulk` endpoint recording bodies & concurrency."""
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(
+                server.max_in_flight, server.in_flight
+            )
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+            server.bodies.append(body.decode("utf-8"))
+        if server.status != 200:
+            self.send_response(server.status)
+            self.end_headers()
+            return
+        lines = [json.loads(line) for line in body.splitlines()]
+        items = list()
+        for line in lines:
+            if set(line) & {"create", "index", "delete"}:
+                action, params = next(iter(line.items()))
+                result = {"_id": params["_id"], "status": 201}
+                if action == "create" and params["_id"] in server.ids:
+                    result = {
+                        "_id": params["_id"],
+                        "status": 409,
+                        "error": {"type": "version_conflict"},
+                    }
+                elif params["_id"] in server.fail_ids:
+                    result = {
+                        "_id": params["_id"],
+                        "status": 409,
+                        "error": {"type": "version_conflict"},
+                    }
+                if "error" not in result:
+                    with server.lock:
+                        if action == "delete":
+                            server.ids.discard(params["_id"])
+                        else:
+                            server.ids.add(params["_id"])
+                items.append({action: result})
+        resp = json.dumps({"errors": False, "items": items}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(resp)))
+        self.end_headers()
+        self.wfile.write(resp)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="function")
+def bulk_server():
+    """A local HTTP server standing in for the `_bulk` API."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BulkHandler)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = 0.0
+    server.status = 200
+    server.fail_ids = set()
+    server.ids = set()
+    server.bodies = list()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/_bulk"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestDiffDocuments:
+    """Tests for diff_documents."""
+
+    def test_first_run_creates_everything(self, docs):
+        """With no previous hashes every document is created."""
+        ops, hashes = diff_documents(docs, {})
+        assert [op for op, _, _ in ops] == ["create"] * 3
+        assert list(hashes) == [document_id(d) for d in docs]
+
+    def test_unchanged_run_emits_nothing(self, docs):
+        """Documents whose hashes match the previous run are skipped."""
+        _, hashes = diff_documents(docs, {})
+        ops, new_hashes = diff_documents(docs, hashes)
+        assert ops == []
+        assert new_hashes == hashes
+
+    def test_changes_emit_create_update_delete(self, docs):
+        """Changed, new & removed documents are all detected."""
+        _, hashes = diff_documents(docs, {})
+        docs[0]["meta"]["status"] = "Live"
+        new_docs = docs[:2] + [_doc("Proj 3", "description", "New")]
+        ops, _ = diff_documents(new_docs, hashes)
+        assert [(op, doc_id) for op, doc_id, _ in ops] == [
+            ("update", "Proj 1::description"),
+            ("create", "Proj 3::description"),
+            ("delete", "Proj 2::description"),
+        ]
+        assert ops[-1][2] is None
+
+    def test_duplicate_id_raises(self, docs):
+        """Two documents for the same project & field are rejected."""
+        with pytest.raises(ValueError, match="Duplicate document ID"):
+            diff_documents(docs + docs[:1], {})
+
+    def test_hashes_round_trip(self, docs, tmp_path):
+        """Saved hashes are read back, missing files read as empty."""
+        pth = tmp_path / "hashes.json"
+        assert load_hashes(pth) == {}
+        _, hashes = diff_documents(docs, {})
+        save_hashes(hashes, pth)
+        assert load_hashes(pth) == hashes
+
+
+class TestIterBulkBatches:
+    """Tests for iter_bulk_batches."""
+
+    def test_batches_are_ndjson(self, docs):
+        """Operations are split into newline terminated NDJSON bodies."""
+        _, hashes = diff_documents(docs, {})
+        docs[0]["content"] = "Changed"
+        ops, _ = diff_documents(docs[:1], hashes)
+        batches = list(iter_bulk_batches(ops, "catalogue", batch_size=1))
+        assert len(batches) == 3
+        assert all(b.endswith("\n") for b in batches)
+        lines = [json.loads(line) for line in batches[0].splitlines()]
+        assert lines == [
+            {
+                "index": {
+                    "_index": "catalogue",
+                    "_id": "Proj 1::description",
+                }
+            },
+            docs[0],
+        ]
+        delete = json.loads(batches[1])
+        assert delete == {
+            "delete": {
+                "_index": "catalogue",
+                "_id": "Proj 1::project_name",
+            }
+        }
+
+    def test_batch_size_validated(self):
+        """Batch sizes below 1 are rejected."""
+        with pytest.raises(ValueError, match="batch_size must be >= 1"):
+            list(iter_bulk_batches([], "catalogue", batch_size=0))
+
+
+class TestLoadBulkBatches:
+    """Tests for load_bulk_batches."""
+
+    def test_loads_every_batch(self, docs, bulk_server):
+        """Every batch is posted & every operation reported."""
+        ops, _ = diff_documents(docs, {})
+        batches = list(iter_bulk_batches(ops, "catalogue", batch_size=2))
+        results = load_bulk_batches(batches, bulk_server.url)
+        assert sorted(bulk_server.bodies) == sorted(batches)
+        assert sorted(results["_id"]) == sorted(
+            document_id(d) for d in docs
+        )
+        assert results["error"].isna().all()
+
+    def test_concurrency_is_bounded(self, bulk_server):
+        """No more than max_workers requests are in flight at once."""
+        bulk_server.delay = 0.05
+        ops = [("delete", f"doc-{i}", None) for i in range(12)]
+        batches = iter_bulk_batches(ops, "catalogue", batch_size=1)
+        results = load_bulk_batches(
+            batches, bulk_server.url, max_workers=3
+        )
+        assert len(results) == 12
+        assert 1 < bulk_server.max_in_flight <= 3
+
+    def test_operation_errors_are_reported(self, docs, bulk_server):
+        """Failed operations are returned with their error."""
+        bulk_server.fail_ids = {"Proj 2::description"}
+        ops, _ = diff_documents(docs, {})
+        results = load_bulk_batches(
+            iter_bulk_batches(ops, "catalogue"), bulk_server.url
+        )
+        failed = results[results["error"].notna()]
+        assert list(failed["_id"]) == ["Proj 2::description"]
+        assert list(failed["status"]) == [409]
+
+    def test_rejected_request_raises(self, bulk_server):
+        """A request rejected as a whole raises an HTTPError."""
+        bulk_server.status = 400
+        batches = iter_bulk_batches([("delete", "a", None)], "catalogue")
+        with pytest.raises(requests.HTTPError, match="HTTP error 400"):
+            load_bulk_batches(batches, bulk_server.url)
+
+    def test_bad_url_raises(self):
+        """Urls must be http or https."""
+        with pytest.raises(ValueError, match="should begin with 'http'"):
+            load_bulk_batches([], "ftp://localhost/_bulk")
+
+    def test_rerun_after_partial_failure(self, docs, bulk_server):
+        """Succeeded operations are promoted, so a rerun only emits the
+        failed operations & they no longer conflict."""
+        bulk_server.fail_ids = {"Proj 2::description"}
+        ops, hashes = diff_documents(docs, {})
+        results = load_bulk_batches(
+            iter_bulk_batches(ops, "catalogue"), bulk_server.url
+        )
+        promoted = promote_hashes({}, hashes, results)
+        assert set(promoted) == {
+            "Proj 1::description",
+            "Proj 1::project_name",
+        }
+        bulk_server.fail_ids = set()
+        ops, hashes = diff_documents(docs, promoted)
+        assert [doc_id for _, doc_id, _ in ops] == ["Proj 2::description"]
+        results = load_bulk_batches(
+            iter_bulk_batches(ops, "catalogue"), bulk_server.url
+        )
+        assert results["error"].isna().all()
+        assert promote_hashes(promoted, hashes, results) == hashes
+        # rerunning against the old hashes is also safe, as new
+        # documents are indexed rather than created
+        ops, _ = diff_documents(docs, {})
+        results = load_bulk_batches(
+            iter_bulk_batches(ops, "catalogue"), bulk_server.url
+        )
+        assert results["error"].isna().all()
+
+    def test_deletes_promoted(self, docs):
+        """Successful deletes drop their hash, failed ones keep it."""
+        _, previous = diff_documents(docs, {})
+        ops, hashes = diff_documents(docs[:1], previous)
+        results = pd.DataFrame(
+            {
+                "_id": [doc_id for _, doc_id, _ in ops],
+                "action": ["delete", "delete"],
+                "status": [200, 500],
+                "error": [None, {"type": "unavailable"}],
+            }
+        )
+        promoted = promote_hashes(previous, hashes, results)
+        assert set(promoted) == {
+            "Proj 1::description",
+            "Proj 2::description",
+        }
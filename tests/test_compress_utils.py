@@ -0,0 +1,139 @@
+"""Tests for compress_utils module."""
+
+import gzip
+import json
+
+import pytest
+
+from ai_nexus_backend import compress_utils
+
+
+class TestWriteCompressedSiblings:
+    """Tests for write_compressed_siblings."""
+
+    def test_write_gzip_sibling(self, tmp_path):
+        """Gzip sibling decompresses to the original content."""
+        pth = tmp_path / "search.json"
+        pth.write_text('{"key": "value"}' * 100)
+        siblings = compress_utils.write_compressed_siblings(pth, ["gz"])
+        assert siblings == {"gz": tmp_path / "search.json.gz"}
+        assert gzip.decompress(siblings["gz"].read_bytes()) == (
+            pth.read_bytes()
+        )
+
+    def test_gzip_is_reproducible(self, tmp_path):
+        """Compressing identical content twice gives identical bytes."""
+        pth = tmp_path / "index.html"
+        pth.write_text("<p>Some content.</p>")
+        first = compress_utils.write_compressed_siblings(pth, ["gz"])
+        first_bytes = first["gz"].read_bytes()
+        second = compress_utils.write_compressed_siblings(pth, ["gz"])
+        assert second["gz"].read_bytes() == first_bytes
+
+    def test_write_brotli_sibling(self, tmp_path):
+        """Brotli sibling decompresses to the original content."""
+        brotli = pytest.importorskip("brotli")
+        pth = tmp_path / "index.xml"
+        pth.write_text("<rss></rss>")
+        siblings = compress_utils.write_compressed_siblings(pth, ["br"])
+        assert brotli.decompress(siblings["br"].read_bytes()) == (
+            pth.read_bytes()
+        )
+
+    def test_unsupported_encoding_raises(self, tmp_path):
+        """Unknown encodings raise ValueError."""
+        pth = tmp_path / "index.html"
+        pth.write_text("content")
+        with pytest.raises(
+            ValueError, match="encoding expects one of gz, br. Found zip"
+        ):
+            compress_utils.write_compressed_siblings(pth, ["zip"])
+
+    def test_brotli_missing_raises(self, tmp_path, monkeypatch):
+        """Requesting brotli without the package installed raises."""
+        monkeypatch.setattr(compress_utils, "brotli", None)
+        pth = tmp_path / "index.html"
+        pth.write_text("content")
+        assert compress_utils.available_encodings() == ("gz",)
+        with pytest.raises(ImportError, match="brotli is required"):
+            compress_utils.write_compressed_siblings(pth, ["br"])
+
+
+class TestPrecompressDirectory:
+    """Tests for precompress_directory."""
+
+    @pytest.fixture(scope="function")
+    def site_dir(self, tmp_path):
+        """A small rendered site with text & binary artifacts."""
+        site = tmp_path / "docs"
+        (site / "site_libs").mkdir(parents=True)
+        (site / "index.html").write_text("<p>content</p>" * 100)
+        (site / "search.json").write_text('{"key": "value"}' * 100)
+        (site / "site_libs" / "quarto.js").write_text("var x = 1;" * 100)
+        (site / "logo.png").write_bytes(b"\x89PNG")
+        return site
+
+    def test_precompress_directory_report(self, site_dir):
+        """Text artifacts are compressed & reported, binaries ignored."""
+        report = compress_utils.precompress_directory(
+            site_dir, encodings=["gz"]
+        )
+        assert report["path"].tolist() == [
+            "index.html",
+            "search.json",
+            "site_libs/quarto.js",
+        ]
+        assert report.columns.tolist() == [
+            "path",
+            "bytes",
+            "gz_bytes",
+            "skipped",
+        ]
+        assert not report["skipped"].any()
+        assert (report["gz_bytes"] < report["bytes"]).all()
+        assert (site_dir / "site_libs" / "quarto.js.gz").exists()
+        assert not (site_dir / "logo.png.gz").exists()
+        # content hashes are not published with the site
+        assert not list(site_dir.glob(".*"))
+        assert (
+            site_dir.parent / ".docs_precompress_manifest.json"
+        ).exists()
+
+    def test_precompress_directory_skips_unchanged(self, site_dir):
+        """Only files with changed content are recompressed."""
+        compress_utils.precompress_directory(site_dir, encodings=["gz"])
+        (site_dir / "index.html").write_text("<p>changed</p>")
+        (site_dir / "search.json.gz").unlink()
+        report = compress_utils.precompress_directory(
+            site_dir, encodings=["gz"]
+        ).set_index("path")
+        assert not report.loc["index.html", "skipped"]
+        # missing sibling is rewritten even though content is unchanged
+        assert not report.loc["search.json", "skipped"]
+        assert report.loc["site_libs/quarto.js", "skipped"]
+        assert gzip.decompress(
+            (site_dir / "index.html.gz").read_bytes()
+        ) == (b"<p>changed</p>")
+
+    def test_precompress_directory_removes_stale_siblings(self, site_dir):
+        """Siblings & manifest entries of deleted or renamed files are
+        removed."""
+        compress_utils.precompress_directory(site_dir, encodings=["gz"])
+        (site_dir / "search.json").unlink()
+        (site_dir / "index.html").rename(site_dir / "home.html")
+        report = compress_utils.precompress_directory(
+            site_dir, encodings=["gz"]
+        )
+        assert report["path"].tolist() == [
+            "home.html",
+            "site_libs/quarto.js",
+        ]
+        assert not (site_dir / "search.json.gz").exists()
+        assert not (site_dir / "index.html.gz").exists()
+        assert (site_dir / "home.html.gz").exists()
+        manifest = json.loads(
+            (
+                site_dir.parent / ".docs_precompress_manifest.json"
+            ).read_text()
+        )
+        assert sorted(manifest) == ["home.html", "site_libs/quarto.js"]
@@ -5,7 +5,80 @@ import pytest
 from requests import HTTPError, Session
 from requests.adapters import Retry
 
-from ai_nexus_backend.confluence_api import ConfluenceClient
+from ai_nexus_backend import confluence_api
+from ai_nexus_backend.confluence_api import (
+    PARSER_BACKENDS,
+    ConfluenceClient,
+    _parse_code_block,
+)
+from ai_nexus_backend.requests_utils import Http2Session
+
+
+class TestParseCodeBlock:
+    """Tests for the _parse_code_block parser backends."""
+
+    @pytest.fixture(params=PARSER_BACKENDS)
+    def parser(self, request):
+        """Each parser backend, skipping lxml if not installed."""
+        if request.param == "lxml":
+            pytest.importorskip("lxml")
+        return request.param
+
+    @pytest.mark.parametrize(
+        "content,expected",
+        [
+            (b"<code>title: a</code>", "title: a"),
+            (
+                "<html><body><p>Intro &amp; <b>bold</b></p>"
+                "<pre><code class='yaml'>a: &quot;b&quot;\n"
+                "c: <span>d</span>\u00e9</code></pre></body></html>".encode(),
+                'a: "b"\nc: d\u00e9',
+            ),
+            (b"<p>text</p><code></code>", ""),
+        ],
+    )
+    def test_backends_agree(self, parser, content, expected):
+        """Every backend extracts the same text as html.parser."""
+        assert _parse_code_block(content, "html.parser") == expected
+        assert _parse_code_block(content, parser) == expected
+
+    @pytest.mark.parametrize(
+        "content",
+        [b"", b"  ", b"<div>No code block here</div>"],
+    )
+    def test_no_code_raises(self, parser, content):
+        """Pages without a code element raise."""
+        with pytest.raises(ValueError, match="No code elements"):
+            _parse_code_block(content, parser)
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            b"<code>a</code>" + b"<p>x</p>" * 10**3 + b"<code>b</code>",
+            b"<code>a<code>b</code></code>",
+        ],
+    )
+    def test_multiple_code_raises(self, parser, content):
+        """Pages with more than one code element raise."""
+        with pytest.raises(NotImplementedError, match="More than one"):
+            _parse_code_block(content, parser)
+
+    def test_unknown_parser_raises(self):
+        """Only the listed backends can be used."""
+        with pytest.raises(ValueError, match="parser must be one of"):
+            _parse_code_block(b"<code>a</code>", "regex")
+        with pytest.raises(ValueError, match="parser must be one of"):
+            ConfluenceClient("foo", "bar", parser="regex")
+
+    def test_default_parser(self):
+        """Clients use html.parser unless a faster backend is chosen."""
+        assert ConfluenceClient("foo", "bar").parser == "html.parser"
+
+    def test_lxml_missing_raises(self, monkeypatch):
+        """Requesting lxml without the package installed raises."""
+        monkeypatch.setattr(confluence_api, "lxml_html", None)
+        with pytest.raises(ImportError, match="lxml is required"):
+            ConfluenceClient("foo", "bar", parser="lxml")
 
 
 class TestConfluenceClient:
@@ -86,6 +159,22 @@ class TestConfluenceClient:
             == new_sess.adapters["https://"].total
         )
 
+    def test_http2_session(self, creds):
+        """The HTTP/2 session is configured as the requests session."""
+        pytest.importorskip("httpx")
+        client = ConfluenceClient(
+            creds["MOCK_EMAIL"],
+            creds["MOCK_PAT"],
+            creds["MOCK_AGENT"],
+            http2=True,
+        )
+        assert isinstance(client._session, Http2Session)
+        assert client._session.headers["Accept"] == "application/json"
+        assert client._session.auth == (
+            creds["MOCK_EMAIL"],
+            creds["MOCK_PAT"],
+        )
+
     def test_extract_json_metadata(self, confluence_client, response_fixt):
         """Test extract_json_metadata method with mocked response."""
         # set up
@@ -205,3 +294,216 @@ class TestConfluenceClient:
         with pytest.raises(HTTPError, match="HTTP error 404:\nNot found"):
             client.return_page_text(url)
         unstub()
+
+    def test_extract_metadata_bulk(self, confluence_client):
+        """Pages are extracted concurrently, with errors per page."""
+
+        class MockBulkResponse:
+            def __init__(self, content, status_code=200):
+                self.content = content
+                self.status_code = status_code
+                self.ok = status_code == 200
+                self.reason = "Not found"
+
+        client = confluence_client
+        pages = {
+            "https://example.com/p1": MockBulkResponse(
+                b"<code>title: project 1\nstatus: live</code>"
+            ),
+            "https://example.com/p2": MockBulkResponse(
+                b"<div>No code block here</div>"
+            ),
+            "https://example.com/p3": MockBulkResponse(b"", 404),
+            "https://example.com/p4": MockBulkResponse(
+                b"<code>title: project 4</code>"
+            ),
+        }
+        for url, resp in pages.items():
+            when(client._session).get(url).thenReturn(resp)
+        dat = client.extract_metadata_bulk(list(pages), max_workers=2)
+        unstub()
+        assert list(dat.columns) == ["url", "title", "status", "error"]
+        assert list(dat["url"]) == list(pages)
+        assert list(dat["title"].fillna("")) == [
+            "project 1",
+            "",
+            "",
+            "project 4",
+        ]
+        assert dat["error"][0] is None
+        assert dat["error"][1] == (
+            "ValueError: No code elements were found on this page."
+        )
+        assert dat["error"][2].startswith("HTTPError: HTTP error 404")
+        # no state is stored on the client
+        assert not hasattr(client, "metadata")
+
+    def test_extract_metadata_bulk_json(self, confluence_client):
+        """JSON code blocks can be extracted, bad formats raise."""
+        client = confluence_client
+        with pytest.raises(ValueError, match="fmt must be one of"):
+            client.extract_metadata_bulk([], fmt="toml")
+        assert list(client.extract_metadata_bulk([]).columns) == [
+            "url",
+            "error",
+        ]
+        url = "https://example.com/json_code_block"
+
+        class MockJsonResponse:
+            ok = True
+            content = b'<code>{"title": "json project"}</code>'
+
+        when(client._session).get(url).thenReturn(MockJsonResponse())
+        dat = client.extract_metadata_bulk([url], fmt="json")
+        unstub()
+        assert dat.to_dict("records") == [
+            {"url": url, "title": "json project", "error": None}
+        ]
+
+    def test_crawl_metadata(self, confluence_client):
+        """Every page of a CQL search is extracted, following cursors."""
+
+        def storage(text):
+            return (
+                "<p>Intro <code>inline</code></p><ac:structured-macro"
+                ' ac:name="code"><ac:plain-text-body><![CDATA['
+                + text
+                + "]]></ac:plain-text-body></ac:structured-macro>"
+            )
+
+        class MockSearchResponse:
+            ok = True
+
+            def __init__(self, results, next_link=None):
+                self.content = {
+                    "results": results,
+                    "_links": {"base": "https://example.com/wiki"},
+                }
+                if next_link:
+                    self.content["_links"]["next"] = next_link
+
+            def json(self):
+                return self.content
+
+        def page(page_id, body):
+            return {
+                "id": page_id,
+                "_links": {"webui": f"/spaces/AI/pages/{page_id}"},
+                "body": {"storage": {"value": body}},
+            }
+
+        client = confluence_client
+        next_link = "/rest/api/content/search?cql=x&cursor=abc"
+        first = MockSearchResponse(
+            [page("1", storage("title: project 1")), page("2", "<p/>")],
+            next_link,
+        )
+        second = MockSearchResponse(
+            [page("3", storage("title: <b>3</b>"))]
+        )
+        when(client._session).get(
+            "https://example.com/wiki/rest/api/content/search",
+            params={
+                "cql": 'type = page AND space = "AI"',
+                "expand": "body.storage,version",
+                "limit": 50,
+            },
+        ).thenReturn(first)
+        when(client._session).get(
+            "https://example.com/wiki" + next_link, params=None
+        ).thenReturn(second)
+        dat = client.crawl_metadata("https://example.com/wiki/", "AI")
+        unstub()
+        assert list(dat.columns) == ["page_id", "url", "title", "error"]
+        assert list(dat["page_id"]) == ["1", "2", "3"]
+        assert (
+            dat["url"][0] == "https://example.com/wiki/spaces/AI/pages/1"
+        )
+        assert dat["title"][0] == "project 1"
+        assert dat["title"][2] == "<b>3</b>"
+        assert dat["error"][1] == (
+            "ValueError: No code elements were found on this page."
+        )
+
+    def test_crawl_metadata_query(self, confluence_client):
+        """A space, label or CQL query must be given, but not both."""
+        client = confluence_client
+        with pytest.raises(ValueError, match="Provide either cql"):
+            client.crawl_metadata("https://example.com/wiki")
+        with pytest.raises(ValueError, match="Provide either cql"):
+            client.crawl_metadata(
+                "https://example.com/wiki", label="x", cql="type = page"
+            )
+        with pytest.raises(ValueError, match="should begin with"):
+            client.crawl_metadata("http://example.com/wiki", label="x")
+
+    def test_extract_metadata_cached(self, confluence_client, tmp_path):
+        """Only pages whose version moved are fetched again."""
+
+        class MockResponse:
+            ok = True
+
+            def __init__(self, content):
+                self.content = content
+
+            def json(self):
+                return self.content
+
+        def stub_versions(versions):
+            results = [
+                {"id": i, "version": {"number": n}}
+                for i, n in versions.items()
+            ]
+            when(client._session).get(
+                "https://example.com/wiki/rest/api/content/search",
+                params={
+                    "cql": "id in (1,2,3)",
+                    "expand": "version",
+                    "limit": 100,
+                },
+            ).thenReturn(MockResponse({"results": results}))
+
+        def stub_page(page_id, title):
+            content = f"<code>title: {title}</code>".encode()
+            when(client._session).get(urls[page_id]).thenReturn(
+                MockResponse(content)
+            )
+
+        client = confluence_client
+        base = "https://example.com/wiki"
+        urls = {
+            i: f"{base}/spaces/AI/pages/{i}/Project+{i}" for i in "123"
+        }
+        urls["x"] = f"{base}/spaces/AI/overview"
+        cache_pth = tmp_path / "page_cache.json"
+
+        # first run fetches every page that exists
+        stub_versions({"1": 3, "2": 5})
+        stub_page("1", "project 1")
+        stub_page("2", "project 2")
+        dat = client.extract_metadata_cached(
+            base, urls.values(), cache_pth
+        )
+        unstub()
+        assert list(dat.columns) == [
+            "page_id",
+            "url",
+            "cached",
+            "title",
+            "error",
+        ]
+        assert list(dat["title"][:2]) == ["project 1", "project 2"]
+        assert not dat["cached"].any()
+        assert dat["error"][2] == "LookupError: Page 3 was not found"
+        assert dat["error"][3].startswith("ValueError: No page ID")
+
+        # unchanged pages are read from the cache, changed pages fetched
+        stub_versions({"1": 3, "2": 6})
+        stub_page("2", "project 2 renamed")
+        dat = client.extract_metadata_cached(
+            base, urls.values(), cache_pth
+        )
+        unstub()
+        assert list(dat["cached"]) == [True, False, False, False]
+        assert list(dat["title"][:2]) == ["project 1", "project 2 renamed"]
+        assert dat["error"][:2].isna().all()
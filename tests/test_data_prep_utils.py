@@ -1,9 +1,27 @@
 """Tests for data_prep_utils."""
 
+import json
+import unicodedata
+
 from pyprojroot import here
+import pyarrow as pa
 import pytest
 
-from ai_nexus_backend.data_prep_utils import fetch_data, transform_data
+from ai_nexus_backend.data_prep_utils import (
+    FIELDS_TO_SEARCH,
+    fetch_data,
+    iter_fetch_data,
+    iter_json_array,
+    iter_resolve_documents,
+    iter_transform_data,
+    normalise_data,
+    normalise_text,
+    normalise_text_table,
+    resolve_meta,
+    transform_data,
+    write_json_stream,
+    write_transform_data_parallel,
+)
 
 
 # maintain this list with expected return values for fixture in tests/data
@@ -79,6 +97,15 @@ class TestFetchData:
             returned_dict == expected_dict
         ), f"Expected {expected_dict}, found {returned_dict}."
 
+    def test_fetch_data_keeps_newlines(self, tmp_path):
+        """Newlines can be left for normalise_text to collapse."""
+        json_pth = tmp_path / "projects.json"
+        json_pth.write_text('[{"team": "a\\nb"}]')
+        assert fetch_data(json_pth) == [{"team": "a b"}]
+        assert fetch_data(json_pth, replace_newlines=False) == [
+            {"team": "a\nb"}
+        ]
+
 
 class TestTransformData:
     """Testing data is formatted for haystack."""
@@ -313,3 +340,231 @@ class TestTransformData:
         assert (
             out == exp_out
         ), "Return value of `transform_data()` not as expected."
+
+
+class TestWriteTransformDataParallel:
+    """Testing the chunked, process parallel transform & write."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 100])
+    def test_write_transform_data_parallel_order(
+        self, tmp_path, chunk_size
+    ):
+        """Output matches transform_data written with json.dump for any
+        chunk size, including chunks without documents."""
+        projects = [
+            dict(p, project_name=f"{p['project_name']} {i}")
+            for i in range(5)
+            for p in exp_dat
+        ]
+        empty = {field: None for field in FIELDS_TO_SEARCH}
+        projects.insert(3, empty)
+        projects.insert(0, empty)
+        pth = tmp_path / "out.json"
+        n = write_transform_data_parallel(
+            iter(projects), pth, chunk_size=chunk_size, max_workers=2
+        )
+        dataset = transform_data(projects)
+        assert n == len(dataset)
+        assert pth.read_text() == json.dumps(dataset, indent=4)
+
+    def test_write_transform_data_parallel_empty(self, tmp_path):
+        """No documents are written as an empty json array."""
+        pth = tmp_path / "out.json"
+        assert write_transform_data_parallel([], pth, max_workers=1) == 0
+        assert pth.read_text() == "[]"
+
+    def test_write_transform_data_parallel_defence(self, tmp_path):
+        """chunk_size must be positive."""
+        with pytest.raises(ValueError, match="chunk_size must be >= 1"):
+            write_transform_data_parallel(
+                exp_dat, tmp_path / "out.json", chunk_size=0
+            )
+
+
+class TestStreaming:
+    """Testing the streaming read, transform & write chain."""
+
+    json_pth = here("tests/data/metadata_example.json")
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 2**16])
+    def test_iter_json_array_chunk_sizes(self, tmp_path, chunk_size):
+        """Items are decoded whole regardless of chunk boundaries."""
+        items = [
+            {"a": "x, ]", "b": None},
+            12345,
+            -3.25e-7,
+            [1, [2]],
+            True,
+            "é",
+        ]
+        pth = tmp_path / "items.json"
+        pth.write_text(json.dumps(items, indent=4))
+        assert list(iter_json_array(pth, chunk_size=chunk_size)) == items
+
+    @pytest.mark.parametrize(
+        "content, match",
+        [
+            ("", "Expected a json array"),
+            ('{"a": 1}', "Expected a json array"),
+            ("[1, 2", "Unexpected end of file"),
+        ],
+    )
+    def test_iter_json_array_raises(self, tmp_path, content, match):
+        """Non-arrays & truncated arrays raise ValueError."""
+        pth = tmp_path / "bad.json"
+        pth.write_text(content)
+        with pytest.raises(ValueError, match=match):
+            list(iter_json_array(pth, chunk_size=1))
+
+    def test_iter_json_array_missing_comma(self, tmp_path):
+        """Items must be comma separated."""
+        pth = tmp_path / "bad.json"
+        pth.write_text("[1 2]")
+        with pytest.raises(json.JSONDecodeError, match="Expecting ','"):
+            list(iter_json_array(pth))
+
+    def test_iter_fetch_data(self):
+        """Streamed projects match fetch_data."""
+        streamed = iter_fetch_data(self.json_pth, chunk_size=16)
+        assert list(streamed) == fetch_data(self.json_pth)
+
+    def test_iter_transform_data(self):
+        """Streamed documents match transform_data."""
+        streamed = iter_transform_data(iter_fetch_data(self.json_pth))
+        assert list(streamed) == transform_data(fetch_data(self.json_pth))
+
+    @pytest.mark.parametrize("dataset", [[], [{"a": [1, {"b": None}]}]])
+    def test_write_json_stream(self, tmp_path, dataset):
+        """Streamed output is identical to json.dump."""
+        pth = tmp_path / "out.json"
+        n = write_json_stream(iter(dataset), pth)
+        assert n == len(dataset)
+        assert pth.read_text() == json.dumps(dataset, indent=4)
+
+
+class TestNormaliseData:
+    """Testing the normalised output format."""
+
+    def test_normalise_data_stores_projects_once(self):
+        """Each project is stored once & documents reference it."""
+        out = normalise_data(exp_dat)
+        assert out["projects"] == {"0": exp_dat[0], "1": exp_dat[1]}
+        assert out["documents"][:2] == [
+            {
+                "content": "Proj 1",
+                "matched_field": "project_name",
+                "project_id": "0",
+            },
+            {
+                "content": "Proof of concept...",
+                "matched_field": "description",
+                "project_id": "0",
+            },
+        ]
+        assert len(out["documents"]) == len(transform_data(exp_dat))
+
+    def test_normalise_data_id_field(self):
+        """Project IDs can be read from the projects."""
+        out = normalise_data(exp_dat, id_field="project_name")
+        assert list(out["projects"].keys()) == ["Proj 1", "Proj 2"]
+        with pytest.raises(ValueError, match="Duplicate project ID: HQ"):
+            normalise_data(exp_dat, id_field="business_area")
+
+    def test_resolve_meta(self):
+        """Metadata is resolved without modifying the stored project."""
+        out = normalise_data(exp_dat)
+        doc = out["documents"][1]
+        meta = resolve_meta(doc, out["projects"])
+        assert meta["matched_field"] == "description"
+        assert meta["technical_lead"] == "Specified lead"
+        assert "matched_field" not in out["projects"]["0"]
+
+    def test_iter_resolve_documents(self):
+        """Resolved documents match transform_data."""
+        resolved = iter_resolve_documents(normalise_data(exp_dat))
+        assert list(resolved) == transform_data(exp_dat)
+
+
+class TestNormaliseText:
+    """Testing normalisation of the searchable fields."""
+
+    fields = ["project_name", "description"]
+
+    def test_normalise_text_steps(self):
+        """Whitespace, unicode variants & punctuation are normalised."""
+        projects = [
+            {
+                "project_name": "  \uff21\uff29  Tool\n\n\u00a0X ",
+                "description": "\u201cSmart\u201d\u200b \ufb01le\u2014ok",
+                "team": "Keep\n  as  is",
+            },
+            {"project_name": "Proj", "description": None, "team": None},
+        ]
+        out = normalise_text(projects, self.fields)
+        assert out[0] == {
+            "project_name": "AI Tool X",
+            "description": '"Smart" file-ok',
+            "team": "Keep\n  as  is",
+            "_lower": {
+                "project_name": "ai tool x",
+                "description": '"smart" file-ok',
+            },
+        }
+        assert out[1]["description"] is None
+        assert out[1]["_lower"]["description"] is None
+        # inputs are not modified
+        assert projects[0]["project_name"].startswith("  ")
+
+    def test_normalise_text_options(self):
+        """NFKC & shadow fields can be switched off."""
+        projects = [{"project_name": "\ufb01x", "description": "A"}]
+        out = normalise_text(
+            projects, self.fields, nfkc=False, lowercase=False
+        )
+        assert out == [{"project_name": "\ufb01x", "description": "A"}]
+
+    def test_normalise_text_matches_python(self):
+        """The columnar implementation matches per-value python."""
+        values = [
+            "a\u2028b\tc",
+            "\u3000x\x85y\u205f",
+            "\u00c5ngstr\u00f6m",
+        ]
+        table = normalise_text_table(
+            pa.table({"description": values}), ["description"]
+        )
+        expected = [
+            " ".join(unicodedata.normalize("NFKC", v).split())
+            for v in values
+        ]
+        assert table["description"].to_pylist() == expected
+        assert table["description_lower"].to_pylist() == [
+            v.lower() for v in expected
+        ]
+
+    def test_normalise_text_then_transform(self):
+        """Normalised projects can be transformed as before."""
+        out = transform_data(normalise_text(exp_dat))
+        assert len(out) == len(transform_data(exp_dat))
+        assert out[0]["meta"]["project_name_lower"] == "proj 1"
+
+    def test_shadow_limited_to_matched_field(self):
+        """Documents carry the lowercase shadow of their field only."""
+        projects = normalise_text(exp_dat)
+        for doc in transform_data(projects):
+            shadows = [k for k in doc["meta"] if k.endswith("_lower")]
+            assert shadows == [f"{doc['meta']['matched_field']}_lower"]
+        normalised = normalise_data(projects)
+        assert list(iter_resolve_documents(normalised)) == (
+            transform_data(projects)
+        )
+
+    def test_shadow_keeps_user_keys(self):
+        """Keys that only look like shadow fields are kept, & projects
+        without shadows are copied as they are."""
+        project = {**exp_dat[0], "team_lower": "justice digital"}
+        doc = transform_data([project])[0]
+        assert doc["meta"] == {**project, "matched_field": "project_name"}
+        doc = transform_data(normalise_text([project]))[0]
+        assert doc["meta"]["team_lower"] == "justice digital"
+        assert doc["meta"]["project_name_lower"] == "proj 1"
@@ -0,0 +1,139 @@
+"""Tests for dedup_utils module."""
+
+import pytest
+
+from ai_nexus_backend.data_prep_utils import (
+    normalise_text,
+    transform_data,
+)
+from ai_nexus_backend.dedup_utils import deduplicate_documents
+
+BOILERPLATE = (
+    "This initiative uses a large language model to summarise case notes"
+    " for probation officers across every region of England and Wales"
+)
+
+
+def _project(name, **fields):
+    """A project with every searchable field, empty unless given."""
+    project = {
+        "project_name": name,
+        "description": None,
+        "what_does_this_initiative_do": None,
+        "reasons_for_use": None,
+        "problem_solved_by_the_initiative": None,
+        "metrics_or_intended_impacts": None,
+        "team": "Justice Digital",
+    }
+    project.update(fields)
+    return project
+
+
+class TestDeduplicateDocuments:
+    """Tests for deduplicate_documents."""
+
+    def test_exact_duplicates_collapse(self):
+        """Identical content, up to case & whitespace, is merged."""
+        docs = transform_data(
+            [
+                _project(
+                    "Proj 1",
+                    description=BOILERPLATE,
+                    reasons_for_use=f"  {BOILERPLATE.upper()}  ",
+                )
+            ]
+        )
+        out = deduplicate_documents(docs)
+        assert [d["meta"]["matched_fields"] for d in out] == [
+            ["project_name"],
+            ["description", "reasons_for_use"],
+        ]
+        # the longest content is kept
+        assert out[1]["content"] == f"  {BOILERPLATE.upper()}  "
+        assert out[1]["meta"]["matched_field"] == "reasons_for_use"
+
+    def test_shadows_of_matched_fields_kept(self):
+        """Documents with lowercase shadows are merged, keeping the shadow
+        of every matched field."""
+        docs = transform_data(
+            normalise_text(
+                [
+                    _project(
+                        "Proj 1",
+                        description=BOILERPLATE,
+                        reasons_for_use=BOILERPLATE.upper(),
+                    )
+                ]
+            )
+        )
+        out = deduplicate_documents(docs)
+        assert out[1]["meta"]["matched_fields"] == [
+            "description",
+            "reasons_for_use",
+        ]
+        assert out[1]["meta"]["description_lower"] == BOILERPLATE.lower()
+        assert "reasons_for_use_lower" in out[1]["meta"]
+        assert "project_name_lower" not in out[1]["meta"]
+
+    def test_near_duplicates_collapse(self):
+        """Content differing by a word is merged, distinct text is not."""
+        docs = transform_data(
+            [
+                _project(
+                    "Proj 1",
+                    description=BOILERPLATE,
+                    what_does_this_initiative_do=f"{BOILERPLATE} quickly",
+                    problem_solved_by_the_initiative="Reduces backlogs",
+                )
+            ]
+        )
+        out = deduplicate_documents(docs)
+        assert [d["meta"]["matched_fields"] for d in out] == [
+            ["project_name"],
+            ["description", "what_does_this_initiative_do"],
+            ["problem_solved_by_the_initiative"],
+        ]
+        assert out[1]["content"].endswith("quickly")
+
+    def test_threshold(self):
+        """A threshold above the similarity keeps both documents."""
+        docs = transform_data(
+            [
+                _project(
+                    "Proj 1",
+                    description=BOILERPLATE,
+                    what_does_this_initiative_do=f"{BOILERPLATE} quickly",
+                )
+            ]
+        )
+        assert len(deduplicate_documents(docs, threshold=1.0)) == 3
+
+    def test_projects_are_not_merged(self):
+        """Duplicate text in different projects is kept for each."""
+        docs = transform_data(
+            [
+                _project("Proj 1", description=BOILERPLATE),
+                _project("Proj 2", description=BOILERPLATE),
+            ]
+        )
+        out = deduplicate_documents(docs)
+        assert len(out) == len(docs)
+        assert [d["meta"]["project_name"] for d in out] == [
+            "Proj 1",
+            "Proj 1",
+            "Proj 2",
+            "Proj 2",
+        ]
+
+    def test_inputs_not_modified(self):
+        """Merged metadata is a copy."""
+        docs = transform_data(
+            [_project("Proj 1", description="A", reasons_for_use="a")]
+        )
+        deduplicate_documents(docs)
+        assert all("matched_fields" not in d["meta"] for d in docs)
+
+    def test_bands_must_divide_num_perm(self):
+        """Band sizes must be whole."""
+        with pytest.raises(ValueError, match="bands must divide num_perm"):
+            deduplicate_documents([], num_perm=128, bands=3)
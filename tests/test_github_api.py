@@ -4,13 +4,17 @@
 from itertools import product
 import re
 import textwrap
+import time
+from urllib.parse import parse_qs, urlparse
 
-from mockito import when, unstub
+from mockito import ANY, when, unstub
+import pandas as pd
+from pyprojroot import here
 import requests
 import pytest
 from yaml import YAMLError
 
-from ai_nexus_backend import github_api
+from ai_nexus_backend import github_api, parquet_utils
 
 
 _test_cases = [
@@ -299,3 +303,599 @@ class TestGithubClient:
 
         with pytest.raises(YAMLError):
             client_fixture.extract_yaml_from_md(md_content)
+
+
+class MockJsonResponse:
+    """Minimal response returning a JSON payload."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.reason = "Not Found" if status_code == 404 else "OK"
+
+    def json(self):
+        return self.payload
+
+
+def _graphql_repo(name, org_nm="ministryofjustice"):
+    """A repository node as returned by the GraphQL fragment."""
+    return {
+        "databaseId": len(name),
+        "url": f"https://github.com/{org_nm}/{name}",
+        "isPrivate": False,
+        "isArchived": False,
+        "name": name,
+        "description": f"{name} description",
+        "primaryLanguage": {"name": "Python"},
+        "updatedAt": "2024-01-01T00:00:00Z",
+        "repositoryTopics": {
+            "nodes": [
+                {"topic": {"name": "ai"}},
+                {"topic": {"name": "nlp"}},
+            ]
+        },
+    }
+
+
+class TestLoadAssets:
+    """Tests for load_assets."""
+
+    def test_load_assets(self, tmp_path):
+        """Entries are read in order, with duplicates dropped."""
+        pth = tmp_path / "assets.yaml"
+        pth.write_text(
+            "- name: 'bentham-app'\n"
+            "  organisation: 'ministryofjustice'\n"
+            "- name: 'data_linking'\n"
+            "  organisation: 'moj-analytical-services'\n"
+            "- name: 'bentham-app'\n"
+            "  organisation: 'ministryofjustice'\n"
+        )
+        assets = github_api.load_assets(pth)
+        assert list(assets["name"]) == ["bentham-app", "data_linking"]
+        assert list(assets["organisation"]) == [
+            "ministryofjustice",
+            "moj-analytical-services",
+        ]
+
+    def test_repo_asset_list_loads(self):
+        """The catalogue's own asset list is valid."""
+        assets = github_api.load_assets(here("data/assets.yaml"))
+        assert len(assets) > 0
+
+    def test_load_assets_missing_organisation(self, tmp_path):
+        """Entries without an organisation raise."""
+        pth = tmp_path / "assets.yaml"
+        pth.write_text("- name: 'bentham-app'\n")
+        with pytest.raises(
+            ValueError, match="needs a name & organisation"
+        ):
+            github_api.load_assets(pth)
+
+
+class TestGetAssetRepos:
+    """Tests for GithubClient.get_asset_repos."""
+
+    @pytest.fixture(scope="function")
+    def client_fixture(self):
+        """Fixture avoids repeated instantiation in tests."""
+        return github_api.GithubClient(github_pat="foo", user_agent="bar")
+
+    @pytest.fixture(scope="function")
+    def assets(self):
+        """Five listed repos, one of which does not exist."""
+        return pd.DataFrame(
+            {
+                "name": ["a", "bb", "missing", "ccc", "dddd"],
+                "organisation": ["ministryofjustice"] * 5,
+            }
+        )
+
+    def test_graphql_batches(self, client_fixture, assets):
+        """Repos are queried in aliased batches, missing repos omitted."""
+        queries = list()
+
+        def answer(url, json):
+            queries.append(json)
+            variables = json["variables"]
+            data, errors = dict(), list()
+            for i in range(len(variables) // 2):
+                name = variables[f"n{i}"]
+                if name == "missing":
+                    data[f"r{i}"] = None
+                    errors.append({"type": "NOT_FOUND", "message": "nope"})
+                else:
+                    data[f"r{i}"] = _graphql_repo(name)
+            return MockJsonResponse({"data": data, "errors": errors})
+
+        when(client_fixture._session).post(
+            github_api.GRAPHQL_URL, json=ANY
+        ).thenAnswer(answer)
+        repos = client_fixture.get_asset_repos(assets, batch_size=2)
+        unstub()
+        assert len(queries) == 3
+        assert "r1: repository(owner: $o1, name: $n1)" in (
+            queries[0]["query"]
+        )
+        assert list(repos["name"]) == ["a", "bb", "ccc", "dddd"]
+        assert list(repos.columns) == github_api._REPO_COLUMNS
+        assert repos["topics"][0] == ["ai", "nlp"]
+        assert repos["programming_language"][0] == "Python"
+        assert repos["repo_url"][0] == (
+            "https://api.github.com/repos/ministryofjustice/a"
+        )
+        assert client_fixture.repos is repos
+
+    def test_graphql_errors_raise(self, client_fixture, assets):
+        """Errors other than missing repos fail the batch."""
+        when(client_fixture._session).post(
+            github_api.GRAPHQL_URL, json=ANY
+        ).thenReturn(
+            MockJsonResponse(
+                {"data": None, "errors": [{"message": "Bad credentials"}]}
+            )
+        )
+        with pytest.raises(requests.HTTPError, match="Bad credentials"):
+            client_fixture.get_asset_repos(assets)
+        unstub()
+
+    def test_rest_mode(self, client_fixture, assets):
+        """Each repo is requested from the REST API."""
+        for name in assets["name"]:
+            url = f"https://api.github.com/repos/ministryofjustice/{name}"
+            if name == "missing":
+                resp = MockJsonResponse({}, status_code=404)
+            else:
+                resp = MockJsonResponse(
+                    {
+                        "id": len(name),
+                        "html_url": f"https://github.com/ministryofjustice/{name}",
+                        "url": url,
+                        "private": False,
+                        "archived": False,
+                        "name": name,
+                        "description": None,
+                        "language": "R",
+                        "updated_at": "2024-01-01T00:00:00Z",
+                        "topics": ["ai"],
+                    }
+                )
+            when(client_fixture._session).get(url).thenReturn(resp)
+        repos = client_fixture.get_asset_repos(assets, mode="rest")
+        unstub()
+        assert list(repos["name"]) == ["a", "bb", "ccc", "dddd"]
+        assert list(repos.columns) == github_api._REPO_COLUMNS
+        assert repos["topics"][3] == ["ai"]
+
+    @pytest.mark.parametrize(
+        "kwargs, match",
+        [
+            ({"mode": "soap"}, "mode must be"),
+            ({"batch_size": 101}, "batch_size must be"),
+        ],
+    )
+    def test_get_asset_repos_defence(
+        self, client_fixture, assets, kwargs, match
+    ):
+        """Invalid mode & batch sizes raise."""
+        with pytest.raises(ValueError, match=match):
+            client_fixture.get_asset_repos(assets, **kwargs)
+
+
+class MockPageResponse(MockJsonResponse):
+    """A page of a paginated response, linking to the next page."""
+
+    def __init__(self, payload, next_url=None):
+        super().__init__(payload)
+        self.links = {"next": {"url": next_url}} if next_url else {}
+        self.headers = {"X-RateLimit-Remaining": "4999"}
+
+
+def _rest_repo(name, private=False):
+    """A repo object as listed by the organisation repos endpoint."""
+    return {
+        "id": len(name),
+        "html_url": f"https://github.com/ministryofjustice/{name}",
+        "url": f"https://api.github.com/repos/ministryofjustice/{name}",
+        "private": private,
+        "archived": False,
+        "name": name,
+        "description": None,
+        "language": "Python",
+        "updated_at": "2024-01-01T00:00:00Z",
+        "topics": [f"{name}-topic"],
+    }
+
+
+class TestGetOrgSnapshot:
+    """Tests for GithubClient.get_org_snapshot."""
+
+    _repos_url = (
+        "https://api.github.com/orgs/ministryofjustice/repos"
+        "?per_page=100&type=public"
+    )
+    _props_url = (
+        "https://api.github.com/orgs/ministryofjustice/properties/values"
+        "?per_page=100"
+    )
+
+    @pytest.fixture(scope="function")
+    def client_fixture(self):
+        """Client with mocked organisation level endpoints."""
+        client = github_api.GithubClient(
+            github_pat="foo", user_agent="bar"
+        )
+        second_page = self._repos_url + "&page=2"
+        when(client._session).get(self._repos_url).thenReturn(
+            MockPageResponse(
+                [_rest_repo("a"), _rest_repo("b")], second_page
+            )
+        )
+        when(client._session).get(second_page).thenReturn(
+            MockPageResponse([_rest_repo("c")])
+        )
+        props = [
+            {
+                "repository_id": len(nm),
+                "repository_name": nm,
+                "repository_full_name": f"ministryofjustice/{nm}",
+                "properties": [{"property_name": "tier", "value": nm}],
+            }
+            for nm in ["a", "b", "c", "private"]
+        ]
+        when(client._session).get(self._props_url).thenReturn(
+            MockPageResponse(props)
+        )
+        yield client
+        unstub()
+
+    def test_get_org_repos_keeps_topics(self, client_fixture):
+        """Topics in the listing payload are kept as a list column."""
+        repos = client_fixture.get_org_repos("ministryofjustice")
+        assert list(repos["name"]) == ["a", "b", "c"]
+        assert list(repos["topics"]) == [
+            ["a-topic"],
+            ["b-topic"],
+            ["c-topic"],
+        ]
+        assert (repos["org_nm"] == "ministryofjustice").all()
+
+    def test_get_org_custom_properties(self, client_fixture):
+        """Every repo's values come from the organisation endpoint."""
+        props = client_fixture.get_org_custom_properties(
+            "ministryofjustice"
+        )
+        assert list(props.columns) == ["repo_url", "custom_properties"]
+        assert props["repo_url"][3] == (
+            "https://github.com/ministryofjustice/private"
+        )
+        assert props["custom_properties"][0] == [
+            {"property_name": "tier", "value": "a"}
+        ]
+
+    def test_get_org_snapshot(self, client_fixture):
+        """Snapshot combines into a typed table without repo requests."""
+        repos, props = client_fixture.get_org_snapshot("ministryofjustice")
+        assert list(props["repo_url"]) == list(repos["html_url"])
+        table = parquet_utils.repos_to_table(repos, custom_props=props)
+        assert table.column("topics").to_pylist() == [
+            ["a-topic"],
+            ["b-topic"],
+            ["c-topic"],
+        ]
+        assert table.column("custom_property_tier").to_pylist() == [
+            ["a"],
+            ["b"],
+            ["c"],
+        ]
+
+
+def _commit(sha, date):
+    """A commit as returned by the commits endpoint."""
+    return {
+        "sha": sha,
+        "html_url": f"https://github.com/ministryofjustice/a/commit/{sha}",
+        "commit": {
+            "author": {"name": "Dev", "email": "dev@x.com", "date": date},
+            "message": f"commit {sha}",
+        },
+    }
+
+
+class TestIterCommits:
+    """Tests for GithubClient.iter_commits."""
+
+    _commits_url = (
+        "https://api.github.com/repos/ministryofjustice/a/commits"
+        "?per_page=100&since=2024-01-01T00%3A00%3A00Z"
+        "&until=2024-12-31T23%3A59%3A59Z"
+    )
+
+    @pytest.fixture(scope="function")
+    def client_fixture(self):
+        """Fixture avoids repeated instantiation in tests."""
+        client = github_api.GithubClient(
+            github_pat="foo", user_agent="bar"
+        )
+        yield client
+        unstub()
+
+    def test_iter_commits_filters_server_side(self, client_fixture):
+        """since & until are sent to GitHub & pages follow next links."""
+        second_page = self._commits_url + "&page=2"
+        when(client_fixture._session).get(self._commits_url).thenReturn(
+            MockPageResponse(
+                [
+                    _commit("c3", "2024-06-02T10:00:00Z"),
+                    _commit("c2", "2024-06-01T10:00:00Z"),
+                ],
+                second_page,
+            )
+        )
+        when(client_fixture._session).get(second_page).thenReturn(
+            MockPageResponse([_commit("c1", "2024-01-01T09:30:00Z")])
+        )
+        pages = client_fixture.iter_commits(
+            "https://github.com/ministryofjustice/a",
+            since="2024-01-01",
+            until=pd.Timestamp("2025-01-01T00:59:59+01:00"),
+        )
+        frames = list(pages)
+        assert [len(f) for f in frames] == [2, 1]
+        assert list(frames[0]["sha"]) == ["c3", "c2"]
+        assert str(frames[0]["date"].dtype) == "datetime64[ns, UTC]"
+        assert frames[1]["date"][0] == pd.Timestamp("2024-01-01T09:30:00Z")
+        # page numbers come from next links, not session params
+        assert "page" not in client_fixture._session.params
+
+    def test_iter_commits_is_lazy(self, client_fixture):
+        """Pages are only requested as they are consumed."""
+        when(client_fixture._session).get(self._commits_url).thenReturn(
+            MockPageResponse(
+                [_commit("c3", "2024-06-02T10:00:00Z")],
+                self._commits_url + "&page=2",
+            )
+        )
+        pages = client_fixture.iter_commits(
+            "https://github.com/ministryofjustice/a",
+            since="2024-01-01T00:00:00",
+            until="2024-12-31T23:59:59Z",
+        )
+        # the second page is not stubbed, so would fail if requested
+        assert list(next(pages)["sha"]) == ["c3"]
+
+    def test_iter_commits_per_page_defence(self, client_fixture):
+        """per_page is bounded by the API's maximum."""
+        with pytest.raises(ValueError, match="per_page must be"):
+            next(
+                client_fixture.iter_commits(
+                    "https://github.com/ministryofjustice/a", per_page=101
+                )
+            )
+
+    def test_paginated_get_cutoff(self, client_fixture):
+        """Client side cutoffs stop at the first page with old commits."""
+        url = "https://api.github.com/repos/ministryofjustice/a/commits"
+        now = pd.Timestamp.now(tz="UTC")
+        recent = (now - pd.Timedelta(days=1)).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        old = (now - pd.Timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        when(client_fixture._session).get(url).thenReturn(
+            MockPageResponse(
+                [_commit("new", recent), _commit("old", old)],
+                url + "?page=2",
+            )
+        )
+        pages = client_fixture._paginated_get(url, timedelta_cutoff_days=7)
+        assert [[c["sha"] for c in p] for p in pages] == [["new"]]
+
+
+class TestSearchRepos:
+    """Tests for GithubClient.search_repos against a fake search API."""
+
+    @pytest.fixture(scope="function")
+    def dataset(self):
+        """2,500 repos pushed through 2024 with ai &/or nlp topics."""
+        start = pd.Timestamp("2024-01-01T00:00:00Z")
+        repos = list()
+        for i in range(2500):
+            repo = _rest_repo(f"repo-{i}")
+            repo["id"] = i
+            repo["topics"] = ["ai", "nlp"] if i % 5 == 0 else ["ai"]
+            repo["archived"] = i % 50 == 1
+            repo["pushed_at"] = start + pd.Timedelta(hours=3 * i)
+            repos.append(repo)
+        return repos
+
+    @pytest.fixture(scope="function")
+    def client_fixture(self, dataset):
+        """Client whose session answers searches from dataset."""
+        client = github_api.GithubClient(
+            github_pat="foo", user_agent="bar"
+        )
+        client.queries = list()
+
+        def search(url):
+            params = parse_qs(urlparse(url).query)
+            q = params["q"][0]
+            page = int(params.get("page", ["1"])[0])
+            per_page = int(params["per_page"][0])
+            client.queries.append((q, page))
+            quals = dict(t.split(":", 1) for t in q.split(" "))
+            lo, hi = map(pd.Timestamp, quals["pushed"].split(".."))
+            hits = [
+                r
+                for r in dataset
+                if lo <= r["pushed_at"] <= hi
+                and quals.get("topic", "ai") in r["topics"]
+                and not (
+                    quals.get("archived") == "false" and r["archived"]
+                )
+            ]
+            # only the first 1,000 results are ever served
+            end = min(page * per_page, github_api.SEARCH_CAP)
+            start = (page - 1) * per_page
+            items = [
+                dict(r, pushed_at=str(r["pushed_at"]))
+                for r in hits[start:end]
+            ]
+            next_url = None
+            if end < min(len(hits), github_api.SEARCH_CAP):
+                next_url = f"{url.split('&page=')[0]}&page={page + 1}"
+            return MockPageResponse(
+                {
+                    "total_count": len(hits),
+                    "incomplete_results": False,
+                    "items": items,
+                },
+                next_url,
+            )
+
+        when(client._session).get(ANY).thenAnswer(search)
+        yield client
+        unstub()
+
+    def test_search_splits_past_cap(self, client_fixture, dataset):
+        """Date ranges are split until every repo is returned."""
+        repos = client_fixture.search_repos(
+            ["ministryofjustice"],
+            pushed_after="2024-01-01",
+            pushed_before="2025-01-01",
+        )
+        expected = {r["id"] for r in dataset if not r["archived"]}
+        assert len(repos) == len(expected)
+        assert set(repos["id"]) == expected
+        assert list(repos.columns) == github_api._REPO_COLUMNS
+        # the whole year is queried first, then halves of it
+        q, _ = client_fixture.queries[0]
+        assert q == (
+            "org:ministryofjustice archived:false"
+            " pushed:2024-01-01T00:00:00Z..2025-01-01T00:00:00Z"
+        )
+        assert all(page <= 10 for _, page in client_fixture.queries)
+
+    def test_search_topics_deduplicated(self, client_fixture, dataset):
+        """Repos matching several topics are returned once."""
+        repos = client_fixture.search_repos(
+            ["ministryofjustice"],
+            topics=["ai", "nlp"],
+            pushed_after="2024-01-01",
+            pushed_before="2024-02-01",
+            include_archived=True,
+        )
+        pushed = pd.Timestamp("2024-02-01T00:00:00Z")
+        expected = [r["id"] for r in dataset if r["pushed_at"] <= pushed]
+        assert list(repos["id"]) == expected
+        assert any(
+            "topic:nlp" in q and "archived" not in q
+            for q, _ in client_fixture.queries
+        )
+
+
+class TestRepoTasks:
+    """Tests for per-repo tasks run from a persistent queue."""
+
+    _urls = [
+        f"https://github.com/ministryofjustice/r{i}" for i in range(3)
+    ]
+
+    @pytest.fixture(scope="function")
+    def client_fixture(self):
+        """Client recording the repos whose topics are requested."""
+        client = github_api.GithubClient(
+            github_pat="foo", user_agent="bar"
+        )
+        client.requested = list()
+
+        def _topics(html_url, metadata):
+            client.requested.append(html_url)
+            if html_url in client.missing:
+                resp = MockJsonResponse({}, status_code=404)
+                raise requests.HTTPError("HTTP error 404", response=resp)
+            return MockJsonResponse({"names": [html_url[-2:]]})
+
+        client.missing = set()
+        when(client).get_repo_metadata(ANY, "topics").thenAnswer(_topics)
+        yield client
+        unstub()
+
+    def test_rerun_resumes_from_queue(self, client_fixture, tmp_path):
+        """A rerun reuses the repos an interrupted crawl finished, retries
+        its failures & clears the queue once complete."""
+        queue_pth = tmp_path / "queue.db"
+        with github_api.TaskQueue(queue_pth, max_attempts=1) as queue:
+            queue.put(("topics", url, None) for url in self._urls)
+            done, failed = queue.lease("killed", n=2)
+            queue.complete(done, "killed", {"names": ["cached"]})
+            # dead lettered on running out of rate limit
+            queue.fail(failed, "killed", "HTTPError: rate limited")
+        out = client_fixture.get_all_repo_metadata(
+            self._urls, "topics", max_workers=2, queue_pth=queue_pth
+        )
+        assert sorted(client_fixture.requested) == self._urls[1:]
+        assert list(out["repo_url"]) == self._urls
+        assert list(out["topics"]) == [
+            {"names": ["cached"]},
+            {"names": ["r1"]},
+            {"names": ["r2"]},
+        ]
+        with github_api.TaskQueue(queue_pth) as queue:
+            assert set(queue.counts().values()) == {0}
+        # the next crawl fetches every repo afresh
+        client_fixture.requested.clear()
+        client_fixture.get_all_repo_metadata(
+            self._urls, "topics", queue_pth=queue_pth
+        )
+        assert sorted(client_fixture.requested) == self._urls
+
+    def test_missing_repo_not_retried(self, client_fixture, tmp_path):
+        """Client errors such as 404s are None without retrying."""
+        client_fixture.missing = {self._urls[2]}
+        start = time.perf_counter()
+        out = client_fixture.get_all_repo_metadata(
+            self._urls, "topics", queue_pth=tmp_path / "queue.db"
+        )
+        assert time.perf_counter() - start < 5
+        assert client_fixture.requested.count(self._urls[2]) == 1
+        assert list(out["topics"])[2] is None
+
+    def test_missing_repo_not_requeued(self, client_fixture, tmp_path):
+        """A missing repo dead lettered by an interrupted crawl is not
+        requested again on the rerun, unlike one out of attempts."""
+        queue_pth = tmp_path / "queue.db"
+        with github_api.TaskQueue(queue_pth, max_attempts=1) as queue:
+            queue.put(("topics", url, None) for url in self._urls)
+            missing, flaky = queue.lease("killed", n=2)
+            queue.fail(missing, "killed", "PermanentError: 404", False)
+            queue.fail(flaky, "killed", "HTTPError: 502")
+        out = client_fixture.get_all_repo_metadata(
+            self._urls,
+            "topics",
+            queue_pth=queue_pth,
+            max_attempts=2,
+            backoff_s=0,
+        )
+        assert sorted(client_fixture.requested) == self._urls[1:]
+        assert list(out["topics"]) == [
+            None,
+            {"names": ["r1"]},
+            {"names": ["r2"]},
+        ]
+
+    def test_commits_task(self, client_fixture):
+        """Commits tasks return JSON serialisable commit records."""
+        page = github_api._commit_frame(
+            [_commit("b", "2024-02-01T00:00:00Z")]
+        )
+        when(client_fixture).iter_commits(
+            self._urls[0], since="2024-01-01", until=None
+        ).thenReturn(iter([page]))
+        handlers = client_fixture.task_handlers()
+        assert set(handlers) == set(github_api.REPO_TASKS)
+        commits = handlers["commits"](
+            self._urls[0], {"since": "2024-01-01"}
+        )
+        assert commits[0]["sha"] == "b"
+        assert commits[0]["date"] == "2024-02-01T00:00:00Z"
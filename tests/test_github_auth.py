@@ -0,0 +1,258 @@
+"""Tests for github_auth module."""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+from mockito import ANY, unstub, when
+import pytest
+import requests
+
+from ai_nexus_backend import github_auth
+from ai_nexus_backend.github_api import GithubClient
+from ai_nexus_backend.github_auth import (
+    AppInstallationCredential,
+    TokenPool,
+)
+from ai_nexus_backend.requests_utils import Http2Session
+
+
+class _RateLimitedHandler(BaseHTTPRequestHandler):
+    """Stand-in API enforcing a separate quota per bearer token, & per
+    token for search requests."""
+
+    def do_GET(self):
+        server = self.server
+        token = self.headers.get("Authorization", "").removeprefix(
+            "Bearer "
+        )
+        if self.path.startswith("/search/"):
+            resource, key = "search", (token, "search")
+            quota = server.search_quota
+        else:
+            resource, key = "core", token
+            quota = server.quota.get(token, 0)
+        with server.lock:
+            if time.time() >= server.reset_at:
+                server.used.clear()
+                server.reset_at = time.time() + server.window
+            allowed = server.used[key] < quota
+            if allowed:
+                server.used[key] += 1
+                server.served[key] += 1
+            remaining = quota - server.used[key]
+            reset_at = server.reset_at
+        body = json.dumps({"token": token}).encode()
+        self.send_response(200 if allowed else 403)
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        self.send_header("X-RateLimit-Reset", str(reset_at))
+        self.send_header("X-RateLimit-Resource", resource)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="function")
+def api():
+    """Local API allowing 4 requests per token per 1s window."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RateLimitedHandler)
+    server.lock = threading.Lock()
+    server.quota = {"pat-a": 4, "pat-b": 4, "pat-c": 4}
+    server.search_quota = 2
+    server.used = Counter()
+    server.served = Counter()
+    server.window = 1.0
+    server.reset_at = time.time() + server.window
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path="/rate_limited"):
+    """URL of the local API."""
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+class TestTokenPool:
+    """Tests for TokenPool."""
+
+    def test_requests_spread_over_tokens(self, api):
+        """Throughput scales with the number of tokens in the pool."""
+        sess = requests.Session()
+        sess.auth = TokenPool(["pat-a", "pat-b", "pat-c"], max_wait=0)
+        statuses = [sess.get(_url(api)).status_code for _ in range(12)]
+        assert statuses == [200] * 12
+        assert api.served == {"pat-a": 4, "pat-b": 4, "pat-c": 4}
+
+    def test_single_token_is_capped(self, api):
+        """A single token runs out of budget within the window."""
+        sess = requests.Session()
+        sess.auth = TokenPool(["pat-a"], max_wait=0)
+        for _ in range(4):
+            assert sess.get(_url(api)).ok
+        with pytest.raises(requests.HTTPError, match="rate limited"):
+            sess.get(_url(api))
+
+    def test_concurrent_requests(self, api):
+        """Threads sharing a session spread requests over tokens."""
+        sess = requests.Session()
+        sess.auth = TokenPool(["pat-a", "pat-b", "pat-c"], max_wait=0)
+        results = list()
+
+        def _get():
+            results.append(sess.get(_url(api)).status_code)
+
+        threads = [threading.Thread(target=_get) for _ in range(9)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [200] * 9
+
+    def test_rate_limited_request_resent(self, api):
+        """A token exhausted elsewhere is parked & the request resent."""
+        api.quota["pat-a"] = 0
+        pool = TokenPool(["pat-a", "pat-b"], max_wait=0)
+        sess = requests.Session()
+        sess.auth = pool
+        resp = sess.get(_url(api))
+        assert resp.status_code == 200
+        assert resp.json() == {"token": "pat-b"}
+        assert [r.status_code for r in resp.history] == [403]
+        assert pool.remaining["core"][0] == 0
+        # parked token is not used again before reset
+        assert sess.get(_url(api)).json() == {"token": "pat-b"}
+
+    def test_waits_for_reset(self, api):
+        """Requests wait for the earliest reset once every token is
+        exhausted."""
+        sess = requests.Session()
+        sess.auth = TokenPool(["pat-a"], max_wait=5)
+        start = time.time()
+        statuses = [sess.get(_url(api)).status_code for _ in range(6)]
+        assert statuses == [200] * 6
+        assert time.time() - start >= 0.5
+
+    def test_single_token_rate_limited_waits(self, api):
+        """A lone token exhausted elsewhere waits for its reset & the
+        request is resent, rather than the 403 being returned."""
+        api.used["pat-a"] = 4
+        sess = requests.Session()
+        sess.auth = TokenPool(["pat-a"], max_wait=5)
+        resp = sess.get(_url(api))
+        assert resp.status_code == 200
+        assert [r.status_code for r in resp.history] == [403]
+
+    def test_single_token_rate_limited_raises(self, api):
+        """Waits longer than max_wait raise rather than return a 403."""
+        api.used["pat-a"] = 4
+        api.window = 60
+        api.reset_at = time.time() + 60
+        sess = requests.Session()
+        sess.auth = TokenPool(["pat-a"], max_wait=1)
+        with pytest.raises(requests.HTTPError, match="rate limited"):
+            sess.get(_url(api))
+
+    def test_search_budget_is_separate(self, api):
+        """Search requests have their own budget, so exhausting it does
+        not park the token for other requests."""
+        pool = TokenPool(["pat-a"], max_wait=0)
+        sess = requests.Session()
+        sess.auth = pool
+        search_url = _url(api, "/search/repositories")
+        assert sess.get(search_url).ok
+        assert sess.get(search_url).ok
+        assert pool.remaining["search"] == [0]
+        with pytest.raises(requests.HTTPError, match="rate limited"):
+            sess.get(search_url)
+        assert sess.get(_url(api)).ok
+        assert pool.remaining["core"] == [3]
+
+    def test_empty_pool_raises(self):
+        """A pool needs at least one credential."""
+        with pytest.raises(ValueError, match="at least one credential"):
+            TokenPool([])
+
+
+class MockTokenResponse:
+    """Installation token response."""
+
+    ok = True
+
+    def __init__(self, token, expires_at):
+        self.token = token
+        self.expires_at = expires_at
+
+    def json(self):
+        return {"token": self.token, "expires_at": self.expires_at}
+
+
+class TestAppInstallationCredential:
+    """Tests for AppInstallationCredential."""
+
+    def test_token_refreshed_before_expiry(self):
+        """Tokens are reused until within refresh_margin of expiry."""
+        sess = requests.Session()
+        cred = AppInstallationCredential(
+            app_id=1, private_key="key", installation_id=2, sess=sess
+        )
+        url = "https://api.github.com/app/installations/2/access_tokens"
+        when(github_auth)._app_jwt(1, "key").thenReturn("app-jwt")
+        when(sess).post(url, headers=ANY).thenReturn(
+            MockTokenResponse("ghs_1", "2999-01-01T00:00:00Z")
+        )
+        assert cred.token() == "ghs_1"
+        assert cred.token() == "ghs_1"
+        # expiring within the margin triggers a refresh
+        cred.expires_at = time.time() + 60
+        when(sess).post(url, headers=ANY).thenReturn(
+            MockTokenResponse("ghs_2", "2999-01-01T00:00:00Z")
+        )
+        assert cred.token() == "ghs_2"
+        unstub()
+
+    def test_requires_pyjwt(self):
+        """Authenticating as an App without PyJWT raises."""
+        if github_auth.jwt is not None:
+            pytest.skip("PyJWT is installed")
+        cred = AppInstallationCredential(
+            app_id=1, private_key="key", installation_id=2
+        )
+        with pytest.raises(ImportError, match="PyJWT is required"):
+            cred.token()
+
+
+class TestGithubClientAuth:
+    """GithubClient authentication with one or several tokens."""
+
+    def test_single_pat_header(self):
+        """A single PAT is sent as a session header."""
+        client = GithubClient(github_pat="foo", user_agent="bar")
+        assert client._session.headers["Authorization"] == "Bearer foo"
+        assert client._session.auth is None
+
+    def test_pat_list_pooled(self):
+        """Several PATs are pooled as the session's auth."""
+        client = GithubClient(github_pat=["foo", "baz"], user_agent="bar")
+        assert isinstance(client._session.auth, TokenPool)
+        assert "Authorization" not in client._session.headers
+        assert len(client._session.auth.credentials) == 2
+        # shared default session, restore a single token
+        GithubClient(github_pat="foo", user_agent="bar")
+
+    def test_http2_session(self):
+        """The HTTP/2 session is configured as the requests session."""
+        pytest.importorskip("httpx")
+        client = GithubClient(
+            github_pat=["foo", "baz"], user_agent="bar", http2=True
+        )
+        assert isinstance(client._session, Http2Session)
+        assert isinstance(client._session.auth, TokenPool)
+        assert client._session.headers["User-Agent"] == "bar"
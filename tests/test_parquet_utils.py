@@ -0,0 +1,211 @@
+"""Tests for parquet_utils module."""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from ai_nexus_backend import parquet_utils
+
+
+def _repos(org_nm: str) -> pd.DataFrame:
+    """Repo metadata as returned by GithubClient.get_org_repos."""
+    return pd.DataFrame(
+        {
+            "id": [1, 2],
+            "html_url": [
+                f"https://github.com/{org_nm}/x",
+                f"https://github.com/{org_nm}/y",
+            ],
+            "repo_url": [
+                f"https://api.github.com/repos/{org_nm}/x",
+                f"https://api.github.com/repos/{org_nm}/y",
+            ],
+            "is_private": [False, False],
+            "is_archived": [False, True],
+            "name": ["x", "y"],
+            "description": ["A repo", None],
+            "programming_language": ["Python", None],
+            "updated_at": ["2024-10-10T12:00:00Z", "2023-01-01T00:00:00Z"],
+            "org_nm": org_nm,
+        }
+    ).set_index("repo_url")
+
+
+@pytest.fixture(scope="function")
+def custom_props():
+    """Custom properties as returned by get_all_repo_metadata."""
+    return pd.DataFrame(
+        {
+            "repo_url": [
+                "https://github.com/a/x",
+                "https://github.com/a/y",
+            ],
+            "custom_properties": [
+                [
+                    {"property_name": "team", "value": "dmet"},
+                    {"property_name": "tags", "value": ["ai", "nlp"]},
+                ],
+                [{"property_name": "tags", "value": "ai"}],
+            ],
+        }
+    )
+
+
+@pytest.fixture(scope="function")
+def topics():
+    """Topics as returned by get_all_repo_metadata."""
+    return pd.DataFrame(
+        {
+            "repo_url": [
+                "https://github.com/a/x",
+                "https://github.com/a/y",
+            ],
+            "topics": [{"names": ["llm", "nlp"]}, None],
+        }
+    )
+
+
+class TestTopicList:
+    """Tests for _topic_list."""
+
+    @pytest.mark.parametrize(
+        "topics, expected",
+        [
+            (None, []),
+            ({"names": np.array(["llm", "nlp"])}, ["llm", "nlp"]),
+            (np.array(["llm"]), ["llm"]),
+            ([], []),
+        ],
+    )
+    def test__topic_list(self, topics, expected):
+        """API responses & list columns flatten to lists of str."""
+        assert parquet_utils._topic_list(topics) == expected
+
+
+class TestReposToTable:
+    """Tests for repos_to_table."""
+
+    def test_repos_to_table_schema(self, custom_props, topics):
+        """Table conforms to REPO_SCHEMA with pivoted properties."""
+        table = parquet_utils.repos_to_table(
+            _repos("a"), custom_props=custom_props, topics=topics
+        )
+        assert table.schema.names[: len(parquet_utils.REPO_SCHEMA)] == (
+            parquet_utils.REPO_SCHEMA.names
+        )
+        assert table.schema.field("topics").type == pa.list_(pa.string())
+        assert table.schema.field("updated_at").type == pa.timestamp(
+            "s", tz="UTC"
+        )
+        assert pa.types.is_dictionary(table.schema.field("org_nm").type)
+        assert table.schema.field("custom_property_team").type == (
+            pa.list_(pa.string())
+        )
+        assert table.schema.field("custom_property_tags").type == (
+            pa.list_(pa.string())
+        )
+        dat = table.to_pydict()
+        assert dat["topics"] == [["llm", "nlp"], []]
+        # single values are wrapped in a list
+        assert dat["custom_property_team"] == [["dmet"], None]
+        assert dat["custom_property_tags"] == [["ai", "nlp"], ["ai"]]
+
+    def test_repos_to_table_without_metadata(self):
+        """Repos without topics or custom properties get empty topics."""
+        table = parquet_utils.repos_to_table(_repos("a"))
+        assert table.schema == parquet_utils.REPO_SCHEMA
+        assert table.column("topics").to_pylist() == [[], []]
+
+
+class TestRepoDataset:
+    """Tests for writing & reading the partitioned repo dataset."""
+
+    def test_write_repo_dataset(self, tmp_path, custom_props, topics):
+        """Partitions are zstd compressed with row group statistics."""
+        table = parquet_utils.repos_to_table(
+            _repos("a"), custom_props=custom_props, topics=topics
+        )
+        parquet_utils.write_repo_dataset(table, tmp_path)
+        files = list((tmp_path / "org_nm=a").glob("*.parquet"))
+        assert len(files) == 1
+        col = pq.ParquetFile(files[0]).metadata.row_group(0).column(0)
+        assert col.compression == "ZSTD"
+        assert col.statistics.has_min_max
+        assert (col.statistics.min, col.statistics.max) == (1, 2)
+
+    def test_read_repo_dataset(self, tmp_path, custom_props, topics):
+        """Organisations can be read together or filtered."""
+        parquet_utils.write_repo_dataset(
+            parquet_utils.repos_to_table(
+                _repos("a"), custom_props=custom_props, topics=topics
+            ),
+            tmp_path,
+        )
+        parquet_utils.write_repo_dataset(
+            parquet_utils.repos_to_table(_repos("b")), tmp_path
+        )
+        dat = parquet_utils.read_repo_dataset(tmp_path)
+        assert len(dat) == 4
+        assert isinstance(dat["org_nm"].dtype, pd.CategoricalDtype)
+        assert isinstance(dat["updated_at"].dtype, pd.DatetimeTZDtype)
+        dat_b = parquet_utils.read_repo_dataset(
+            tmp_path, org_nm="b", columns=["name", "custom_property_team"]
+        )
+        assert dat_b["name"].tolist() == ["x", "y"]
+        # missing custom properties in a partition are null
+        assert dat_b["custom_property_team"].isna().all()
+
+    def test_read_mixed_property_types(self, tmp_path):
+        """A property single valued in one organisation & multi-select
+        in another is read as one column."""
+        for org_nm, value in [("a", "dmet"), ("b", ["dmet", "ai"])]:
+            repos = _repos(org_nm)
+            custom_props = pd.DataFrame(
+                {
+                    "repo_url": repos["html_url"],
+                    "custom_properties": [
+                        [{"property_name": "team", "value": value}]
+                    ]
+                    * len(repos),
+                }
+            )
+            parquet_utils.write_repo_dataset(
+                parquet_utils.repos_to_table(repos, custom_props),
+                tmp_path,
+            )
+        dat = parquet_utils.read_repo_dataset(tmp_path)
+        assert [list(v) for v in dat["custom_property_team"]] == [
+            ["dmet"],
+            ["dmet"],
+            ["dmet", "ai"],
+            ["dmet", "ai"],
+        ]
+
+    def test_empty_write_removes_partition(self, tmp_path):
+        """An organisation without repos has its partition removed,
+        other partitions are left untouched."""
+        for org_nm in ["a", "b"]:
+            parquet_utils.write_repo_dataset(
+                parquet_utils.repos_to_table(_repos(org_nm)), tmp_path
+            )
+        empty = parquet_utils.repos_to_table(_repos("a").iloc[:0])
+        parquet_utils.write_repo_dataset(empty, tmp_path)
+        assert len(parquet_utils.read_repo_dataset(tmp_path, "a")) == 2
+        parquet_utils.write_repo_dataset(empty, tmp_path, org_nms=["a"])
+        assert not (tmp_path / "org_nm=a").exists()
+        assert len(parquet_utils.read_repo_dataset(tmp_path, "a")) == 0
+        assert len(parquet_utils.read_repo_dataset(tmp_path)) == 2
+
+    def test_write_repo_dataset_replaces_partition(self, tmp_path):
+        """Rewriting an organisation leaves other partitions untouched."""
+        for org_nm in ["a", "b"]:
+            parquet_utils.write_repo_dataset(
+                parquet_utils.repos_to_table(_repos(org_nm)), tmp_path
+            )
+        parquet_utils.write_repo_dataset(
+            parquet_utils.repos_to_table(_repos("b").iloc[:1]), tmp_path
+        )
+        assert len(parquet_utils.read_repo_dataset(tmp_path, "a")) == 2
+        assert len(parquet_utils.read_repo_dataset(tmp_path, "b")) == 1
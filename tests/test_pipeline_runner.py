@@ -0,0 +1,245 @@
+"""Tests for pipeline_runner module."""
+
+import sys
+import threading
+import time
+
+import pytest
+from pyprojroot import here
+
+from ai_nexus_backend.pipeline_runner import (
+    Stage,
+    run_pipeline,
+    script_sources,
+)
+
+
+def _copy_upper(src, dst, calls, nm):
+    """Action writing an uppercase copy of src to dst."""
+
+    def action():
+        calls.append(nm)
+        dst.write_text(src.read_text().upper())
+
+    return action
+
+
+@pytest.fixture
+def chain(tmp_path):
+    """Two stages, the second reading the output of the first."""
+    raw = tmp_path / "raw.txt"
+    raw.write_text("catalogue")
+    mid = tmp_path / "mid.txt"
+    out = tmp_path / "out.txt"
+    code = tmp_path / "stage.py"
+    code.write_text("VERSION = 1")
+    calls = list()
+    stages = [
+        # declared out of order, dependencies come from inputs & outputs
+        Stage(
+            "second",
+            _copy_upper(mid, out, calls, "second"),
+            inputs=[mid],
+            outputs=[out],
+        ),
+        Stage(
+            "first",
+            _copy_upper(raw, mid, calls, "first"),
+            inputs=[raw],
+            outputs=[mid],
+            code=[code],
+        ),
+    ]
+    return stages, calls, tmp_path
+
+
+class TestRunPipeline:
+    """Tests for run_pipeline."""
+
+    def test_runs_in_dependency_order(self, chain):
+        """Stages reading another stage's outputs run after it."""
+        stages, calls, tmp_path = chain
+        report = run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["first", "second"]
+        assert list(report["status"]) == ["ran", "ran"]
+        assert (tmp_path / "out.txt").read_text() == "CATALOGUE"
+
+    def test_unchanged_stages_skipped(self, chain):
+        """A second run with nothing changed runs no stages."""
+        stages, calls, tmp_path = chain
+        run_pipeline(stages, tmp_path / "state.json")
+        calls.clear()
+        report = run_pipeline(stages, tmp_path / "state.json")
+        assert calls == []
+        assert list(report["stage"]) == ["first", "second"]
+        assert set(report["status"]) == {"skipped"}
+
+    def test_changed_input_reruns_dependants(self, chain):
+        """Changing an input reruns its stage & stages reading its
+        changed outputs."""
+        stages, calls, tmp_path = chain
+        run_pipeline(stages, tmp_path / "state.json")
+        calls.clear()
+        (tmp_path / "raw.txt").write_text("catalogue v2")
+        run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["first", "second"]
+        assert (tmp_path / "out.txt").read_text() == "CATALOGUE V2"
+
+    def test_unchanged_outputs_skip_dependants(self, chain):
+        """A rerun stage whose outputs are unchanged does not rerun the
+        stages reading them."""
+        stages, calls, tmp_path = chain
+        run_pipeline(stages, tmp_path / "state.json")
+        calls.clear()
+        (tmp_path / "raw.txt").write_text("CATALOGUE")
+        run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["first"]
+
+    def test_changed_code_reruns_stage(self, chain):
+        """Changing a stage's code reruns it."""
+        stages, calls, tmp_path = chain
+        run_pipeline(stages, tmp_path / "state.json")
+        calls.clear()
+        (tmp_path / "stage.py").write_text("VERSION = 2")
+        run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["first"]
+
+    def test_missing_output_reruns_stage(self, chain):
+        """Deleting a stage's output reruns it."""
+        stages, calls, tmp_path = chain
+        run_pipeline(stages, tmp_path / "state.json")
+        calls.clear()
+        (tmp_path / "out.txt").unlink()
+        run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["second"]
+        assert (tmp_path / "out.txt").exists()
+
+    def test_force_reruns_stage(self, chain):
+        """Forced stages run even if unchanged."""
+        stages, calls, tmp_path = chain
+        run_pipeline(stages, tmp_path / "state.json")
+        calls.clear()
+        run_pipeline(stages, tmp_path / "state.json", force=["first"])
+        assert calls == ["first"]
+
+    def test_failure_blocks_dependants(self, chain):
+        """A failed stage is reported, its dependants are not run & it
+        reruns on the next run."""
+        stages, calls, tmp_path = chain
+        (tmp_path / "raw.txt").unlink()
+        report = run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["first"]
+        assert dict(zip(report["stage"], report["status"])) == {
+            "first": "failed",
+            "second": "blocked",
+        }
+        assert report["error"][0].startswith("FileNotFoundError")
+        (tmp_path / "raw.txt").write_text("catalogue")
+        calls.clear()
+        run_pipeline(stages, tmp_path / "state.json")
+        assert calls == ["first", "second"]
+
+    def test_independent_stages_run_concurrently(self, tmp_path):
+        """Stages with no dependency between them overlap."""
+        # each stage waits for the other, so sequential runs time out
+        barrier = threading.Barrier(2, timeout=5)
+        stages = [
+            Stage(nm, barrier.wait, outputs=[tmp_path / nm])
+            for nm in ["github", "confluence"]
+        ]
+        report = run_pipeline(stages, tmp_path / "state.json")
+        assert set(report["status"]) == {"ran"}
+
+    def test_command_stage(self, tmp_path):
+        """Command actions are run as subprocesses."""
+        out = tmp_path / "out.txt"
+        cmd = [
+            sys.executable,
+            "-c",
+            f"open({str(out)!r}, 'w').write('done')",
+        ]
+        stage = Stage("cmd", cmd, outputs=[out])
+        report = run_pipeline([stage], tmp_path / "state.json")
+        assert report["status"][0] == "ran"
+        assert out.read_text() == "done"
+        failing = Stage("fails", [sys.executable, "-c", "exit(1)"])
+        report = run_pipeline([failing], tmp_path / "state.json")
+        assert report["error"][0].startswith("CalledProcessError")
+
+    def test_noop_run_is_fast(self, tmp_path):
+        """A run with nothing changed only stats files."""
+        src = tmp_path / "src"
+        src.mkdir()
+        for i in range(500):
+            (src / f"{i}.txt").write_text("content " * 1000)
+        stages = [
+            Stage(f"stage_{i}", lambda: None, inputs=[src])
+            for i in range(5)
+        ]
+        run_pipeline(stages, tmp_path / "state.json")
+        start = time.perf_counter()
+        report = run_pipeline(stages, tmp_path / "state.json")
+        assert time.perf_counter() - start < 1
+        assert set(report["status"]) == {"skipped"}
+
+    @pytest.mark.parametrize(
+        "stages, match",
+        [
+            (
+                [Stage("a", print), Stage("a", print)],
+                "must be unique",
+            ),
+            (
+                [Stage("a", print, after=["b"])],
+                "unknown stages",
+            ),
+            (
+                [
+                    Stage("a", print, after=["b"]),
+                    Stage("b", print, after=["a"]),
+                ],
+                "contain a cycle",
+            ),
+        ],
+    )
+    def test_invalid_stages_raise(self, tmp_path, stages, match):
+        """Invalid stage dependencies raise before any stage runs."""
+        with pytest.raises(ValueError, match=match):
+            run_pipeline(stages, tmp_path / "state.json")
+
+    def test_unknown_force_raises(self, chain):
+        """Forcing an unknown stage raises."""
+        stages, _, tmp_path = chain
+        with pytest.raises(ValueError, match="unknown stages"):
+            run_pipeline(stages, tmp_path / "state.json", force=["nope"])
+
+
+class TestScriptSources:
+    """Tests for script_sources."""
+
+    def test_follows_package_imports(self, tmp_path):
+        """Modules imported directly or through other modules are
+        found, other imports are not."""
+        pkg = tmp_path / "pkg"
+        pkg.mkdir()
+        (pkg / "a.py").write_text("import json\nfrom pkg.b import f\n")
+        (pkg / "b.py").write_text("import pkg.c\n")
+        (pkg / "c.py").write_text("from pkg import a\n")
+        (pkg / "unused.py").write_text("")
+        script = tmp_path / "script.py"
+        script.write_text("import pandas\nfrom pkg.a import g\n")
+        assert script_sources(script, package_dir=pkg) == [
+            script,
+            pkg / "a.py",
+            pkg / "b.py",
+            pkg / "c.py",
+        ]
+
+    def test_search_index_stage(self):
+        """The search index stage's code includes indirect imports."""
+        code = script_sources(here("pipeline/03_build_search_index.py"))
+        assert {p.name for p in code} >= {
+            "search_index.py",
+            "compress_utils.py",
+            "parquet_utils.py",
+        }
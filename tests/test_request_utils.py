@@ -1,9 +1,22 @@
 """Tests for request_utils module."""
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import socket
+import threading
+import time
+
 import pytest
+import requests
 from requests import HTTPError, Response
 
-from ai_nexus_backend.requests_utils import _handle_response, _url_defence
+from ai_nexus_backend.github_auth import TokenPool
+from ai_nexus_backend.requests_utils import (
+    _configure_http2,
+    _handle_response,
+    _url_defence,
+)
 
 
 class Test_UrlDefence:
@@ -60,3 +73,223 @@ class Test_UrlDefence:
 
         result = _handle_response(success_response)
         assert result == success_response
+
+
+class _H2StandIn:
+    """Local cleartext HTTP/2 server, counting connections & the streams
+    in flight on them.
+
+    Paths in `statuses` respond with each listed status in turn, then
+    200. Responses echo the path & Authorization header after `delay`.
+    """
+
+    def __init__(self, h2, delay=0.0):
+        self.h2 = h2
+        self.delay = delay
+        self.statuses = dict()
+        self.connections = 0
+        self.requests = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            threading.Thread(
+                target=self._serve, args=(conn,), daemon=True
+            ).start()
+
+    def _serve(self, sock):
+        config = self.h2.config.H2Configuration(
+            client_side=False, header_encoding="utf-8"
+        )
+        conn = self.h2.connection.H2Connection(config=config)
+        send_lock = threading.Lock()
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        streams = dict()
+        while True:
+            try:
+                data = sock.recv(65535)
+            except OSError:
+                return
+            if not data:
+                return
+            with send_lock:
+                events = conn.receive_data(data)
+                for event in events:
+                    if isinstance(event, self.h2.events.RequestReceived):
+                        streams[event.stream_id] = dict(event.headers)
+                    elif isinstance(event, self.h2.events.DataReceived):
+                        conn.acknowledge_received_data(
+                            event.flow_controlled_length, event.stream_id
+                        )
+                    elif isinstance(event, self.h2.events.StreamEnded):
+                        headers = streams.pop(event.stream_id)
+                        with self.lock:
+                            self.in_flight += 1
+                            self.max_in_flight = max(
+                                self.max_in_flight, self.in_flight
+                            )
+                        threading.Timer(
+                            self.delay,
+                            self._respond,
+                            args=(
+                                sock,
+                                conn,
+                                send_lock,
+                                event.stream_id,
+                                headers,
+                            ),
+                        ).start()
+                sock.sendall(conn.data_to_send())
+
+    def _respond(self, sock, conn, send_lock, stream_id, headers):
+        path = headers[":path"]
+        with self.lock:
+            self.in_flight -= 1
+            self.requests[path] += 1
+            pending = self.statuses.get(path, [])
+            status = pending.pop(0) if pending else 200
+        auth = headers.get("authorization", "")
+        body = json.dumps({"path": path, "authorization": auth}).encode()
+        response_headers = [
+            (":status", str(status)),
+            ("content-type", "application/json"),
+            ("content-length", str(len(body))),
+        ]
+        if path == "/limited":
+            # pat-a is out of budget, others are not
+            limited = auth == "Bearer pat-a"
+            response_headers += [
+                ("x-ratelimit-remaining", "0" if limited else "10"),
+                ("x-ratelimit-reset", str(time.time() + 60)),
+            ]
+            response_headers[0] = (":status", "403" if limited else "200")
+        with send_lock:
+            conn.send_headers(stream_id, response_headers)
+            conn.send_data(stream_id, body, end_stream=True)
+            try:
+                sock.sendall(conn.data_to_send())
+            except OSError:
+                pass
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture(scope="function")
+def h2_server():
+    """Local HTTP/2 server, delaying each response by 0.2s."""
+    pytest.importorskip("httpx")
+    for nm in ["h2.config", "h2.connection", "h2.events"]:
+        pytest.importorskip(nm)
+    import h2
+
+    server = _H2StandIn(h2, delay=0.2)
+    yield server
+    server.close()
+
+
+class TestHttp2Session:
+    """Tests for Http2Session against a local HTTP/2 server."""
+
+    def test_multiplexes_over_one_connection(self, h2_server):
+        """Concurrent requests share a single connection."""
+        sess = _configure_http2(prior_knowledge=True)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            resps = list(
+                executor.map(
+                    lambda i: sess.get(f"{h2_server.url}/repos/{i}"),
+                    range(20),
+                )
+            )
+        elapsed = time.perf_counter() - start
+        sess.close()
+        assert [r.status_code for r in resps] == [200] * 20
+        assert all(r.http_version == "HTTP/2" for r in resps)
+        assert h2_server.connections == 1
+        assert h2_server.max_in_flight > 1
+        # 20 sequential responses would take 4s
+        assert elapsed < 2
+
+    def test_retries_force_on(self, h2_server):
+        """force_on statuses are retried until a response is ok."""
+        h2_server.statuses["/flaky"] = [503, 502]
+        sess = _configure_http2(backoff_f=0, prior_knowledge=True)
+        resp = _handle_response(sess.get(f"{h2_server.url}/flaky"))
+        assert resp.json()["path"] == "/flaky"
+        assert h2_server.requests["/flaky"] == 3
+
+    def test_post_not_retried(self, h2_server):
+        """Like urllib3, statuses are only retried for idempotent
+        methods."""
+        h2_server.statuses["/graphql"] = [502]
+        sess = _configure_http2(backoff_f=0, prior_knowledge=True)
+        resp = sess.post(f"{h2_server.url}/graphql", json={"query": ""})
+        assert resp.status_code == 502
+        assert h2_server.requests["/graphql"] == 1
+
+    @pytest.mark.parametrize(
+        "path, statuses, match",
+        [
+            ("/missing", [404], "HTTP error 404:\nNot Found"),
+            ("/down", [503] * 3, "HTTP error 503:\nService Unavailable"),
+        ],
+    )
+    def test_errors_raise_from_handle_response(
+        self, h2_server, path, statuses, match
+    ):
+        """Errors & exhausted retries raise as requests responses do."""
+        h2_server.statuses[path] = statuses
+        sess = _configure_http2(n=2, backoff_f=0, prior_knowledge=True)
+        with pytest.raises(HTTPError, match=match):
+            _handle_response(sess.get(f"{h2_server.url}{path}"))
+
+    def test_connection_error(self):
+        """Connection failures raise requests' ConnectionError once
+        retries are exhausted."""
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+        with socket.create_server(("127.0.0.1", 0)) as sock:
+            port = sock.getsockname()[1]
+        sess = _configure_http2(n=1, backoff_f=0, prior_knowledge=True)
+        with pytest.raises(requests.ConnectionError):
+            sess.get(f"http://127.0.0.1:{port}/")
+
+    def test_session_auth(self, h2_server):
+        """Basic auth tuples & session headers are sent."""
+        sess = _configure_http2(prior_knowledge=True)
+        sess.auth = ("user", "pass")
+        sess.headers["User-Agent"] = "foo"
+        resp = sess.get(f"{h2_server.url}/auth")
+        assert resp.json()["authorization"].startswith("Basic ")
+
+    def test_token_pool_auth(self, h2_server):
+        """A rate limited request is resent with another token."""
+        pool = TokenPool(["pat-a", "pat-b"], max_wait=0)
+        sess = _configure_http2(prior_knowledge=True)
+        sess.auth = pool
+        resp = sess.get(f"{h2_server.url}/limited")
+        assert resp.ok
+        assert resp.json()["authorization"] == "Bearer pat-b"
+        assert [r.status_code for r in resp.history] == [403]
+        assert pool.remaining == {"core": [0, 10]}
+
+    def test_token_pool_waits_for_reset(self, h2_server):
+        """A lone rate limited token waits for its reset, raising once
+        the wait is longer than max_wait."""
+        sess = _configure_http2(prior_knowledge=True)
+        sess.auth = TokenPool(["pat-a"], max_wait=1)
+        with pytest.raises(HTTPError, match="rate limited"):
+            sess.get(f"{h2_server.url}/limited")
@@ -0,0 +1,98 @@
+"""Tests for search_engine module."""
+
+import numpy as np
+import pytest
+
+from ai_nexus_backend.search_engine import BM25Index
+
+
+@pytest.fixture(scope="function")
+def docs():
+    """Documents in the format returned by transform_data."""
+    return [
+        {
+            "content": "Invoice classifier",
+            "meta": {
+                "project_name": "Invoices",
+                "matched_field": "description",
+            },
+        },
+        {
+            "content": "Invoices",
+            "meta": {
+                "project_name": "Invoices",
+                "matched_field": "project_name",
+            },
+        },
+        {
+            "content": "Prison flows analysis with prison data",
+            "meta": {
+                "project_name": "Flows",
+                "matched_field": "description",
+            },
+        },
+        {
+            "content": "Analysis of court data",
+            "meta": {
+                "project_name": "Courts",
+                "matched_field": "description",
+            },
+        },
+    ]
+
+
+class TestBM25Index:
+    """Tests for BM25Index."""
+
+    def test_fit_builds_csr_postings(self, docs):
+        """Postings for each term hold ascending document IDs."""
+        index = BM25Index().fit(docs)
+        assert index.indptr[-1] == len(index.doc_ids) == len(index.weights)
+        t = index.vocab["analysis"]
+        start, end = index.indptr[t], index.indptr[t + 1]
+        np.testing.assert_array_equal(index.doc_ids[start:end], [2, 3])
+
+    def test_search_ranks_by_bm25(self, docs):
+        """Higher term frequency & rarer terms score higher."""
+        index = BM25Index().fit(docs)
+        results = index.search("prison data")
+        assert [r["meta"]["project_name"] for r in results] == [
+            "Flows",
+            "Courts",
+        ]
+        assert results[0]["score"] > results[1]["score"] > 0
+        assert results[0]["content"] == docs[2]["content"]
+
+    def test_search_no_matches(self, docs):
+        """Unknown terms & empty indexes return no results."""
+        assert BM25Index().fit(docs).search("unknown") == []
+        assert BM25Index().fit([]).search("unknown") == []
+        assert BM25Index().fit(docs).search("data", top_k=0) == []
+
+    def test_search_top_k(self, docs):
+        """At most top_k results are returned."""
+        results = BM25Index().fit(docs).search("analysis data", top_k=1)
+        assert len(results) == 1
+
+    def test_field_boosts(self, docs):
+        """Boosted fields outrank otherwise comparable matches."""
+        unboosted = BM25Index().fit(docs).search("invoices")
+        assert len(unboosted) == 1
+        boosted = BM25Index(field_boosts={"project_name": 3.0}).fit(docs)
+        assert boosted.search("invoices")[0]["score"] == pytest.approx(
+            unboosted[0]["score"] * 3.0
+        )
+
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_save_load_round_trip(self, docs, tmp_path, mmap):
+        """Loaded indexes return the same results."""
+        index = BM25Index(k1=1.2, field_boosts={"project_name": 2.0})
+        index.fit(docs)
+        index.save(tmp_path)
+        loaded = BM25Index.load(tmp_path, mmap=mmap)
+        assert loaded.k1 == 1.2
+        assert loaded.field_boosts == {"project_name": 2.0}
+        assert loaded.vocab == index.vocab
+        assert isinstance(loaded.weights, np.memmap) is mmap
+        for query in ["prison data", "invoices", "court"]:
+            assert loaded.search(query) == index.search(query)
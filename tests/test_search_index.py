@@ -0,0 +1,241 @@
+"""Tests for search_index module."""
+
+import gzip
+import json
+import shutil
+import subprocess
+
+import pandas as pd
+from pyprojroot import here
+import pytest
+
+from ai_nexus_backend import search_index
+from ai_nexus_backend.parquet_utils import (
+    repos_to_table,
+    write_repo_dataset,
+)
+
+
+@pytest.fixture(scope="function")
+def docs():
+    """Small catalogue of search documents."""
+    return [
+        {
+            "title": "invoice-nlp-app",
+            "href": "https://github.com/ministryofjustice/invoice-nlp-app",
+            "description": "Classifies invoices with NLP.",
+            "topics": ["nlp", "llm"],
+        },
+        {
+            "title": "prison-flows-analysis",
+            "href": "https://github.com/moj/prison-flows-analysis",
+            "description": "Analysis of prison flows.",
+            "topics": [],
+        },
+        {
+            "title": "misconduct_nlp",
+            "href": "https://github.com/moj/misconduct_nlp",
+            "description": None,
+            "topics": ["nlp"],
+        },
+    ]
+
+
+class TestSearchIndexUtils:
+    """Tests for tokenising & encoding utilities."""
+
+    def test__tokenise(self):
+        """Text is casefolded & split on non-word characters."""
+        assert search_index._tokenise("Prison-Flows NLP_app") == [
+            "prison",
+            "flows",
+            "nlp_app",
+        ]
+        assert search_index._tokenise(None) == []
+
+    @pytest.mark.parametrize(
+        "ids, deltas",
+        [([], []), ([4], [4]), ([0, 3, 4, 10], [0, 3, 1, 6])],
+    )
+    def test_delta_round_trip(self, ids, deltas):
+        """Delta encoding is reversible."""
+        assert search_index._delta_encode(ids) == deltas
+        assert search_index._delta_decode(deltas) == ids
+
+    def test__shard_key(self):
+        """Unsafe prefixes are hex encoded."""
+        assert search_index._shard_key("nlp", 2) == "nl"
+        assert search_index._shard_key("é", 2) == "xc3a9"
+
+
+class TestBuildSearchIndex:
+    """Tests for build_search_index & query_search_index."""
+
+    def test_build_search_index_writes_shards(self, docs, tmp_path):
+        """Check manifest, shards & compressed siblings are written."""
+        postings = search_index.build_search_index(docs, tmp_path)
+        assert postings["nlp"] == [0, 2]
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert manifest["n_docs"] == 3
+        assert manifest["prefix_len"] == 2
+        shard_pth = tmp_path / manifest["shards"]["nl"]["file"]
+        shard = json.loads(shard_pth.read_text())
+        # delta encoded postings
+        assert shard["nlp"] == [0, 2]
+        assert (
+            json.loads(
+                gzip.decompress(
+                    shard_pth.with_name("nl.json.gz").read_bytes()
+                )
+            )
+            == shard
+        )
+        display = json.loads((tmp_path / "docs.json").read_text())
+        assert display[1]["title"] == "prison-flows-analysis"
+        assert "topics" not in display[1]
+
+    def test_build_search_index_removes_stale_shards(self, docs, tmp_path):
+        """Rebuilding must not leave shards from previous builds."""
+        search_index.build_search_index(docs, tmp_path)
+        search_index.build_search_index(docs[1:2], tmp_path)
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        shard_files = {
+            p.name
+            for p in (tmp_path / "shards").iterdir()
+            if p.suffix == ".json"
+        }
+        assert shard_files == {
+            f"{k}.json" for k in manifest["shards"].keys()
+        }
+        assert "nl" not in manifest["shards"]
+
+    def test_failed_build_keeps_index(self, docs, tmp_path, monkeypatch):
+        """A build failing part way leaves the previous index whole & no
+        temporary directory behind."""
+        out_dir = tmp_path / "index"
+        search_index.build_search_index(docs, out_dir)
+        before = {
+            p.relative_to(out_dir): p.read_bytes()
+            for p in out_dir.rglob("*")
+            if p.is_file()
+        }
+
+        def _fail(pth, encodings):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(
+            search_index, "write_compressed_siblings", _fail
+        )
+        with pytest.raises(OSError, match="disk full"):
+            search_index.build_search_index(docs[1:2], out_dir)
+        after = {
+            p.relative_to(out_dir): p.read_bytes()
+            for p in out_dir.rglob("*")
+            if p.is_file()
+        }
+        assert after == before
+        assert [p.name for p in tmp_path.iterdir()] == ["index"]
+
+    def test_build_search_index_defence(self, docs, tmp_path):
+        """prefix_len must be positive."""
+        with pytest.raises(ValueError, match="prefix_len must be >= 1"):
+            search_index.build_search_index(docs, tmp_path, prefix_len=0)
+
+    @pytest.mark.parametrize(
+        "query, expected",
+        [
+            ("NLP", [0, 2]),
+            ("nlp invoices", [0]),
+            ("prison", [1]),
+            ("nothing matches", []),
+            ("", []),
+        ],
+    )
+    def test_query_search_index(self, docs, tmp_path, query, expected):
+        """Queries return documents matching all terms."""
+        search_index.build_search_index(docs, tmp_path)
+        assert search_index.query_search_index(tmp_path, query) == expected
+
+    def test_load_repo_documents(self, tmp_path):
+        """The repo dataset is read into search documents."""
+        repos = pd.DataFrame(
+            {
+                "id": [1],
+                "html_url": ["https://github.com/org/repo"],
+                "repo_url": ["https://api.github.com/repos/org/repo"],
+                "is_private": [False],
+                "is_archived": [False],
+                "name": ["repo"],
+                "description": ["A repo"],
+                "programming_language": ["Python"],
+                "updated_at": ["2024-10-10T12:00:00Z"],
+                "org_nm": ["org"],
+                "topics": [["llm"]],
+            }
+        )
+        write_repo_dataset(repos_to_table(repos), tmp_path)
+        assert search_index.load_repo_documents(tmp_path) == [
+            {
+                "title": "repo",
+                "href": "https://github.com/org/repo",
+                "description": "A repo",
+                "organisation": "org",
+                "topics": ["llm"],
+            }
+        ]
+
+
+class TestBrowserClient:
+    """Tests for the site's search client, www/search_index.js."""
+
+    def test_client_matches_query_search_index(self, docs, tmp_path):
+        """The browser client returns the documents query_search_index
+        matches, fetching only the shards of the query terms."""
+        if shutil.which("node") is None:
+            pytest.skip("node is not installed")
+        docs[2]["description"] = "Détection of misconduct."
+        search_index.build_search_index(docs, tmp_path)
+        queries = ["nlp", "NLP invoices", "prison flows", "détection", ""]
+        script = """
+        const fs = require("fs");
+        const {SearchIndex} = require(process.argv[1]);
+        const fetched = [];
+        const index = new SearchIndex(async (pth) => {
+            fetched.push(pth);
+            return JSON.parse(fs.readFileSync(process.argv[2] + pth));
+        });
+        (async () => {
+            const out = [];
+            for (const q of JSON.parse(process.argv[3])) {
+                out.push((await index.search(q)).map((d) => d.title));
+            }
+            console.log(JSON.stringify({results: out, fetched: fetched}));
+        })();
+        """
+        proc = subprocess.run(
+            [
+                "node",
+                "-e",
+                script,
+                str(here("www/search_index.js")),
+                f"{tmp_path}/",
+                json.dumps(queries),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        out = json.loads(proc.stdout)
+        expected = [
+            [
+                docs[i]["title"]
+                for i in search_index.query_search_index(tmp_path, q)
+            ]
+            for q in queries
+        ]
+        assert out["results"] == expected
+        assert expected[3] == ["misconduct_nlp"]
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert set(out["fetched"]) < {"manifest.json", "docs.json"} | {
+            v["file"] for v in manifest["shards"].values()
+        }
@@ -0,0 +1,217 @@
+"""Tests for task_queue module."""
+
+from collections import Counter
+import threading
+import time
+
+import pytest
+
+from ai_nexus_backend.task_queue import (
+    PermanentError,
+    TaskQueue,
+    run_queue,
+    run_worker,
+)
+
+
+def _double(key, payload):
+    """Handler doubling the payload, picklable for process workers."""
+    return payload * 2
+
+
+@pytest.fixture
+def queue_pth(tmp_path):
+    """Path to a queue of three tasks."""
+    pth = tmp_path / "queue.db"
+    with TaskQueue(pth) as queue:
+        queue.put(("double", f"repo-{i}", i) for i in range(3))
+    return pth
+
+
+class TestTaskQueue:
+    """Tests for TaskQueue."""
+
+    def test_put_is_idempotent(self, queue_pth):
+        """Tasks already queued are not enqueued again."""
+        with TaskQueue(queue_pth) as queue:
+            assert queue.put([("double", "repo-0", 0)]) == 0
+            assert queue.put([("double", "repo-3", 3)]) == 1
+            assert queue.counts() == {
+                "pending": 4,
+                "leased": 0,
+                "done": 0,
+                "dead": 0,
+            }
+
+    def test_lease_and_complete(self, queue_pth):
+        """Leased tasks are not leased again & results are stored."""
+        with TaskQueue(queue_pth) as queue:
+            tasks = queue.lease("a", n=2)
+            assert [t["key"] for t in tasks] == ["repo-0", "repo-1"]
+            assert [t["key"] for t in queue.lease("b", n=5)] == ["repo-2"]
+            assert queue.lease("c") == []
+            assert queue.complete(tasks[1], "a", {"topics": ["x"]})
+            results = queue.results("double")
+            assert list(results["key"]) == ["repo-1"]
+            assert results["result"][0] == {"topics": ["x"]}
+
+    def test_failed_task_backs_off(self, queue_pth):
+        """A failed task is retried once its backoff has passed."""
+        with TaskQueue(queue_pth, backoff_s=0.2) as queue:
+            task = queue.lease("a")[0]
+            assert queue.fail(task, "a", "HTTPError: 502")
+            assert [t["key"] for t in queue.lease("a", n=5)] == [
+                "repo-1",
+                "repo-2",
+            ]
+            time.sleep(0.25)
+            retried = queue.lease("a")
+            assert retried[0]["key"] == "repo-0"
+            assert retried[0]["attempts"] == 2
+
+    def test_dead_letters(self, queue_pth):
+        """Tasks out of attempts are dead lettered, not enqueued again
+        until requeued."""
+        with TaskQueue(queue_pth, max_attempts=2, backoff_s=0) as queue:
+            for attempt in range(2):
+                task = queue.lease("a")[0]
+                assert task["key"] == "repo-0"
+                queue.fail(task, "a", f"HTTPError: attempt {attempt}")
+            dead = queue.dead_letters()
+            assert list(dead["key"]) == ["repo-0"]
+            assert dead["error"][0] == "HTTPError: attempt 1"
+            assert dead["payload"][0] == 0
+            assert dead["retryable"][0]
+            assert queue.counts()["dead"] == 1
+            assert queue.put([("double", "repo-0", 0)]) == 0
+            assert queue.requeue_dead_letters(retryable_only=True) == 1
+            assert queue.counts() == {
+                "pending": 3,
+                "leased": 0,
+                "done": 0,
+                "dead": 0,
+            }
+
+    def test_expired_lease_released(self, queue_pth):
+        """A task whose lease expires is leased to another worker & the
+        original worker can no longer complete it."""
+        with TaskQueue(queue_pth, lease_s=0.1) as queue:
+            task = queue.lease("a")[0]
+            time.sleep(0.15)
+            assert queue.lease("b")[0]["key"] == task["key"]
+            assert not queue.complete(task, "a", "stale")
+            assert not queue.fail(task, "a", "stale")
+
+    def test_clear_finished(self, queue_pth):
+        """Done & dead lettered tasks are cleared, so that they are
+        enqueued afresh, while unfinished tasks are kept."""
+        with TaskQueue(queue_pth) as queue:
+            first, second = queue.lease("a", n=2)
+            queue.complete(first, "a", 0)
+            queue.fail(second, "a", "PermanentError: 404", retry=False)
+            assert queue.clear_finished("other") == 0
+            assert queue.clear_finished("double") == 2
+            assert queue.counts() == {
+                "pending": 1,
+                "leased": 0,
+                "done": 0,
+                "dead": 0,
+            }
+            assert queue.put(("double", f"repo-{i}", i) for i in range(3))
+
+    def test_invalid_max_attempts_raises(self, tmp_path):
+        """Tasks need at least one attempt."""
+        with pytest.raises(ValueError, match="at least 1"):
+            TaskQueue(tmp_path / "queue.db", max_attempts=0)
+
+
+class TestRunQueue:
+    """Tests for run_worker & run_queue."""
+
+    def test_threads_retry_until_done(self, queue_pth):
+        """Flaky tasks are retried until every task is done."""
+        calls = Counter()
+        lock = threading.Lock()
+
+        def _flaky(key, payload):
+            with lock:
+                calls[key] += 1
+                n = calls[key]
+            if key == "repo-1" and n < 3:
+                raise ConnectionError("reset")
+            return payload * 2
+
+        counts = run_queue(
+            queue_pth, {"double": _flaky}, max_workers=3, backoff_s=0.01
+        )
+        assert counts == {"pending": 0, "leased": 0, "done": 3, "dead": 0}
+        assert calls == {"repo-0": 1, "repo-1": 3, "repo-2": 1}
+        with TaskQueue(queue_pth) as queue:
+            assert list(queue.results("double")["result"]) == [0, 2, 4]
+
+    def test_processes(self, queue_pth):
+        """Workers can run in processes."""
+        counts = run_queue(
+            queue_pth, {"double": _double}, max_workers=2, processes=True
+        )
+        assert counts["done"] == 3
+
+    def test_restart_runs_unfinished_tasks(self, queue_pth):
+        """A rerun after a worker dies & another is interrupted runs
+        only the tasks they left unfinished."""
+        calls = list()
+
+        def _interrupted(key, payload):
+            calls.append(key)
+            if key == "repo-1":
+                raise KeyboardInterrupt
+            return payload * 2
+
+        with pytest.raises(KeyboardInterrupt):
+            run_worker(queue_pth, {"double": _interrupted}, lease_s=0.2)
+        # a killed worker's lease is left to expire
+        with TaskQueue(queue_pth, lease_s=0.2) as queue:
+            assert queue.lease("killed")[0]["key"] == "repo-1"
+            queue.put(("double", f"repo-{i}", i) for i in range(3))
+        calls.clear()
+
+        def _handler(key, payload):
+            calls.append(key)
+            return payload * 2
+
+        counts = run_queue(
+            queue_pth, {"double": _handler}, max_workers=2, lease_s=0.2
+        )
+        assert sorted(calls) == ["repo-1", "repo-2"]
+        assert counts["done"] == 3
+
+    def test_permanent_errors_not_retried(self, queue_pth):
+        """Tasks raising PermanentError are dead lettered at once."""
+        calls = Counter()
+
+        def _missing(key, payload):
+            calls[key] += 1
+            if key == "repo-1":
+                raise PermanentError("HTTP error 404:\nNot Found")
+            return payload * 2
+
+        counts = run_queue(
+            queue_pth, {"double": _missing}, max_workers=1, backoff_s=60
+        )
+        assert counts["dead"] == 1
+        assert calls["repo-1"] == 1
+        with TaskQueue(queue_pth) as queue:
+            dead = queue.dead_letters()
+            assert dead["error"][0].startswith("PermanentError")
+            assert not dead["retryable"][0]
+            # only tasks out of attempts are requeued
+            assert queue.requeue_dead_letters(retryable_only=True) == 0
+            assert queue.requeue_dead_letters() == 1
+
+    def test_unknown_kind_dead_lettered(self, queue_pth):
+        """Tasks without a handler fail & are dead lettered."""
+        run_queue(queue_pth, dict(), max_workers=1, max_attempts=1)
+        with TaskQueue(queue_pth) as queue:
+            dead = queue.dead_letters()
+        assert len(dead) == 3
+        assert dead["error"][0] == "KeyError: 'double'"
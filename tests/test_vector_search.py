@@ -0,0 +1,187 @@
+"""Tests for vector_search module."""
+
+import numpy as np
+import pytest
+
+from ai_nexus_backend.vector_search import HashingVectorIndex
+
+
+@pytest.fixture(scope="function")
+def docs():
+    """Documents in the format returned by transform_data."""
+    return [
+        {
+            "content": "Prison flows analysis",
+            "meta": {"project_name": "Flows"},
+        },
+        {
+            "content": "Analysis of court data",
+            "meta": {"project_name": "Courts"},
+        },
+        {
+            "content": "Invoice classifier",
+            "meta": {"project_name": "Invoices"},
+        },
+    ]
+
+
+class TestHashingVectorIndex:
+    """Tests for HashingVectorIndex."""
+
+    def test_empty_index_returns_nothing(self, tmp_path):
+        """Searching an empty index returns no results."""
+        index = HashingVectorIndex(tmp_path / "vec", n_features=2**10)
+        assert len(index) == 0
+        assert index.search("prison") == []
+
+    def test_search_ranks_by_cosine_similarity(self, tmp_path, docs):
+        """Documents are ranked by cosine similarity to the query."""
+        index = HashingVectorIndex(tmp_path / "vec", n_features=2**10)
+        index.append(docs)
+        results = index.search("prison analysis")
+        assert [r["meta"]["project_name"] for r in results] == [
+            "Flows",
+            "Courts",
+        ]
+        assert 0 < results[1]["score"] < results[0]["score"] <= 1 + 1e-6
+
+    def test_search_matches_dense_cosine(self, tmp_path, docs):
+        """Scores equal cosine similarity of dense TF-IDF vectors."""
+        index = HashingVectorIndex(tmp_path / "vec", n_features=2**10)
+        index.append(docs)
+        idf = index._idf()
+
+        def dense(text):
+            vec = np.zeros(index.n_features)
+            features, tf = index._hash_counts(text)
+            vec[features] = tf * idf[features]
+            return vec / np.linalg.norm(vec)
+
+        query = "analysis of prison data"
+        expected = sorted(
+            (dense(d["content"]) @ dense(query) for d in docs),
+            reverse=True,
+        )
+        scores = [r["score"] for r in index.search(query)]
+        np.testing.assert_allclose(scores, expected[:2], rtol=1e-5)
+
+    def test_search_batch_matches_search(self, tmp_path, docs):
+        """Batched queries return the same results as single queries."""
+        index = HashingVectorIndex(tmp_path / "vec", n_features=2**10)
+        index.append(docs)
+        queries = ["prison", "court data", "", "unmatched"]
+        assert index.search_batch(queries, top_k=2) == [
+            index.search(q, top_k=2) for q in queries
+        ]
+
+    def test_append_persists_and_updates_idf(self, tmp_path, docs):
+        """Appended documents are searchable after reopening the index,
+        with IDF reflecting every document."""
+        pth = tmp_path / "vec"
+        index = HashingVectorIndex(pth, n_features=2**10)
+        index.append(docs[:1])
+        idf_before = index._idf()
+        index.append(docs[1:])
+        reopened = HashingVectorIndex(pth, n_features=2**4)
+        assert reopened.n_features == 2**10
+        assert reopened.docs == docs
+        np.testing.assert_array_equal(reopened.df, index.df)
+        assert not np.array_equal(reopened._idf(), idf_before)
+        results = reopened.search("invoice")
+        assert results[0]["meta"]["project_name"] == "Invoices"
+
+    def test_interrupted_append_is_truncated(self, tmp_path, docs):
+        """Rows written without their documents are discarded on open."""
+        pth = tmp_path / "vec"
+        index = HashingVectorIndex(pth, n_features=2**10)
+        index.append(docs[:2])
+        index.append(docs[2:])
+        # simulate an append interrupted before writing documents
+        lines = (pth / "docs.jsonl").read_text().splitlines(keepends=True)
+        (pth / "docs.jsonl").write_text("".join(lines[:2]))
+        reopened = HashingVectorIndex(pth)
+        assert len(reopened) == 2
+        assert reopened.search("invoice") == []
+        reopened.append(docs[2:])
+        assert (
+            reopened.search("invoice")[0]["content"] == docs[2]["content"]
+        )
+
+    def test_torn_last_doc_is_trimmed(self, tmp_path, docs):
+        """A partially written last document is trimmed on open, along
+        with its matrix row."""
+        pth = tmp_path / "vec"
+        HashingVectorIndex(pth, n_features=2**10).append(docs)
+        content = (pth / "docs.jsonl").read_text()
+        (pth / "docs.jsonl").write_text(content[:-10])
+        reopened = HashingVectorIndex(pth)
+        assert len(reopened) == 2
+        assert (pth / "docs.jsonl").read_text().endswith("}\n")
+        assert reopened.search("invoice") == []
+        reopened.append(docs[2:])
+        assert len(HashingVectorIndex(pth)) == 3
+
+    def test_postings_merged_in_blocks(self, tmp_path, docs, monkeypatch):
+        """Postings segments merged over several appends, a few postings
+        at a time, hold the matrix entries sorted by feature & then row."""
+        monkeypatch.setattr("ai_nexus_backend.vector_search._BLOCK_NNZ", 2)
+        pth = tmp_path / "vec"
+        index = HashingVectorIndex(pth, n_features=2**6)
+        for doc in docs * 2:
+            index.append([doc])
+        assert len(index._segments) < len(docs * 2)
+        for seg in index._segments:
+            features = np.repeat(seg["features"], np.diff(seg["ptr"]))
+            order = np.lexsort((seg["rows"], features))
+            assert np.array_equal(order, np.arange(len(order)))
+        indptr = index._read("indptr")
+        expected = np.lexsort(
+            (
+                np.repeat(np.arange(len(index)), np.diff(indptr)),
+                index._read("indices"),
+            )
+        )
+        entry, rows, tf = index._gather(np.arange(2**6))
+        order = np.lexsort((rows, entry))
+        assert np.array_equal(
+            entry[order], index._read("indices")[expected]
+        )
+        assert np.array_equal(tf[order], index._read("data")[expected])
+        (pth / "postings" / "segments.json").unlink()
+        rebuilt = HashingVectorIndex(pth)
+        assert np.array_equal(index.df, rebuilt.df)
+        assert [
+            r["meta"]["project_name"] for r in index.search("court")
+        ] == [
+            "Courts",
+            "Courts",
+        ]
+
+    def test_append_keeps_existing_segments(self, tmp_path, docs):
+        """Appending fewer postings than the last segment writes a new
+        segment without rewriting the existing ones."""
+        pth = tmp_path / "vec"
+        index = HashingVectorIndex(pth, n_features=2**10)
+        index.append(docs)
+        (first,) = index._segments
+        seg_dir = pth / "postings" / first["name"]
+        before = {
+            f.name: (f.stat().st_ino, f.stat().st_mtime_ns)
+            for f in seg_dir.iterdir()
+        }
+        index.append([{"content": "Court", "meta": {}}])
+        assert [s["name"] for s in index._segments] == [
+            first["name"],
+            f"{3:010d}-{4:010d}",
+        ]
+        after = {
+            f.name: (f.stat().st_ino, f.stat().st_mtime_ns)
+            for f in seg_dir.iterdir()
+        }
+        assert after == before
+        reopened = HashingVectorIndex(pth)
+        assert np.array_equal(reopened.df, index.df)
+        assert [r["content"] for r in reopened.search("court")] == [
+            "Court",
+            "Analysis of court data",
+        ]
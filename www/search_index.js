@@ -0,0 +1,166 @@
+// Browser client for the sharded search index written by
+// ai_nexus_backend.search_index.build_search_index. Only the manifest,
+// the shards touched by a query & the display documents are fetched,
+// mirroring query_search_index.
+(function (root) {
+  "use strict";
+
+  // python's \w, as used by search_index._tokenise
+  var TOKEN_PATTERN = /[\p{L}\p{N}\p{M}_]+/gu;
+  var SAFE_PREFIX = /^[a-z0-9_]+$/;
+
+  function tokenise(text) {
+    if (!text) {
+      return [];
+    }
+    // matches python's casefold other than for a few letters, such as ß
+    return text.toLowerCase().match(TOKEN_PATTERN) || [];
+  }
+
+  function deltaDecode(deltas) {
+    var ids = [];
+    var total = 0;
+    for (var i = 0; i < deltas.length; i++) {
+      total += deltas[i];
+      ids.push(total);
+    }
+    return ids;
+  }
+
+  function shardKey(term, prefixLen) {
+    // slice by code point, as python does
+    var prefix = Array.from(term).slice(0, prefixLen).join("");
+    if (SAFE_PREFIX.test(prefix)) {
+      return prefix;
+    }
+    var hex = "";
+    new TextEncoder().encode(prefix).forEach(function (b) {
+      hex += b.toString(16).padStart(2, "0");
+    });
+    return "x" + hex;
+  }
+
+  // fetchJson(path) resolves to the parsed json file at path, relative
+  // to the index directory
+  function SearchIndex(fetchJson) {
+    this.fetchJson = fetchJson;
+    this.shards = {};
+    this.manifest = null;
+    this.docs = null;
+  }
+
+  SearchIndex.prototype.loadManifest = function () {
+    if (!this.manifest) {
+      this.manifest = this.fetchJson("manifest.json");
+    }
+    return this.manifest;
+  };
+
+  SearchIndex.prototype.loadShard = function (file) {
+    if (!this.shards[file]) {
+      this.shards[file] = this.fetchJson(file);
+    }
+    return this.shards[file];
+  };
+
+  // ascending ids of documents containing every query term
+  SearchIndex.prototype.query = function (text) {
+    var self = this;
+    var terms = tokenise(text);
+    if (!terms.length) {
+      return Promise.resolve([]);
+    }
+    return self.loadManifest().then(function (manifest) {
+      var files = [];
+      for (var i = 0; i < terms.length; i++) {
+        var shard = manifest.shards[shardKey(terms[i], manifest.prefix_len)];
+        if (!shard) {
+          return [];
+        }
+        files.push(shard.file);
+      }
+      return Promise.all(files.map(self.loadShard, self)).then(
+        function (shards) {
+          var matches = null;
+          shards.forEach(function (shard, i) {
+            var ids = new Set(deltaDecode(shard[terms[i]] || []));
+            matches = matches === null ? ids : new Set(
+              Array.from(matches).filter(function (id) {
+                return ids.has(id);
+              })
+            );
+          });
+          return Array.from(matches).sort(function (a, b) {
+            return a - b;
+          });
+        }
+      );
+    });
+  };
+
+  // display fields of the documents matching every query term
+  SearchIndex.prototype.search = function (text) {
+    var self = this;
+    return self.query(text).then(function (ids) {
+      if (!ids.length) {
+        return [];
+      }
+      if (!self.docs) {
+        self.docs = self.fetchJson("docs.json");
+      }
+      return self.docs.then(function (docs) {
+        return ids.map(function (id) {
+          return docs[id];
+        });
+      });
+    });
+  };
+
+  function render(results, list) {
+    list.replaceChildren();
+    results.forEach(function (doc) {
+      var item = document.createElement("li");
+      var link = document.createElement("a");
+      link.href = doc.href;
+      link.textContent = doc.title;
+      item.appendChild(link);
+      if (doc.description) {
+        item.appendChild(document.createTextNode(" - " + doc.description));
+      }
+      list.appendChild(item);
+    });
+  }
+
+  // wire a form with a search input to a results list
+  function attach(form, list, indexUrl) {
+    var index = new SearchIndex(function (path) {
+      return fetch(indexUrl + path).then(function (resp) {
+        if (!resp.ok) {
+          throw new Error("Failed to fetch " + path + ": " + resp.status);
+        }
+        return resp.json();
+      });
+    });
+    form.addEventListener("submit", function (event) {
+      event.preventDefault();
+      var text = form.querySelector("input").value;
+      index.search(text).then(function (results) {
+        render(results, list);
+      });
+    });
+    return index;
+  }
+
+  var api = {
+    tokenise: tokenise,
+    deltaDecode: deltaDecode,
+    shardKey: shardKey,
+    SearchIndex: SearchIndex,
+    attach: attach,
+  };
+  if (typeof module !== "undefined" && module.exports) {
+    module.exports = api;
+  } else {
+    root.searchIndex = api;
+  }
+})(this);